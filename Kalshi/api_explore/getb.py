@@ -1,4 +1,5 @@
 import requests
+import json
 import datetime
 import base64
 from cryptography.hazmat.primitives import serialization, hashes
@@ -8,9 +9,27 @@ import uuid
 import os
 from dotenv import load_dotenv
 import uuid
+import sys
+
+# Share the Kalshi rate limit with the ingestion jobs in summaryStats
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'summaryStats'))
+from rate_limiter import get_shared_limiter
+from response_cache import cached_get
 
 
 load_dotenv()
+limiter = get_shared_limiter()
+
+
+def get_public(url):
+    """GET a public (unauthenticated) endpoint's JSON, replayed from the response cache when it's on."""
+    def fetch():
+        limiter.acquire()
+        response = requests.get(url)
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        return response.content
+    return json.loads(cached_get(url, None, fetch))
 
 # Config
 API_KEY_ID=os.getenv('API_KEY_ID')
@@ -47,6 +66,7 @@ def get(private_key, api_key_id, path):
     }
 
     full_url = BASE_URL + path
+    limiter.acquire()
     return requests.get(full_url, headers=headers)
 
 # Load private key
@@ -72,20 +92,19 @@ def post(private_key, api_key_id, path, data, base_url=BASE_URL):
         'Content-Type': 'application/json'
     }
 
+    limiter.acquire()
     return requests.post(base_url + path, headers=headers, json=data)
 
 # Get all open markets for the KXHIGHNY series
 markets_url = f"https://api.elections.kalshi.com/trade-api/v2/markets?series_ticker=KXHIGHNY&status=open"
-markets_response = requests.get(markets_url)
-markets_data = markets_response.json()
+markets_data = get_public(markets_url)
 
 # Get details for a specific event if you have its ticker
 if markets_data['markets']:
     # Get details for Today
     event_ticker = markets_data['markets'][0]['event_ticker']
     event_url = f"https://api.elections.kalshi.com/trade-api/v2/events/{event_ticker}"
-    event_response = requests.get(event_url)
-    event_data = event_response.json()
+    event_data = get_public(event_url)
 
     print(f"Event Details:")
     print(f"Title: {event_data['event']['title']}")
@@ -131,6 +150,7 @@ def cancel(private_key, api_key_id, path, data, base_url=cancel_url):
         'Content-Type': 'application/json'
     }
 
+    limiter.acquire()
     return requests.delete(base_url + path, headers=headers, json=data)
 
 
@@ -1,17 +1,36 @@
 import requests
+import json
+import os
+import sys
+
+# Share the Kalshi rate limit with the ingestion jobs in summaryStats
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'summaryStats'))
+from rate_limiter import get_shared_limiter
+from response_cache import cached_get
+
+limiter = get_shared_limiter()
+
+
+def get_public(url):
+    """GET a public (unauthenticated) endpoint's JSON, replayed from the response cache when it's on."""
+    def fetch():
+        limiter.acquire()
+        response = requests.get(url)
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        return response.content
+    return json.loads(cached_get(url, None, fetch))
 
 # Get all open markets for the KXHIGHNY series
 markets_url = f"https://api.elections.kalshi.com/trade-api/v2/markets?series_ticker=KXHIGHNY&status=open"
-markets_response = requests.get(markets_url)
-markets_data = markets_response.json()
+markets_data = get_public(markets_url)
 
 # Get details for a specific event if you have its ticker
 if markets_data['markets']:
     # Get details for Today
     event_ticker = markets_data['markets'][0]['event_ticker']
     event_url = f"https://api.elections.kalshi.com/trade-api/v2/events/{event_ticker}"
-    event_response = requests.get(event_url)
-    event_data = event_response.json()
+    event_data = get_public(event_url)
 
     print(f"Event Details:")
     print(f"Title: {event_data['event']['title']}")
@@ -26,8 +45,7 @@ market_ticker = markets_data['markets'][0]['ticker']
 print(f"{market_ticker} IS THE MKT TICKER ")
 orderbook_url = f"https://api.elections.kalshi.com/trade-api/v2/markets/{market_ticker}/orderbook"
 
-orderbook_response = requests.get(orderbook_url)
-orderbook_data = orderbook_response.json()
+orderbook_data = get_public(orderbook_url)
 
 print(f"\nOrderbook for {market_ticker}:")
 print("YES BIDS:")
@@ -0,0 +1,169 @@
+from fractions import Fraction
+from datetime import datetime, timezone
+
+
+# Kalshi's fee adjustments (https://kalshi.com/fee-schedule) as data instead
+# of a CASE chain in every query.
+#
+# Every entry scales the standard taker and maker fees of the series whose
+# tickers start with its prefix, for trades created in [effective_from,
+# effective_to) (None: open-ended). The longest matching prefix wins, so
+# KXINXY gets its own entry rather than falling into KXINX's; the '' entry
+# is the standard schedule every other ticker gets. To change a fee, close
+# the old entry's range and add a new one, then bump FEE_SCHEDULE_VERSION —
+# fees on older trades keep the schedule they were charged under.
+#
+# In DuckDB the schedule is resolved once per distinct ticker, not per trade:
+#
+#   fee_lookup  (ticker, valid_from, valid_to) -> taker_num, taker_den, maker_num, maker_den
+#
+# one row per ticker and stretch of time with a constant fee (one row in all
+# but a handful of cases), which the trades join on ticker and created_time.
+# That is a hash join over distinct tickers in place of a dozen ILIKEs per trade.
+#
+# Fees are computed exactly, in integer cents. With the price in PRICE_SCALE
+# units (yes_price_dollars has 4 decimals, so u = price × 10,000 is exact):
+#
+#   fee cents = ceil(count × u × (PRICE_SCALE − u) × num / den)
+#
+# where num/den = rate × multiplier × 100 / PRICE_SCALE², reduced
+# (fee_fraction). num is 7 for every fee Kalshi charges today, so the
+# product stays far inside BIGINT, and the ceiling is an integer division:
+# no float rounding at cent boundaries, and DuckDB (the fee_cents macro)
+# and NumPy (fees.py) agree to the cent.
+#
+# Usage:
+#   con = duckdb.connect()
+#   build_fee_lookup(con, "read_parquet('kalshi_trades/*/*.parquet', hive_partitioning = true)")
+#   con.sql(f"SELECT SUM(fee_cents(t.count, t.yes_price_dollars, f.taker_num, f.taker_den)) "
+#           f"FROM read_parquet(...) t {FEE_JOIN}")
+
+TAKER_RATE = 0.07
+MAKER_RATE = 0.0175
+
+# Price units per dollar: yes_price_dollars is DECIMAL(6, 4)
+PRICE_SCALE = 10_000
+
+FEE_SCHEDULE_VERSION = '2025-01'
+
+FEE_SCHEDULE = [
+    # series_prefix       taker  maker  effective_from  effective_to
+    ('',                  1.0,   1.0,   None,           None),   # standard fees
+    ('KXDOED',            0.0,   0.0,   None,           None),
+    ('KXGAMBLINGREPEAL',  0.0,   0.0,   None,           None),
+    ('KXGREENLAND',       0.0,   0.0,   None,           None),
+    ('KXINX',             0.5,   1.0,   None,           None),
+    ('KXINXMAXY',         0.5,   1.0,   None,           None),
+    ('KXINXMINY',         0.5,   1.0,   None,           None),
+    ('KXINXPOS',          0.5,   1.0,   None,           None),
+    ('KXINXU',            0.5,   1.0,   None,           None),
+    ('KXINXY',            0.5,   0.5,   None,           None),
+    ('KXNASDAQ100',       0.5,   1.0,   None,           None),
+    ('KXNASDAQ100U',      0.5,   1.0,   None,           None),
+    ('KXNASDAQ100Y',      0.5,   0.5,   None,           None),
+]
+
+# Join the fee_lookup built by build_fee_lookup onto trades aliased t
+FEE_JOIN = """
+    JOIN fee_lookup f
+      ON t.ticker = f.ticker
+     AND t.created_time >= f.valid_from
+     AND t.created_time <  f.valid_to"""
+
+
+_BEGINNING = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _as_utc(value):
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc) if value else None
+
+
+def resolve(ticker, at=None, schedule=FEE_SCHEDULE):
+    """(taker_multiplier, maker_multiplier) for a ticker, for a trade created at `at` (default: now)."""
+    at = at or datetime.now(timezone.utc)
+    matches = []
+    for prefix, taker, maker, start, end in schedule:
+        start, end = _as_utc(start), _as_utc(end)
+        if ticker.startswith(prefix) and (start is None or start <= at) and (end is None or at < end):
+            matches.append((len(prefix), start or _BEGINNING, taker, maker))
+    if not matches:
+        raise Exception(f"No fee schedule entry covers {ticker} at {at.isoformat()}")
+    _, _, taker, maker = max(matches)
+    return taker, maker
+
+
+def fee_fraction(rate, multiplier=1.0):
+    """(num, den): fee cents per count × u × (PRICE_SCALE − u), as a reduced integer fraction."""
+    fraction = Fraction(str(rate)) * Fraction(str(multiplier)) * 100 / PRICE_SCALE ** 2
+    return fraction.numerator, fraction.denominator
+
+
+def register_fee_schedule(con, schedule=FEE_SCHEDULE):
+    """Create the fee_schedule temp table and the fee_cents macro in a DuckDB connection."""
+    # Multipliers are stored as their exact fee_fraction, never as floats
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE fee_schedule (
+            series_prefix    VARCHAR,
+            effective_from   TIMESTAMPTZ,
+            effective_to     TIMESTAMPTZ,
+            taker_num        BIGINT,
+            taker_den        BIGINT,
+            maker_num        BIGINT,
+            maker_den        BIGINT
+        )""")
+    con.executemany("""
+        INSERT INTO fee_schedule VALUES (?,
+            COALESCE(?::TIMESTAMP AT TIME ZONE 'UTC', '-infinity'::TIMESTAMPTZ),
+            COALESCE(?::TIMESTAMP AT TIME ZONE 'UTC', 'infinity'::TIMESTAMPTZ),
+            ?, ?, ?, ?)""",
+        [(prefix, start, end, *fee_fraction(TAKER_RATE, taker), *fee_fraction(MAKER_RATE, maker))
+         for prefix, taker, maker, start, end in schedule])
+    # Exact ceiling of count × u × (PRICE_SCALE − u) × num / den; integer
+    # overflow raises in DuckDB rather than wrapping
+    con.execute(f"""
+        CREATE OR REPLACE TEMP MACRO fee_cents(count, price, num, den) AS
+            (count::BIGINT * (price * {PRICE_SCALE})::BIGINT * ({PRICE_SCALE} - (price * {PRICE_SCALE})::BIGINT)
+             * num + den - 1) // den""")
+
+
+def build_fee_lookup(con, trades, schedule=FEE_SCHEDULE):
+    """Resolve the fee schedule for every distinct ticker in trades into the fee_lookup temp table.
+
+    Args:
+        con:      DuckDB connection the fee queries run on.
+        trades:   SQL relation with a ticker column, e.g. "read_parquet(...) WHERE created_month >= '2024-01'".
+        schedule: Fee schedule entries (default: FEE_SCHEDULE).
+
+    Returns the number of lookup rows.
+    """
+    register_fee_schedule(con, schedule)
+    # Cut each ticker's timeline at every boundary of the entries matching it,
+    # then give every piece the longest (and, on ties, latest) matching prefix
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE fee_lookup AS
+        WITH tickers AS (
+            SELECT DISTINCT ticker FROM {trades}
+        ), candidates AS (
+            SELECT t.ticker, s.*
+            FROM tickers t
+            JOIN fee_schedule s ON starts_with(t.ticker, s.series_prefix)
+        ), bounds AS (
+            SELECT ticker, effective_from AS ts FROM candidates
+            UNION
+            SELECT ticker, effective_to FROM candidates
+        ), pieces AS (
+            SELECT ticker, ts AS valid_from, LEAD(ts) OVER (PARTITION BY ticker ORDER BY ts) AS valid_to
+            FROM bounds
+        )
+        SELECT p.ticker, p.valid_from, p.valid_to
+             , c.taker_num, c.taker_den, c.maker_num, c.maker_den
+        FROM pieces p
+        JOIN candidates c
+          ON c.ticker = p.ticker
+         AND c.effective_from <= p.valid_from
+         AND c.effective_to   >= p.valid_to
+        WHERE p.valid_to IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY p.ticker, p.valid_from
+                                   ORDER BY length(c.series_prefix) DESC, c.effective_from DESC) = 1
+    """)
+    return con.execute("SELECT COUNT(*) FROM fee_lookup").fetchone()[0]
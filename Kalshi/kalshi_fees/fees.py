@@ -0,0 +1,279 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from datetime import datetime, timezone
+from fee_schedule import (TAKER_RATE, MAKER_RATE, PRICE_SCALE, FEE_SCHEDULE, FEE_JOIN, build_fee_lookup,
+                          fee_fraction, resolve)
+
+
+# Array-in, array-out fee calculator (https://kalshi.com/fee-schedule).
+#
+#   fee = round_up_to_cent(rate × C × P × (1 − P) × series multiplier)
+#
+# taker_fee / maker_fee / total_fee take scalars, NumPy arrays, pandas
+# Series or Arrow arrays for C (contracts) and P (price in dollars) and
+# broadcast like ufuncs, so a plot's whole np.linspace grid or a trade
+# file's columns are priced in one vectorized pass instead of a Python loop.
+# Multipliers come from fee_schedule.py: series_multipliers() resolves them
+# once per distinct ticker (and fee period) and scatters them back to rows.
+#
+# Those work in float64 and take any C, which is what the fee curves need.
+# Trades go through the exact path instead: taker_fee_cents /
+# maker_fee_cents compute the fee in integer cents from whole contracts and
+# the price in PRICE_SCALE units, with the same integer ceiling as the
+# fee_cents macro in DuckDB (see fee_schedule.py), so both agree to the cent.
+#
+# trade_fees() prices an Arrow table or DataFrame of trades; run as a script
+# it totals fees per month straight from the trade lake in record batches,
+# and --check runs the DuckDB fee query over the same lake and fails unless
+# every month matches exactly.
+#
+# Usage:
+#   from fees import taker_fee
+#   taker_fee(np.linspace(0, 10000, 1000), 0.3)
+#
+#   python fees.py ../summaryStats/kalshi_trades --since 2024-01 --check
+
+BATCH_ROWS = 1_000_000
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _as_float(values):
+    """float64 NumPy view of a scalar, array, Series or Arrow (incl. decimal) column."""
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return pc.cast(values, pa.float64()).to_numpy(zero_copy_only=False)
+    return np.asarray(values, dtype=np.float64)
+
+
+def round_up_cents(dollars):
+    """Round dollar amounts up to the next whole cent."""
+    return np.ceil(_as_float(dollars) * 100) / 100
+
+
+def _fee(rate, count, price, multiplier, round_up):
+    price = _as_float(price)
+    # Same order of operations as the SQL, so both round the same way
+    raw = rate * _as_float(count) * price * (1 - price) * _as_float(multiplier)
+    return round_up_cents(raw) if round_up else raw
+
+
+def taker_fee(count, price, multiplier=1.0, round_up=True):
+    """Taker fee for count contracts at price (dollars), rounded up to the cent unless round_up=False."""
+    return _fee(TAKER_RATE, count, price, multiplier, round_up)
+
+
+def maker_fee(count, price, multiplier=1.0, round_up=True):
+    """Maker fee (a quarter of the taker rate) for count contracts at price (dollars)."""
+    return _fee(MAKER_RATE, count, price, multiplier, round_up)
+
+
+def total_fee(count, price, taker_multiplier=1.0, maker_multiplier=1.0, round_up=True):
+    """Taker plus maker fee of a trade, each rounded up to the cent as they are charged."""
+    return (taker_fee(count, price, taker_multiplier, round_up)
+            + maker_fee(count, price, maker_multiplier, round_up))
+
+
+# ---------------------------------------------------------------------------
+# Exact integer cents
+# ---------------------------------------------------------------------------
+
+def price_units(price):
+    """Prices as int64 PRICE_SCALE units: exact for decimal columns, rounded for floats."""
+    if isinstance(price, (pa.Array, pa.ChunkedArray)) and pa.types.is_decimal(price.type):
+        # Scale 4 matches PRICE_SCALE; a price with more decimals fails the int64 cast
+        units = pc.multiply(pc.cast(price, pa.decimal128(18, 4)), pa.scalar(PRICE_SCALE, pa.decimal128(5, 0)))
+        return pc.cast(units, pa.int64()).fill_null(0).to_numpy(zero_copy_only=False)
+    return np.rint(np.nan_to_num(_as_float(price)) * PRICE_SCALE).astype(np.int64)
+
+
+def _contracts(count):
+    if isinstance(count, (pa.Array, pa.ChunkedArray)):
+        return pc.cast(count, pa.int64()).fill_null(0).to_numpy(zero_copy_only=False)
+    count = np.asarray(count)
+    if count.dtype.kind == 'f' and not np.all(count == np.floor(count)):
+        raise Exception("Exact fees need whole contract counts")
+    return count.astype(np.int64)
+
+
+def _fractions(rate, multiplier):
+    """Per-element fee_fraction (num, den) arrays for a multiplier array."""
+    multiplier = _as_float(multiplier)
+    values, inverse = np.unique(multiplier, return_inverse=True)
+    fractions = np.array([fee_fraction(rate, m) for m in values], dtype=np.int64).reshape(-1, 2)
+    return fractions[inverse, 0].reshape(multiplier.shape), fractions[inverse, 1].reshape(multiplier.shape)
+
+
+def fee_cents(count, price, num, den):
+    """Exact fee in cents, ceil(count × u × (PRICE_SCALE − u) × num / den), elementwise as int64."""
+    return _fee_cents_units(_contracts(count), price_units(price), num, den)
+
+
+def _fee_cents_units(count, units, num, den):
+    num, den = np.asarray(num, dtype=np.int64), np.asarray(den, dtype=np.int64)
+    if count.size and num.size and int(np.abs(count).max()) * (PRICE_SCALE ** 2 // 4) * int(num.max()) >= 2 ** 62:
+        raise Exception("Fee products would overflow int64")
+    return (count * units * (PRICE_SCALE - units) * num + den - 1) // den
+
+
+def taker_fee_cents(count, price, multiplier=1.0):
+    """Exact taker fee in integer cents for whole contracts at price (dollars)."""
+    return fee_cents(count, price, *_fractions(TAKER_RATE, multiplier))
+
+
+def maker_fee_cents(count, price, multiplier=1.0):
+    """Exact maker fee in integer cents for whole contracts at price (dollars)."""
+    return fee_cents(count, price, *_fractions(MAKER_RATE, multiplier))
+
+
+def format_cents(cents):
+    return f"{'-' if cents < 0 else ''}{abs(cents) // 100:,}.{abs(cents) % 100:02d}"
+
+
+# ---------------------------------------------------------------------------
+# Trades
+# ---------------------------------------------------------------------------
+
+def _schedule_bounds(schedule):
+    """Sorted epoch-microsecond boundaries where some schedule entry starts or ends."""
+    bounds = {entry[i] for entry in schedule for i in (3, 4) if entry[i]}
+    return np.array(sorted(int((datetime.fromisoformat(b).replace(tzinfo=timezone.utc) - _EPOCH).total_seconds())
+                           * 1_000_000 for b in bounds), dtype=np.int64)
+
+
+def _resolve_rows(tickers, created_time, schedule):
+    """(resolved, inverse): (taker, maker) multipliers per distinct key, and each row's key.
+
+    A key is a ticker, or a (ticker, fee period) pair once the schedule has
+    dated entries, so resolve() runs once per key rather than once per row.
+    """
+    tickers = tickers if isinstance(tickers, (pa.Array, pa.ChunkedArray)) else pa.array(tickers)
+    if pa.types.is_dictionary(tickers.type):
+        tickers = pc.cast(tickers, tickers.type.value_type)
+    if isinstance(tickers, pa.ChunkedArray):
+        tickers = tickers.combine_chunks()
+    encoded = pc.dictionary_encode(tickers)
+    dictionary = encoded.dictionary.to_pylist()
+    codes = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+
+    bounds = _schedule_bounds(schedule)
+    if not len(bounds):
+        resolved = [resolve(ticker, _EPOCH, schedule) for ticker in dictionary]
+        return np.array(resolved, dtype=np.float64).reshape(-1, 2), codes
+
+    if created_time is None:
+        raise Exception("The fee schedule has dated entries, created_time is required")
+    created = created_time if isinstance(created_time, (pa.Array, pa.ChunkedArray)) else pa.array(created_time)
+    micros = pc.cast(pc.cast(created, pa.timestamp('us', 'UTC')), pa.int64()).to_numpy(zero_copy_only=False)
+    period = np.searchsorted(bounds, micros, side='right')
+
+    # One key per (ticker, period) pair present; period p starts at bounds[p - 1]
+    periods = len(bounds) + 1
+    keys, inverse = np.unique(codes * periods + period, return_inverse=True)
+    starts = [_EPOCH] + [datetime.fromtimestamp(b / 1_000_000, timezone.utc) for b in bounds]
+    resolved = np.array([resolve(dictionary[k // periods], starts[k % periods], schedule) for k in keys],
+                        dtype=np.float64).reshape(-1, 2)
+    return resolved, inverse
+
+
+def series_multipliers(tickers, created_time=None, schedule=FEE_SCHEDULE):
+    """Per-row (taker, maker) multiplier arrays for a ticker column.
+
+    Each distinct ticker is resolved once per fee period it trades in (once
+    in total while the schedule has no dated entries); created_time is only
+    needed when it does.
+    """
+    resolved, inverse = _resolve_rows(tickers, created_time, schedule)
+    return resolved[inverse, 0], resolved[inverse, 1]
+
+
+def trade_fees(trades, schedule=FEE_SCHEDULE):
+    """(taker, maker) exact fees in integer cents of every trade in an Arrow table or pandas DataFrame.
+
+    trades needs ticker, count and yes_price_dollars columns, plus
+    created_time if the schedule has dated entries.
+    """
+    if not isinstance(trades, pa.Table):
+        trades = pa.Table.from_pandas(trades, preserve_index=False)
+    created = trades.column('created_time') if 'created_time' in trades.column_names else None
+    resolved, inverse = _resolve_rows(trades.column('ticker'), created, schedule)
+    count, price = _contracts(trades.column('count')), price_units(trades.column('yes_price_dollars'))
+    fees = []
+    for rate, multipliers in ((TAKER_RATE, resolved[:, 0]), (MAKER_RATE, resolved[:, 1])):
+        fractions = np.array([fee_fraction(rate, m) for m in multipliers], dtype=np.int64).reshape(-1, 2)
+        fees.append(_fee_cents_units(count, price, fractions[inverse, 0], fractions[inverse, 1]))
+    return tuple(fees)
+
+
+def monthly_lake_fees(lake_dir, since=None, schedule=FEE_SCHEDULE):
+    """{month: total fee cents} over a trade lake, computed in NumPy a record batch at a time."""
+    dataset = ds.dataset(lake_dir, format='parquet', partitioning='hive')
+    filter = ds.field('created_month') >= since if since else None
+    totals = {}
+    scanner = dataset.scanner(columns=['ticker', 'count', 'yes_price_dollars', 'created_time'],
+                              filter=filter, batch_size=BATCH_ROWS)
+    for batch in scanner.to_batches():
+        if batch.num_rows == 0:
+            continue
+        taker, maker = trade_fees(pa.Table.from_batches([batch]), schedule)
+        micros = pc.cast(pc.cast(batch.column('created_time'), pa.timestamp('us', 'UTC')), pa.int64())
+        months = micros.to_numpy(zero_copy_only=False).astype('datetime64[us]').astype('datetime64[M]')
+        keys, inverse = np.unique(months, return_inverse=True)
+        # Whole cents summed in float64 stay exact far beyond a batch's total (2**53)
+        sums = np.bincount(inverse, weights=taker + maker)
+        for key, total in zip(keys, sums):
+            totals[str(key)] = totals.get(str(key), 0) + int(total)
+    return totals
+
+
+def duckdb_monthly_fees(lake_dir, since=None):
+    """{month: total fee cents} from the DuckDB fee query (as in fee_rev_query.py) over the same lake."""
+    import duckdb
+    trades = f"read_parquet('{os.path.join(lake_dir, '*', '*.parquet')}', hive_partitioning = true)"
+    where = f"WHERE t.created_month >= '{since}'" if since else ""
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC'")
+    build_fee_lookup(con, f"{trades} t {where}")
+    rows = con.execute(f"""
+        SELECT strftime(date_trunc('MONTH', t.created_time), '%Y-%m') AS month
+             , SUM(fee_cents(t.count, t.yes_price_dollars, f.taker_num, f.taker_den)
+                 + fee_cents(t.count, t.yes_price_dollars, f.maker_num, f.maker_den))::BIGINT
+        FROM {trades} t {FEE_JOIN}
+        {where}
+        GROUP BY 1
+    """).fetchall()
+    con.close()
+    return dict(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Total fees per month over the trade lake with the NumPy calculator")
+    parser.add_argument('lake_dir', help='trade lake directory (created_month=YYYY-MM/*.parquet)')
+    parser.add_argument('--since', help="first created_month to include, e.g. '2024-01'")
+    parser.add_argument('--check', action='store_true', help='compare against the DuckDB fee query')
+    args = parser.parse_args()
+
+    start = time.time()
+    totals = monthly_lake_fees(args.lake_dir, args.since)
+    print(f"NumPy: {len(totals)} month(s) in {time.time() - start:.1f}s")
+    expected = {}
+    if args.check:
+        start = time.time()
+        expected = duckdb_monthly_fees(args.lake_dir, args.since)
+        print(f"DuckDB: {len(expected)} month(s) in {time.time() - start:.1f}s")
+
+    months = sorted(set(totals) | set(expected), reverse=True)
+    for month in months:
+        line = f"{month}  {format_cents(totals.get(month, 0)):>18}"
+        if args.check:
+            diff = totals.get(month, 0) - expected.get(month, 0)
+            line += f"  duckdb {format_cents(expected.get(month, 0)):>18}  diff {format_cents(diff):>8}"
+        print(line)
+    if args.check and any(totals.get(m, 0) != expected.get(m, 0) for m in months):
+        print("MISMATCH between NumPy and DuckDB fee totals")
+        sys.exit(1)
@@ -1,14 +1,6 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import math
-
-def calculate_fees(C, P):
-    """
-    Calculate taker fees from: https://kalshi.com/docs/kalshi-fee-schedule.pdf
-    """
-    raw_fee = 0.07 * C * P * (1 - P)
-    fees = math.ceil(raw_fee * 100) / 100
-    return fees
+from fees import taker_fee
 
 # Total contracts will be at (0 to 10,000)
 C_values = np.linspace(0, 10000, 1000)
@@ -36,7 +28,7 @@ for i, (P1, P2) in enumerate(P_pairs):
     color = colors[i]
     
     # Plot first P value
-    fees = [calculate_fees(C, P1) for C in C_values]
+    fees = taker_fee(C_values, P1)
     if P2 is None:
         ax_main.plot(C_values, fees, label=f'P = {P1} (maximum)', 
                     linewidth=3, color=color, linestyle='-')
@@ -45,7 +37,7 @@ for i, (P1, P2) in enumerate(P_pairs):
                     linewidth=2.5, color=color, linestyle='-')
         
         # Plot second P value with same color but dashed (they overlap)
-        fees2 = [calculate_fees(C, P2) for C in C_values]
+        fees2 = taker_fee(C_values, P2)
         ax_main.plot(C_values, fees2, linewidth=1, color=color, 
                     linestyle='--', alpha=0.7)
 
@@ -91,7 +83,7 @@ C_values_zoom = np.linspace(0, 2000, 1000)
 
 for i, (P1, P2) in enumerate(P_pairs):
     color = colors[i]
-    fees = [calculate_fees(C, P1) for C in C_values_zoom]
+    fees = taker_fee(C_values_zoom, P1)
     
     if P2 is None:
         ax1.plot(C_values_zoom, fees, label=f'P = {P1}', 
@@ -2,24 +2,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 
-def calculate_total_fees(volume, p):
-    """
-    Calculate total fees (maker + taker) for a given volume and probability.
-
-    Formula: fee = (0.0175 * volume * p(1-p)) + (0.07 * volume * p(1-p))
-
-    Where:
-    - 0.0175 = maker fee rate (1.75%)
-    - 0.07 = taker fee rate (7%)
-    """
-    return (0.0175 * volume  * p * (1 - p)) + (0.07 * volume * p * (1 - p))
+# Fees on an aggregate volume aren't rounded per trade, hence round_up=False
+from fees import maker_fee, taker_fee, total_fee
 
 # Fixed total volume: $40 billion in contracts
 TOTAL_VOLUME = 40_000_000_000
 
 # Generate probability distribution
 P_values = np.linspace(0, 1, 1000)
-fees = [calculate_total_fees(TOTAL_VOLUME, p) for p in P_values]
+fees = total_fee(TOTAL_VOLUME, P_values, round_up=False)
 
 # Create main visualization
 fig = plt.figure(figsize=(16, 10))
@@ -27,8 +18,8 @@ gs = fig.add_gridspec(1, 2, hspace=0.3, wspace=0.3)
 
 # Fee breakdown by component
 ax_breakdown = fig.add_subplot(gs[0, 0])
-maker_fees = [0.0175 * (TOTAL_VOLUME) * p * (1-p) for p in P_values]
-taker_fees = [0.07 * (TOTAL_VOLUME) * p * (1-p) for p in P_values]
+maker_fees = maker_fee(TOTAL_VOLUME, P_values, round_up=False)
+taker_fees = taker_fee(TOTAL_VOLUME, P_values, round_up=False)
 
 ax_breakdown.plot(P_values, maker_fees, linewidth=2.5, color='blue', label='Maker Fees')
 ax_breakdown.plot(P_values, taker_fees, linewidth=2.5, color='orange', label='Taker Fees')
@@ -51,9 +42,9 @@ p_values_of_interest = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
 stats_data = []
 
 for p in p_values_of_interest:
-    total = calculate_total_fees(TOTAL_VOLUME, p)
-    maker = 0.0175 * (TOTAL_VOLUME) * p * (1-p)
-    taker = 0.07 * (TOTAL_VOLUME) * p * (1-p)
+    taker = taker_fee(TOTAL_VOLUME, p, round_up=False)
+    maker = maker_fee(TOTAL_VOLUME, p, round_up=False)
+    total = taker + maker
     stats_data.append([f'{p:.1f}', f'${total/1e9:.3f}B', f'${maker/1e9:.3f}B', f'${taker/1e9:.3f}B'])
 
 # Create table
@@ -0,0 +1,65 @@
+import pandas as pd
+import time
+from kalshi_paginator import MARKET_STREAMS, crawl_endpoints, refresh_endpoints
+from raw_capture import open_capture
+
+
+# Regular and combo (MVE) markets in one job: both streams page concurrently
+# under the shared rate budget and land in a single file, with market_source
+# ('regular' / 'combo') recording which stream each market came from.
+#
+# Replaces running totalMarketPagination.py and comboPagination.py back to
+# back. Regular markets are fetched with mve_filter=exclude, so no market is
+# in both streams.
+
+DISCRIMINATOR = 'market_source'
+
+
+def get_all_markets_batched(filename='kalshi_all_markets.parquet', batch_size=10000, cursor_file='pagination_all_cursor.json',
+                            resume=False, incremental=False, metadata_file='kalshi_all_markets_metadata.json', refresh=False,
+                            capture_dir=None):
+    """Fetch regular and combo markets from Kalshi concurrently into one parquet file
+
+    Args:
+        filename: Output parquet file name
+        batch_size: Number of markets per stream to batch before writing to disk
+        cursor_file: Checkpoint name for both streams' pagination cursors (see checkpoint_store.py)
+        resume: Resume unfinished streams from their last saved cursors after an error
+        incremental: Only fetch markets created since last run (uses min_created_ts API filter)
+        metadata_file: Checkpoint name for the last run timestamp
+        refresh: Re-poll only markets not yet settled/finalized and upsert their changes
+        capture_dir: Also keep the raw response pages under this directory for later backfills
+    """
+    capture = open_capture(capture_dir, filename.rsplit('.parquet', 1)[0])
+    try:
+        if refresh:
+            return refresh_endpoints(MARKET_STREAMS, filename, discriminator=DISCRIMINATOR, batch_size=batch_size,
+                                     resume=resume, metadata_file=metadata_file, capture=capture)
+        return crawl_endpoints(MARKET_STREAMS, filename, discriminator=DISCRIMINATOR, batch_size=batch_size,
+                               cursor_file=cursor_file, resume=resume, incremental=incremental,
+                               metadata_file=metadata_file, capture=capture)
+    finally:
+        if capture is not None:
+            capture.close()
+
+
+if __name__ == "__main__":
+    print("Starting to fetch Kalshi regular and combo markets...")
+    start = time.time()
+
+    filename = 'kalshi_all_markets.parquet'
+
+    total_markets = get_all_markets_batched(
+        filename=filename,
+        batch_size=10000,
+        resume=True,        # Set to True to resume after an error
+        incremental=False,   # Set to True to only fetch new markets since last run
+        refresh=False        # Set to True to update status/volume of markets not yet settled
+    )
+
+    print(f"\nCompleted in {time.time() - start:.2f} seconds")
+    print(f"Total markets fetched: {total_markets}")
+
+    df = pd.read_parquet(filename)
+    print(f"Total markets in file: {len(df)}")
+    print(df[DISCRIMINATOR].value_counts())
@@ -0,0 +1,140 @@
+import asyncio
+import time
+import os
+import pyarrow as pa
+from async_client import AsyncKalshiClient
+from kalshi_paginator import LIMIT, MARKETS, COMBO_MARKETS
+import kalshi_paginator
+from tradesPagination import SYNC_OVERLAP_SECONDS, decode_page, flush_batch, sync_start
+from trade_lake import DEFAULT_LAKE_DIR, Manifest
+from parquet_profiles import ProfileWriter, get_profile
+from trade_id_index import TradeIdIndex
+
+
+# Drive the trades, markets and combo (MVE) markets crawls on one event loop.
+#
+# All three jobs share one AsyncKalshiClient (one HTTP/2 connection pool) and
+# the machine-wide token bucket, so they run concurrently at the combined
+# rate limit without a thread per job. Pages are decoded straight into Arrow
+# and parquet writes are pushed to worker threads so the loop keeps issuing
+# requests while a batch is flushed. Trades are synced incrementally into the
+# partitioned trade lake (trade_lake.py); markets are small enough to stay
+# single parquet files.
+
+async def crawl_to_parquet(client, endpoint, filename, batch_size=100_000):
+    """Page one endpoint into a parquet file, keeping only the endpoint schema's fields.
+
+    Args:
+        client:      Shared AsyncKalshiClient.
+        endpoint:    kalshi_paginator.Endpoint to crawl.
+        filename:    Output parquet file (replaced once the crawl completes).
+        batch_size:  Rows to buffer before flushing to disk.
+    """
+    path, items_key, schema = endpoint.path, endpoint.items_key, endpoint.schema
+    params = {'limit': LIMIT, **endpoint.params}
+    crawl_tmp = filename + '.tmp'
+    batches = []
+    rows = 0
+    total = 0
+    writer = None
+
+    def decode(content):
+        return kalshi_paginator.decode_page(content, items_key, schema)
+
+    def flush(to_write):
+        nonlocal writer
+        if writer is None:
+            writer = ProfileWriter(crawl_tmp, schema, get_profile())
+        writer.write_table(pa.Table.from_batches(to_write, schema=schema))
+
+    try:
+        pending_write = None
+        async for items, _ in client.paginate(path, params, decode=decode):
+            batches.append(items)
+            rows += items.num_rows
+            total += items.num_rows
+
+            if rows >= batch_size:
+                if pending_write is not None:
+                    await pending_write
+                pending_write = asyncio.create_task(asyncio.to_thread(flush, batches))
+                print(f"{path}: {total:,} {items_key} fetched, flushing {rows:,}")
+                batches = []
+                rows = 0
+
+        if pending_write is not None:
+            await pending_write
+        if rows or writer is None:
+            await asyncio.to_thread(flush, batches)
+
+    finally:
+        if writer is not None:
+            writer.close()
+
+    os.replace(crawl_tmp, filename)
+    print(f"{path}: completed, {total:,} {items_key} written to {filename}")
+    return total
+
+
+async def sync_trades_to_lake(client, lake_dir=DEFAULT_LAKE_DIR, overlap_seconds=SYNC_OVERLAP_SECONDS,
+                              batch_size=100_000):
+    """Append trades newer than the lake's high-water mark (see tradesPagination.sync_trades).
+
+    Args:
+        client:          Shared AsyncKalshiClient.
+        lake_dir:        Partitioned trade dataset directory (see trade_lake.py).
+        overlap_seconds: How far behind the high-water mark to start re-fetching.
+        batch_size:      Trades to buffer before flushing parts to disk.
+    """
+    manifest = Manifest(lake_dir)
+    manifest.remove_orphans()
+    index = TradeIdIndex(manifest)
+    stream, min_ts, cursor = sync_start(manifest, overlap_seconds)
+
+    params = {'limit': LIMIT, 'min_ts': min_ts}
+    batches = []
+    rows = 0
+    total = 0
+
+    pending_write = None
+    async for trades, cursor in client.paginate('/markets/trades', params, cursor=cursor, decode=decode_page):
+        trades = index.claim(trades)
+        batches.append(trades)
+        rows += trades.num_rows
+        total += trades.num_rows
+
+        if rows >= batch_size and cursor:
+            if pending_write is not None:
+                await pending_write
+            pending_write = asyncio.create_task(asyncio.to_thread(flush_batch, batches, index, stream, cursor))
+            print(f"/markets/trades: {total:,} new trades fetched, flushing {rows:,}")
+            batches = []
+            rows = 0
+
+    if pending_write is not None:
+        await pending_write
+    await asyncio.to_thread(flush_batch, batches, index, stream, None, True)
+
+    print(f"/markets/trades: completed, {total:,} new trades written to {lake_dir}")
+    return total
+
+
+async def crawl_all():
+    """Run the trades sync and the markets and combo markets crawls concurrently."""
+    async with AsyncKalshiClient() as client:
+        return await asyncio.gather(
+            sync_trades_to_lake(client),
+            crawl_to_parquet(client, MARKETS, 'kalshi_markets.parquet', batch_size=10_000),
+            crawl_to_parquet(client, COMBO_MARKETS, 'kalshi_combo_markets.parquet', batch_size=10_000),
+        )
+
+
+if __name__ == "__main__":
+    print("Starting trades sync and markets and combo markets crawls on one event loop...")
+    start = time.time()
+
+    trades, markets, combos = asyncio.run(crawl_all())
+
+    elapsed = time.time() - start
+    print(f"\nCompleted in {elapsed:.1f}s")
+    print(f"New trades: {trades:,} | Markets: {markets:,} | Combo markets: {combos:,}")
@@ -0,0 +1,155 @@
+import time
+import asyncio
+import json
+import httpx
+from rate_limiter import get_shared_limiter, retry_after_seconds
+from kalshi_paginator import BASE_URL
+from response_cache import get_shared_cache
+from ingest_metrics import get_shared_metrics
+
+
+# Async transport for the Kalshi REST API.
+#
+# A single AsyncKalshiClient holds one pool of persistent HTTP/2 connections,
+# so any number of pagination jobs running on the same event loop multiplex
+# their requests over a handful of TLS sessions instead of paying a handshake
+# per page. Retry/backoff semantics match kalshi_paginator.get_with_retry in
+# the sync scripts: 502s, timeouts and transport errors back off
+# exponentially, 429s pause every fetcher via the shared token bucket, and any
+# other status fails immediately. Responses are served from and stored in the
+# shared response cache, and attempts recorded in the shared ingest metrics,
+# the same way too.
+
+
+class AsyncKalshiClient:
+    """Shared async HTTP/2 client for every pagination job on one event loop."""
+
+    def __init__(self, base_url=BASE_URL, limiter=None, max_connections=4, timeout=30.0):
+        self.limiter = limiter if limiter is not None else get_shared_limiter()
+        self.base_url = base_url
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _acquire(self):
+        """Take a token from the shared bucket without blocking the event loop."""
+        while True:
+            # The bucket lives in a locked file shared with other processes,
+            # so touch it from a worker thread rather than on the loop
+            wait = await asyncio.to_thread(self.limiter.try_acquire)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def get_json(self, path, params=None):
+        """GET path and return the decoded JSON body."""
+        return json.loads(await self.get_bytes(path, params))
+
+    async def get_bytes(self, path, params=None, max_retries=5, initial_backoff=1.0):
+        """GET path and return the raw response body, retrying on transient errors."""
+        metrics = get_shared_metrics()
+        cache = get_shared_cache()
+        url = f"{self.base_url}{path}"
+        if cache is not None:
+            content = cache.get(url, params)
+            if content is not None:
+                metrics.request('cache', 0.0, len(content))
+                return content
+
+        backoff = initial_backoff
+        for attempt in range(max_retries):
+            start = time.perf_counter()
+            waited = 0.0
+            retrying = attempt < max_retries - 1
+            try:
+                await self._acquire()
+                waited = time.perf_counter() - start
+                response = await self._client.get(path, params=params)
+                metrics.request(response.status_code, time.perf_counter() - start - waited, len(response.content),
+                                rate_wait=waited, retried=retrying and response.status_code in (429, 502))
+
+                if response.status_code == 200:
+                    if cache is not None:
+                        cache.put(url, params, response.content)
+                    return response.content
+
+                if response.status_code == 429:
+                    if attempt < max_retries - 1:
+                        wait = retry_after_seconds(response, backoff)
+                        print(f"429 Too Many Requests on {path} (attempt {attempt + 1}/{max_retries}). Pausing {wait:.1f}s...")
+                        await asyncio.to_thread(self.limiter.pause, wait)
+                        backoff *= 2
+                        continue
+                    raise Exception(f"Persistent 429 after {max_retries} attempts.")
+
+                if response.status_code == 502:
+                    if attempt < max_retries - 1:
+                        print(f"502 Bad Gateway on {path} (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
+                        await asyncio.sleep(backoff)
+                        backoff *= 2
+                        continue
+                    raise Exception(f"Persistent 502 after {max_retries} attempts.")
+
+                raise Exception(f"HTTP {response.status_code}: {response.text}")
+
+            except httpx.TimeoutException:
+                metrics.request('timeout', time.perf_counter() - start - waited, rate_wait=waited, retried=retrying)
+                if attempt < max_retries - 1:
+                    print(f"Timeout on {path} (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+                    continue
+                raise Exception(f"Timeout after {max_retries} attempts.")
+
+            except httpx.TransportError as e:
+                metrics.request('error', time.perf_counter() - start - waited, rate_wait=waited, retried=retrying)
+                if attempt < max_retries - 1:
+                    print(f"Request error on {path}: {e} (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+                    continue
+                raise Exception(f"Request failed after {max_retries} attempts: {e}")
+
+        raise Exception(f"Failed after {max_retries} attempts")
+
+    async def paginate(self, path, params=None, cursor=None, decode=None):
+        """Yield (page, next cursor) for every page of a cursor-paginated endpoint.
+
+        decode turns the raw body into (page, cursor); by default the page is
+        the parsed JSON dict. The request for page n+1 is issued as soon as
+        page n's cursor is known, so it is in flight while the caller is still
+        processing page n.
+        """
+        params = dict(params or {})
+        if decode is None:
+            def decode(content):
+                data = json.loads(content)
+                return data, data.get('cursor')
+
+        def page_params(c):
+            return {**params, 'cursor': c} if c else params
+
+        pending = asyncio.ensure_future(self.get_bytes(path, page_params(cursor)))
+        try:
+            while pending is not None:
+                page, cursor = decode(await pending)
+                pending = asyncio.ensure_future(self.get_bytes(path, page_params(cursor))) if cursor else None
+                yield page, cursor
+        finally:
+            if pending is not None:
+                pending.cancel()
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from mock_server import add_server_args, build_server, base_url
+
+
+# Throughput benchmark for the fetchers, run against mock_server.py so it
+# needs no network and gives the same numbers on every run.
+#
+# Each fetcher runs in a fresh subprocess (so peak RSS is its own) in a
+# scratch directory, pointed at the mock server through KALSHI_BASE_URL and
+# given its own rate limiter state file. The server's counters give pages
+# served and retries (429s, 502s and dropped requests the fetcher had to
+# retry); the subprocess reports rows written, wall time and peak RSS.
+#
+# Usage:
+#   python bench_ingest.py
+#   python bench_ingest.py --trades 1000000 --latency 0.02 --error-rate 0.01 --only trades_sequential
+#   python bench_ingest.py --json bench.json     # machine-readable results for CI
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name -> code run in the subprocess; must leave the row count in `rows`.
+# {start_ts}/{end_ts} are the synthetic trades' time range.
+FETCHERS = {
+    'trades_sequential': (
+        "import tradesPagination as m\n"
+        "rows = m.get_all_trades_batched(lake_dir='lake', batch_size=100_000)"
+    ),
+    'trades_windowed': (
+        "import tradesPagination as m\n"
+        "rows = m.get_all_trades_windowed(lake_dir='lake', start_ts={start_ts}, end_ts={end_ts},\n"
+        "                                 window_seconds=({end_ts} - {start_ts}) // 16 + 1, max_workers=8)"
+    ),
+    'trades_by_ticker': (
+        "import tradesPagination as m\n"
+        "tickers = [f'KXSYN-{{i:06d}}-{{j}}' for i in range(50) for j in range(10)]\n"
+        "rows = m.get_trades_for_tickers(tickers, lake_dir='lake', max_workers=8)"
+    ),
+    'markets': (
+        "import totalMarketPagination as m\n"
+        "rows = m.get_all_markets_batched(filename='markets.parquet', cursor_file='cursor.json',\n"
+        "                                 metadata_file='metadata.json')"
+    ),
+    'all_markets': (
+        "import allMarketsPagination as m\n"
+        "rows = m.get_all_markets_batched(filename='all_markets.parquet', cursor_file='cursor.json',\n"
+        "                                 metadata_file='metadata.json')"
+    ),
+    'async_crawl': (
+        "import asyncio, asyncPagination as m\n"
+        "rows = sum(asyncio.run(m.crawl_all()))"
+    ),
+}
+
+RUNNER = '''
+import io, sys, json, time, resource, contextlib
+start = time.perf_counter()
+log = io.StringIO()
+with contextlib.redirect_stdout(log):
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'rows': rows, 'seconds': elapsed,
+                  'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+'''
+
+
+def server_stats(url, reset=False):
+    root = url.split('/trade-api')[0]
+    with urllib.request.urlopen(f"{root}/{'__reset' if reset else '__stats'}") as response:
+        return json.loads(response.read())
+
+
+def run_fetcher(name, code, url, client_rate, verbose=False):
+    """Run one fetcher in a scratch directory; returns its result row."""
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    env = {
+        **os.environ,
+        'KALSHI_BASE_URL': url,
+        'KALSHI_RATE_LIMIT': str(client_rate),
+        'KALSHI_RATE_STATE_FILE': os.path.join(workdir, 'rate_limiter.json'),
+        'KALSHI_CACHE_MODE': 'off',
+        'PYTHONPATH': HERE + os.pathsep + os.environ.get('PYTHONPATH', ''),
+    }
+    indented = '\n'.join('    ' + line for line in code.splitlines())
+    server_stats(url, reset=True)
+    try:
+        proc = subprocess.run([sys.executable, '-c', RUNNER.format(code=indented)],
+                              cwd=workdir, env=env, capture_output=True, text=True)
+        stats = server_stats(url)
+        if proc.returncode != 0:
+            if verbose:
+                print(proc.stderr)
+            return {'fetcher': name, 'error': proc.stderr.strip().splitlines()[-1] if proc.stderr else 'failed'}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss_mb = result['maxrss'] / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+    seconds = result['seconds']
+    return {
+        'fetcher':   name,
+        'rows':      result['rows'],
+        'pages':     stats['ok'],
+        'seconds':   round(seconds, 3),
+        'pages_s':   round(stats['ok'] / seconds, 1),
+        'rows_s':    round(result['rows'] / seconds, 1),
+        'peak_rss_mb': round(rss_mb, 1),
+        'retries':   stats['rate_limited'] + stats['errors'] + stats['timeouts'],
+        'rate_limited': stats['rate_limited'],
+        'errors':    stats['errors'],
+        'timeouts':  stats['timeouts'],
+    }
+
+
+def print_report(results):
+    print(f"\n{'fetcher':<18} {'rows':>10} {'pages':>7} {'secs':>8} {'pages/s':>9} {'rows/s':>11} "
+          f"{'peak MB':>8} {'retries':>8}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['fetcher']:<18} failed: {r['error']}")
+            continue
+        print(f"{r['fetcher']:<18} {r['rows']:>10,} {r['pages']:>7,} {r['seconds']:>8.2f} {r['pages_s']:>9,.1f} "
+              f"{r['rows_s']:>11,.0f} {r['peak_rss_mb']:>8.1f} {r['retries']:>8,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Kalshi fetchers against mock_server.py")
+    add_server_args(parser)
+    parser.add_argument('--client-rate', type=float, default=1000.0,
+                        help="fetchers' token bucket rate in requests/s (18 matches production)")
+    parser.add_argument('--only', nargs='+', choices=sorted(FETCHERS), help='fetchers to run (default: all)')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help="print a failing fetcher's traceback")
+    args = parser.parse_args()
+
+    print("Starting mock server...")
+    server = build_server(args, port=0)
+    url = base_url(server)
+    data = server.data
+    fmt = {'start_ts': getattr(data, 'start_ts', 0), 'end_ts': getattr(data, 'end_ts', int(time.time()))}
+
+    results = []
+    for name in args.only or FETCHERS:
+        print(f"Running {name}...")
+        results.append(run_fetcher(name, FETCHERS[name].format(**fmt), url, args.client_rate, args.verbose))
+    server.shutdown()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
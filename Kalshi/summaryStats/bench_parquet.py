@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from datetime import timedelta
+import numpy as np
+import pyarrow as pa
+import duckdb
+from trade_lake import SCHEMA, write_part, lake_glob, list_parts
+from parquet_profiles import PROFILES
+
+
+# File size and DuckDB scan time of the trade lake under each parquet writer
+# profile (parquet_profiles.py), on synthetic trades so every run is
+# comparable and nothing needs fetching.
+#
+# Every profile is benchmarked in two layouts:
+#   append     the lake as the fetchers leave it: one part per flush of
+#              --batch-size rows, newest trades first (API order)
+#   compacted  one part per month, as a compaction leaves it
+#
+# and timed (best of --repeat) on the queries behind our charts plus two
+# selective lookups that only pay off with good row-group statistics.
+#
+# Usage:
+#   python bench_parquet.py
+#   python bench_parquet.py --trades 5000000 --profiles fast-append scan-optimized
+#   python bench_parquet.py --json bench_parquet.json
+
+# name -> SQL over {glob}; {ticker}, {week_start} and {week_end} are filled in
+# from the synthetic data
+QUERIES = {
+    'fee_rev_monthly': """
+        SELECT date_trunc('MONTH', created_time)::DATE AS MONTH
+             , SUM(CEIL(.07 * count * yes_price_dollars::FLOAT * (1 - yes_price_dollars::FLOAT) * 100) / 100) AS fees
+        FROM read_parquet('{glob}', hive_partitioning = true)
+        WHERE created_month >= '2024-01'
+        GROUP BY 1 ORDER BY 1 DESC""",
+    'imp_prob_bands': """
+        SELECT date_trunc('MONTH', created_time)::DATE AS MONTH
+             , CASE WHEN yes_price_dollars < 0.20 THEN 'a' WHEN yes_price_dollars < 0.40 THEN 'b'
+                    WHEN yes_price_dollars < 0.60 THEN 'c' WHEN yes_price_dollars < 0.80 THEN 'd'
+                    ELSE 'e' END AS band
+             , SUM(count) AS total_contracts
+        FROM read_parquet('{glob}', hive_partitioning = true)
+        WHERE created_month >= '2024-01'
+        GROUP BY 1, 2""",
+    'contracts_per_trade': """
+        SELECT date_trunc('MONTH', created_time)::DATE AS MONTH
+             , SUM(count)::FLOAT / COUNT(*), MEDIAN(count)
+        FROM read_parquet('{glob}', hive_partitioning = true)
+        GROUP BY 1 ORDER BY 1""",
+    'weekly_overall': """
+        SELECT date_trunc('WEEK', created_time)::DATE AS WEEK, COUNT(1), SUM(count)
+        FROM read_parquet('{glob}', hive_partitioning = true)
+        GROUP BY 1 ORDER BY 1 DESC""",
+    'one_ticker': """
+        SELECT COUNT(*), SUM(count)
+        FROM read_parquet('{glob}', hive_partitioning = true)
+        WHERE ticker = '{ticker}'""",
+    'one_week': """
+        SELECT ticker, SUM(count)
+        FROM read_parquet('{glob}', hive_partitioning = true)
+        WHERE created_time >= '{week_start}' AND created_time < '{week_end}'
+        GROUP BY 1""",
+}
+
+LAYOUTS = ('append', 'compacted')
+
+
+def synthetic_trades(n_trades, n_tickers=20_000, months=24, seed=7):
+    """n_trades trades over the last `months` months, newest first, with a skewed ticker mix."""
+    rng = np.random.default_rng(seed)
+    end = int(time.time())
+    start = end - months * 30 * 86400
+    created = np.sort(rng.integers(start, end, n_trades))[::-1] * 1_000_000
+    tickers = np.array([f"KXBENCH{i // 40:04d}-25JAN{i % 28 + 1:02d}-B{i:05d}" for i in range(n_tickers)])
+    popularity = rng.zipf(1.3, n_trades) % n_tickers
+    ids = rng.integers(0, 2 ** 63, (n_trades, 2), dtype=np.int64).view(np.uint64)
+    return pa.table({
+        'trade_id':          [f"{a:016x}{b:016x}" for a, b in ids],
+        'ticker':            pa.array(tickers[popularity]).dictionary_encode(),
+        'count':             rng.geometric(0.02, n_trades).astype(np.int64),
+        'yes_price_dollars': pa.array(rng.integers(1, 100, n_trades) / 100).cast(pa.decimal128(6, 4)),
+        'taker_side':        pa.array(np.where(rng.random(n_trades) < 0.5, 'yes', 'no')).dictionary_encode(),
+        'created_time':      pa.array(created, pa.timestamp('us', tz='UTC')),
+    }).cast(SCHEMA)
+
+
+def build_lake(table, lake_dir, profile, layout, batch_size):
+    """Write table into a fresh lake; returns seconds spent writing."""
+    start = time.perf_counter()
+    if layout == 'append':
+        for offset in range(0, table.num_rows, batch_size):
+            write_part(lake_dir, table.slice(offset, batch_size), profile=profile)
+    else:
+        write_part(lake_dir, table, profile=profile)
+    return time.perf_counter() - start
+
+
+def time_queries(lake_dir, params, repeat):
+    """Best-of-repeat seconds for every query in QUERIES."""
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC'")
+    times = {}
+    for name, sql in QUERIES.items():
+        sql = sql.format(glob=lake_glob(lake_dir), **params)
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            con.execute(sql).fetchall()
+            best = min(best, time.perf_counter() - start)
+        times[name] = round(best, 4)
+    con.close()
+    return times
+
+
+def lake_size(lake_dir):
+    return sum(os.path.getsize(p) for p in list_parts(lake_dir))
+
+
+def print_report(results):
+    names = list(QUERIES)
+    print(f"\n{'profile':<15} {'layout':<10} {'parts':>6} {'MB':>8} {'write s':>8} "
+          + ' '.join(f"{n[:14]:>14}" for n in names))
+    for r in results:
+        print(f"{r['profile']:<15} {r['layout']:<10} {r['parts']:>6,} {r['size_mb']:>8.1f} {r['write_s']:>8.2f} "
+              + ' '.join(f"{r['queries'][n] * 1000:>12.1f}ms" for n in names))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare parquet writer profiles on size and DuckDB scan time")
+    parser.add_argument('--trades', type=int, default=2_000_000, help='synthetic trades to write')
+    parser.add_argument('--batch-size', type=int, default=100_000, help='rows per part in the append layout')
+    parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES), default=sorted(PROFILES))
+    parser.add_argument('--layouts', nargs='+', choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument('--repeat', type=int, default=3, help='runs per query (best is reported)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    print(f"Generating {args.trades:,} synthetic trades...")
+    table = synthetic_trades(args.trades)
+    counts = table.group_by('ticker').aggregate([('count', 'count')]).sort_by('count_count')
+    mid = table.column('created_time')[table.num_rows // 2].as_py()
+    params = {
+        'ticker':     counts.column('ticker')[counts.num_rows // 2].as_py(),   # a mid-popularity market
+        'week_start': mid.isoformat(),
+        'week_end':   (mid + timedelta(days=7)).isoformat(),
+    }
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='bench-parquet-')
+    try:
+        for profile in args.profiles:
+            for layout in args.layouts:
+                print(f"Writing {profile} / {layout}...")
+                lake_dir = os.path.join(workdir, f"{profile}-{layout}")
+                write_s = build_lake(table, lake_dir, profile, layout, args.batch_size)
+                results.append({
+                    'profile': profile,
+                    'layout':  layout,
+                    'parts':   len(list_parts(lake_dir)),
+                    'size_mb': round(lake_size(lake_dir) / 1024 ** 2, 2),
+                    'write_s': round(write_s, 3),
+                    'queries': time_queries(lake_dir, params, args.repeat),
+                })
+                shutil.rmtree(lake_dir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
@@ -0,0 +1,220 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+
+# Crash-safe checkpoints for the market crawls, in one SQLite database.
+#
+#   kalshi_checkpoints.sqlite
+#     streams     (job, stream) -> cursor, parts, rows, done   resume point of one cursor chain
+#     parts       (job, stream, seq) -> path, rows              staged part files, in order
+#     watermarks  (job, name) -> JSON value                     run start, last successful run, ...
+#
+# A job is one resumable crawl, named after the cursor (or metadata) file it
+# used to keep, so every call site keeps its identity. Committing a flush
+# updates that stream's cursor and records the part it just staged in one
+# transaction — only the stream that flushed is touched, so any number of
+# streams and threads commit concurrently without rewriting each other's
+# state, and a crash leaves a commit either whole or absent.
+#
+# The database runs in WAL mode with synchronous=NORMAL: a commit is an
+# append to the write-ahead log and fsyncs are batched at WAL checkpoints
+# instead of paid per commit. A power cut can lose the last few commits but
+# never corrupts the store; the staged parts those commits referred to are
+# dropped and re-fetched on resume.
+#
+# A JSON cursor or metadata file from before the store is imported the first
+# time its job is read, then left where it is.
+#
+# The trade lake keeps its own commit log (trade_lake.Manifest), written
+# alongside the parts it describes.
+
+DEFAULT_DB = 'kalshi_checkpoints.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS streams (
+    job        TEXT NOT NULL,
+    stream     TEXT NOT NULL,
+    cursor     TEXT,
+    parts      INTEGER NOT NULL DEFAULT 0,
+    rows       INTEGER NOT NULL DEFAULT 0,
+    done       INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (job, stream)
+);
+CREATE TABLE IF NOT EXISTS parts (
+    job    TEXT NOT NULL,
+    stream TEXT NOT NULL,
+    seq    INTEGER NOT NULL,
+    path   TEXT NOT NULL,
+    rows   INTEGER NOT NULL,
+    PRIMARY KEY (job, stream, seq)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    job        TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (job, name)
+);
+"""
+
+
+class CheckpointStore:
+    """Cursors, staged-part manifests and watermarks of every crawl, shared by all threads."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _transaction(self, statements):
+        """Run [(sql, params)] atomically."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._db.execute(sql, params)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # -- streams ------------------------------------------------------------
+
+    def commit(self, job, stream, cursor, parts, done=False, part=None, rows=0):
+        """Record a flush: the stream's next cursor, its part count and the part just staged.
+
+        Args:
+            job:    Crawl the stream belongs to.
+            stream: Stream name within the job.
+            cursor: Cursor to resume the stream from (None once done).
+            parts:  Staged parts the stream has written, including this one.
+            done:   The stream has been paged to the end.
+            part:   Path of the part this flush staged (None if it staged none).
+            rows:   Rows in that part.
+        """
+        now = datetime.now().isoformat()
+        statements = [(
+            "INSERT INTO streams (job, stream, cursor, parts, rows, done, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (job, stream) DO UPDATE SET cursor = excluded.cursor, parts = excluded.parts, "
+            "rows = streams.rows + excluded.rows, done = excluded.done, updated_at = excluded.updated_at",
+            (job, stream, cursor, parts, rows, int(done), now),
+        )]
+        if part is not None:
+            statements.append(("INSERT OR REPLACE INTO parts (job, stream, seq, path, rows) VALUES (?, ?, ?, ?, ?)",
+                               (job, stream, parts - 1, part, rows)))
+        self._transaction(statements)
+
+    def streams(self, job):
+        """{stream: {'cursor', 'parts', 'rows', 'done'}} of a job."""
+        return {stream: {'cursor': cursor, 'parts': parts, 'rows': rows, 'done': bool(done)}
+                for stream, cursor, parts, rows, done in self._query(
+                    "SELECT stream, cursor, parts, rows, done FROM streams WHERE job = ?", (job,))}
+
+    def replace_stream(self, job, stream, streams, watermarks=None):
+        """Swap one stream of a job for new ones in a single transaction.
+
+        Args:
+            job:        Crawl the streams belong to.
+            stream:     Stream to drop, together with its staged parts.
+            streams:    {name: cursor} of the streams replacing it (None: start from the beginning).
+            watermarks: Watermarks to set on job in the same transaction.
+        """
+        now = datetime.now().isoformat()
+        statements = [("DELETE FROM streams WHERE job = ? AND stream = ?", (job, stream)),
+                      ("DELETE FROM parts WHERE job = ? AND stream = ?", (job, stream))]
+        statements += [("INSERT OR REPLACE INTO streams (job, stream, cursor, parts, rows, done, updated_at) "
+                        "VALUES (?, ?, ?, 0, 0, 0, ?)", (job, name, cursor, now))
+                       for name, cursor in streams.items()]
+        statements += [("INSERT OR REPLACE INTO watermarks (job, name, value, updated_at) VALUES (?, ?, ?, ?)",
+                        (job, name, json.dumps(value), now)) for name, value in (watermarks or {}).items()]
+        self._transaction(statements)
+
+    def part_files(self, job, stream):
+        """Paths of a stream's committed parts, in order."""
+        return [path for path, in self._query(
+            "SELECT path FROM parts WHERE job = ? AND stream = ? ORDER BY seq", (job, stream))]
+
+    # -- watermarks ---------------------------------------------------------
+
+    def set_watermarks(self, job, values, clear=None):
+        """Set watermarks on job, optionally clearing another job's state in the same transaction."""
+        now = datetime.now().isoformat()
+        statements = [("INSERT OR REPLACE INTO watermarks (job, name, value, updated_at) VALUES (?, ?, ?, ?)",
+                       (job, name, json.dumps(value), now)) for name, value in values.items()]
+        if clear is not None:
+            statements += self._clear_statements(clear)
+        self._transaction(statements)
+
+    def watermarks(self, job):
+        return {name: json.loads(value) for name, value in self._query(
+            "SELECT name, value FROM watermarks WHERE job = ?", (job,))}
+
+    # -- jobs ---------------------------------------------------------------
+
+    def _clear_statements(self, job):
+        return [(f"DELETE FROM {table} WHERE job = ?", (job,)) for table in ('streams', 'parts', 'watermarks')]
+
+    def clear(self, job):
+        """Forget everything about a job."""
+        self._transaction(self._clear_statements(job))
+
+    def load(self, job):
+        """A job's {'streams', 'watermarks'}, or None if nothing is saved for it.
+
+        If the store has nothing but job names a JSON checkpoint file from
+        before the store, that file is imported first.
+        """
+        streams, watermarks = self.streams(job), self.watermarks(job)
+        if not streams and not watermarks and self._import_legacy(job):
+            streams, watermarks = self.streams(job), self.watermarks(job)
+        if not streams and not watermarks:
+            return None
+        return {'streams': streams, 'watermarks': watermarks}
+
+    def _import_legacy(self, job):
+        if not (job.endswith('.json') and os.path.exists(job)):
+            return False
+        with open(job) as f:
+            try:
+                legacy = json.load(f)
+            except json.JSONDecodeError:
+                return False
+        if 'streams' in legacy or 'cursor' in legacy:
+            streams = legacy.get('streams') or {None: {'cursor': legacy['cursor'], 'parts': legacy.get('parts', 0)}}
+            for name, state in streams.items():
+                self.commit(job, name or '', state['cursor'], state.get('parts', 0), done=state.get('done', False))
+            marks = {k: legacy[k] for k in ('min_created_ts', 'run_started') if legacy.get(k) is not None}
+        else:
+            marks = {k: v for k, v in legacy.items() if k in ('last_run_unix', 'last_run_timestamp')}
+        if marks:
+            self.set_watermarks(job, marks)
+        print(f"Imported checkpoint {job} into {self.path}")
+        return True
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_checkpoint_store():
+    """Return the process-wide CheckpointStore (KALSHI_CHECKPOINT_DB overrides its path)."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = CheckpointStore(os.environ.get('KALSHI_CHECKPOINT_DB', DEFAULT_DB))
+        return _shared_store
@@ -0,0 +1,199 @@
+import os
+import time
+import uuid
+import shutil
+import argparse
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import defaultdict
+from trade_lake import SCHEMA, DEFAULT_LAKE_DIR, PARTITION_KEY, Manifest, part_month
+from trade_id_index import TradeIdIndex
+from parquet_profiles import ProfileWriter, get_profile, row_group_rows
+
+
+# Sort-and-cluster compaction of the trade lake.
+#
+# Fetchers append parts in API cursor order, a flush at a time, so every
+# part's row groups span whatever range of created_time and tickers that
+# flush happened to hold, and a month accumulates hundreds of small parts.
+# Compaction rewrites a month's parts as a few large ones sorted by
+# (created_time, ticker), written with the scan-optimized profile: row groups
+# of ~128 MB whose created_time ranges don't overlap, so DuckDB skips every
+# row group outside a time filter from the footer statistics alone.
+#
+#   created_month=2024-01/
+#     part-compact-1770608928123-3f9c1a2b-000.parquet    sorted, FILE_ROW_GROUPS row groups
+#     part-compact-1770608928123-3f9c1a2b-001.parquet
+#     part-sequential-...parquet                         appended since the last compaction
+#
+# Incremental by default: a month is only rewritten when it has parts that
+# haven't been compacted yet, and then only those plus any small compacted
+# parts (e.g. the last, partial part of the previous run) are merged — large
+# compacted parts are left alone. New trades are mostly newer than everything
+# already compacted, so the new sorted parts sit after the old ones in time
+# and pruning stays tight. --full re-sorts every part of every month (e.g.
+# after changing the profile).
+#
+# The sort runs in DuckDB, which spills to disk, so a month bigger than
+# memory is fine. The replacement parts and the parts they supersede swap in
+# one manifest commit (see trade_lake.py); the superseded files are deleted
+# right after, or as orphans by the next writer if we crash first. Like any
+# writer, don't run it while a fetch is writing to the same lake.
+#
+# Usage:
+#   python compact_trades.py
+#   python compact_trades.py --months 2024-01 2024-02 --full
+#   python compact_trades.py --lake-dir kalshi_trades --memory-limit 8GB
+
+COMPACT_STREAM  = 'compact'
+COMPACT_PREFIX  = 'part-compact-'
+PROFILE         = 'scan-optimized'
+SORT_COLUMNS    = ['created_time', 'ticker']
+# Row groups per compacted part; with ~128 MB row groups a part is a few
+# hundred MB on disk
+FILE_ROW_GROUPS = 8
+# Compacted parts smaller than this are merged again when their month gets new parts
+SMALL_PART_BYTES = 64 * 1024 * 1024
+READ_BATCH_ROWS = 262_144
+DEFAULT_MEMORY_LIMIT = '4GB'
+
+
+def is_compacted(path):
+    return os.path.basename(path).startswith(COMPACT_PREFIX)
+
+
+def plan_month(parts, full=False):
+    """The parts of one month to merge, or [] when the month needs no work."""
+    if full:
+        return parts
+    new = [p for p in parts if not is_compacted(p)]
+    if not new:
+        return []
+    return new + [p for p in parts if is_compacted(p) and os.path.getsize(p) < SMALL_PART_BYTES]
+
+
+def sorted_batches(con, parts):
+    """Stream the trades of parts as record batches sorted by SORT_COLUMNS."""
+    columns = ', '.join(f'"{c}"' for c in SCHEMA.names)
+    order = ', '.join(f'"{c}"' for c in SORT_COLUMNS)
+    return con.execute(f"""
+        SELECT {columns}
+        FROM read_parquet(?, hive_partitioning = false)
+        ORDER BY {order}
+    """, [parts]).fetch_record_batch(READ_BATCH_ROWS)
+
+
+def write_sorted(batches, part_dir, profile):
+    """Write sorted batches into new parts of FILE_ROW_GROUPS row groups each.
+
+    Parts are written under .tmp names; returns (tmp paths, final paths, rows).
+    """
+    stem = f"{COMPACT_PREFIX}{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+    tmps, paths = [], []
+    writer = None
+    file_rows = in_file = rows = 0
+    try:
+        for batch in batches:
+            table = pa.Table.from_batches([batch]).cast(SCHEMA)
+            if not file_rows:
+                file_rows = (row_group_rows(table, profile) or table.num_rows) * FILE_ROW_GROUPS
+            while table.num_rows:
+                if writer is None:
+                    paths.append(os.path.join(part_dir, f"{stem}-{len(paths):03d}.parquet"))
+                    tmps.append(paths[-1] + '.tmp')
+                    writer = ProfileWriter(tmps[-1], SCHEMA, profile)
+                take = table.slice(0, file_rows - in_file)
+                writer.write_table(take)
+                in_file += take.num_rows
+                rows += take.num_rows
+                table = table.slice(take.num_rows)
+                if in_file >= file_rows:
+                    writer.close()
+                    writer = None
+                    in_file = 0
+        if writer is not None:
+            writer.close()
+    except Exception:
+        if writer is not None:
+            writer.close()
+        for tmp in tmps:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+    return tmps, paths, rows
+
+
+def compact_month(index, con, month, parts, profile):
+    """Replace parts (all in one month) with sorted, clustered parts. Returns rows rewritten."""
+    expected = sum(pq.ParquetFile(p).metadata.num_rows for p in parts)
+    part_dir = os.path.join(index.manifest.lake_dir, f"{PARTITION_KEY}={month}")
+    tmps, paths, rows = write_sorted(sorted_batches(con, parts), part_dir, profile)
+    if rows != expected:
+        for tmp in tmps:
+            os.remove(tmp)
+        raise Exception(f"Compacting {month} wrote {rows:,} trades, expected {expected:,}")
+
+    for tmp, path in zip(tmps, paths):
+        os.replace(tmp, path)   # atomic on POSIX; orphans until the commit below
+    index.commit(COMPACT_STREAM, paths, SCHEMA.empty_table(), cursor=None, done=True, replaces=parts)
+    for path in parts:
+        os.remove(path)
+    return rows
+
+
+def compact_lake(lake_dir=DEFAULT_LAKE_DIR, months=None, full=False, profile=PROFILE,
+                 memory_limit=DEFAULT_MEMORY_LIMIT):
+    """Compact every month of the lake that has new parts.
+
+    Args:
+        lake_dir:     Trade lake to compact.
+        months:       Only these created_month values (default: all).
+        full:         Re-sort every part, not just new and small ones.
+        profile:      parquet_profiles writer profile for the new parts.
+        memory_limit: DuckDB memory limit for the sort; beyond it DuckDB spills to disk.
+
+    Returns the number of months compacted.
+    """
+    manifest = Manifest(lake_dir)
+    manifest.remove_orphans()
+    index = TradeIdIndex(manifest)   # catches up first, so no replaced part is still unindexed
+    profile = get_profile(profile)
+
+    by_month = defaultdict(list)
+    for path in manifest.files():
+        by_month[part_month(path)].append(path)
+
+    spill_dir = os.path.join(lake_dir, '_compact_spill')
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC'")
+    con.execute(f"SET memory_limit = '{memory_limit}'")
+    con.execute(f"SET temp_directory = '{spill_dir}'")
+    compacted = 0
+    try:
+        for month in sorted(by_month):
+            if months and month not in months:
+                continue
+            parts = plan_month(by_month[month], full)
+            if not parts:
+                continue
+            start = time.time()
+            rows = compact_month(index, con, month, parts, profile)
+            compacted += 1
+            print(f"Compacted {month}: {len(parts):,} part(s), {rows:,} trades in {time.time() - start:.1f}s")
+    finally:
+        con.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    print(f"Compaction complete: {compacted} month(s) rewritten")
+    return compacted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sort and cluster the trade lake's parts by (created_time, ticker)")
+    parser.add_argument('--lake-dir', default=DEFAULT_LAKE_DIR)
+    parser.add_argument('--months', nargs='+', help='created_month values to compact (default: all)')
+    parser.add_argument('--full', action='store_true', help='re-sort every part, not just new and small ones')
+    parser.add_argument('--memory-limit', default=DEFAULT_MEMORY_LIMIT, help="DuckDB memory limit, e.g. '8GB'")
+    args = parser.parse_args()
+    compact_lake(args.lake_dir, months=args.months, full=args.full, memory_limit=args.memory_limit)
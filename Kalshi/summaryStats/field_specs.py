@@ -0,0 +1,67 @@
+import pyarrow as pa
+
+
+# Which fields we keep from each Kalshi endpoint, and how they're stored.
+#
+# Every fetcher builds its Arrow schema from these specs, and the schema's
+# field names are the projection pushed into the JSON decoder — every other
+# field in a response is skipped by the parser. Adding a column is a one-line
+# change here; to fill it in for rows already on disk without re-crawling,
+# backfill it from a raw capture (see raw_capture.py).
+#
+# Type names:
+#   string, int64, float64, bool   the Arrow type of the same name
+#   dict                           dictionary-encoded string (low-cardinality text)
+#   decimal(P,S)                   exact decimal, e.g. '0.5600' -> decimal(6,4)
+#   timestamp                      ISO-8601 string -> timestamp[us, UTC]
+
+FIELD_SPECS = {
+    'markets': {
+        'ticker':       'string',
+        'event_ticker': 'string',
+        'result':       'string',
+        'status':       'string',
+        'volume':       'int64',
+        'open_time':    'string',
+        'close_time':   'string',
+        'liquidity':    'int64',
+        'market_type':  'string',
+    },
+    'trades': {
+        'trade_id':          'string',
+        'ticker':            'dict',
+        'count':             'int64',
+        'yes_price_dollars': 'decimal(6,4)',
+        'taker_side':        'dict',
+        'created_time':      'timestamp',
+    },
+}
+
+_SIMPLE_TYPES = {
+    'string':    pa.string(),
+    'int64':     pa.int64(),
+    'float64':   pa.float64(),
+    'bool':      pa.bool_(),
+    'dict':      pa.dictionary(pa.int32(), pa.string()),
+    'timestamp': pa.timestamp('us', tz='UTC'),
+}
+
+
+def arrow_type(name):
+    """Arrow type for a spec type name."""
+    if name in _SIMPLE_TYPES:
+        return _SIMPLE_TYPES[name]
+    if name.startswith('decimal(') and name.endswith(')'):
+        precision, scale = (int(x) for x in name[len('decimal('):-1].split(','))
+        return pa.decimal128(precision, scale)
+    raise Exception(f"Unknown field type in spec: {name}")
+
+
+def schema_from_spec(spec):
+    """Arrow schema for a {field: type name} spec, in spec order."""
+    return pa.schema([(field, arrow_type(type_name)) for field, type_name in spec.items()])
+
+
+def endpoint_schema(name, extra=None):
+    """Schema of FIELD_SPECS[name], optionally widened with extra {field: type name}."""
+    return schema_from_spec({**FIELD_SPECS[name], **(extra or {})})
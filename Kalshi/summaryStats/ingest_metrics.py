@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import bisect
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+
+# Ingest telemetry for long crawls: request latency percentiles, retries by
+# status, bytes/s, the writer's queue depth, progress and ETA, plus a guess at
+# what the crawl is bound by.
+#
+# Every fetcher records into one process-wide IngestMetrics
+# (get_shared_metrics()): get_with_retry and the async client per request
+# attempt, commit_table per flush, crawl_stream per page and per pipeline
+# queue. While a crawl runs, a reporter thread wakes every `interval` seconds
+# and
+#
+#   - prints one dashboard line:
+#       trades 1,204,000 | 17.9 req/s | p50 182ms p99 1.20s | retries 429:3 | 2.4 MB/s
+#       | write q 1/1 | 37.2% ETA 5h12m | bound: rate limit
+#   - rewrites the JSON snapshot (KALSHI_METRICS_FILE), and
+#   - rewrites a Prometheus textfile (KALSHI_METRICS_PROM_FILE), for
+#     node_exporter's textfile collector
+#
+# Both files are written under a .tmp name and renamed, so a reader never
+# sees half a file. Configure from the environment or configure_metrics():
+#
+#   KALSHI_METRICS_FILE=ingest_metrics.json KALSHI_METRICS_INTERVAL=30 python tradesPagination.py
+#
+# "bound" compares where the fetch threads spent the last interval: waiting
+# on the token bucket (rate limit), waiting on responses (network), or
+# blocked because the decode/write stages behind them were full (disk/cpu).
+#
+# Progress is measured in time covered: trades are paged newest first, so a
+# stream that pages [lo, hi) is done once its oldest trade reaches lo. ETA
+# extrapolates the progress made over the last ETA_WINDOW seconds.
+
+DEFAULT_INTERVAL = 10.0
+# Latency samples kept for percentiles (the most recent ones)
+LATENCY_SAMPLES  = 4096
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS  = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ETA_WINDOW       = 600.0
+PROM_PREFIX      = 'kalshi_ingest'
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _duration(seconds):
+    if seconds is None:
+        return '?'
+    seconds = int(seconds)
+    if seconds >= 86400:
+        return f"{seconds // 86400}d{seconds % 86400 // 3600}h"
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def _ms(seconds):
+    if seconds is None:
+        return '-'
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+class IngestMetrics:
+    """Thread-safe counters for one ingest process, with a periodic reporter."""
+
+    def __init__(self, json_file=None, prom_file=None, interval=DEFAULT_INTERVAL, dashboard=True):
+        self.json_file = json_file
+        self.prom_file = prom_file
+        self.interval = interval
+        self.dashboard = dashboard
+        self._lock = threading.Lock()
+        self._reporter = None
+        self._stop = threading.Event()
+        self._active = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.status_counts = {}         # '200' / '429' / 'timeout' / 'cache' ... -> count
+            self.retries = {}               # same keys, attempts that were retried
+            self.latencies = deque(maxlen=LATENCY_SAMPLES)
+            self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+            self.latency_sum = 0.0
+            self.rate_wait = 0.0            # seconds waiting on the token bucket
+            self.response_bytes = 0
+            self.rows_fetched = 0
+            self.rows_committed = 0
+            self.flushes = 0
+            self.flush_seconds = 0.0
+            self.written_bytes = 0
+            self.streams = {}               # stream -> {'lo', 'hi', 'at'}
+            self.queues = {}                # (stream, stage) -> queue feeding that stage
+            self.blocked = {}               # stream -> fetch-stage StageStats
+            self.blocked_done = 0.0         # blocked seconds of pipelines that have finished
+            self._samples = deque()         # (time, progress) for the ETA
+            self._last = None               # totals at the previous report
+
+    # -- recording ----------------------------------------------------------
+
+    def request(self, status, latency, size=0, rate_wait=0.0, retried=False):
+        """One request attempt: status code (or 'timeout'/'error'/'cache'), seconds, body bytes."""
+        status = str(status)
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if retried:
+                self.retries[status] = self.retries.get(status, 0) + 1
+            self.rate_wait += rate_wait
+            self.response_bytes += size
+            if status != 'cache':
+                self.latencies.append(latency)
+                self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+                self.latency_sum += latency
+
+    def fetched(self, rows):
+        with self._lock:
+            self.rows_fetched += rows
+
+    def flushed(self, rows, seconds, size=0):
+        """One committed flush: rows, seconds spent writing and committing, bytes written."""
+        with self._lock:
+            self.rows_committed += rows
+            self.flushes += 1
+            self.flush_seconds += seconds
+            self.written_bytes += size
+
+    def track(self, stream, lo, hi=None):
+        """Register a stream that pages trades in [lo, hi) newest first (unix seconds).
+
+        Without hi the stream's first page sets it (its newest trade). The
+        first registration of a stream wins, so a caller can register all its
+        streams up front with its own units (e.g. 0..1 per ticker).
+        """
+        with self._lock:
+            self.streams.setdefault(stream, {'lo': lo, 'hi': hi, 'at': hi})
+
+    def advance(self, stream, oldest, newest=None):
+        """The stream has paged back to unix time oldest (newest: the page's newest trade)."""
+        with self._lock:
+            state = self.streams.get(stream)
+            if state is None:
+                return
+            if state['hi'] is None:
+                state['hi'] = max(state['lo'], newest if newest is not None else oldest)
+            at = state['at'] if state['at'] is not None else state['hi']
+            state['at'] = max(state['lo'], min(at, oldest))
+
+    def finish(self, stream):
+        with self._lock:
+            state = self.streams.get(stream)
+            if state is not None and state['hi'] is not None:
+                state['at'] = state['lo']
+
+    def watch_pipeline(self, stream, stages, queues, stats):
+        """Sample the depth of a crawl's pipeline queues and its fetch stage's blocked time.
+
+        stages are the stage names; queues[i] feeds stages[i + 1].
+        """
+        with self._lock:
+            for name, q in zip(stages[1:], queues):
+                self.queues[(stream, name)] = q
+            self.blocked[stream] = stats[0]
+
+    def unwatch_pipeline(self, stream):
+        with self._lock:
+            for key in [k for k in self.queues if k[0] == stream]:
+                del self.queues[key]
+            stats = self.blocked.pop(stream, None)
+            if stats is not None:
+                self.blocked_done += stats.blocked
+
+    # -- reporting ----------------------------------------------------------
+
+    def progress(self):
+        """Fraction of the tracked streams' time ranges paged so far (None if nothing is tracked)."""
+        streams = [s for s in self.streams.values() if s['hi'] is not None]
+        total = sum(s['hi'] - s['lo'] for s in streams)
+        if total <= 0:
+            return None
+        return sum(s['hi'] - s['at'] for s in streams) / total
+
+    def snapshot(self):
+        """Every metric as a JSON-able dict, including rates since the previous snapshot."""
+        now = time.time()
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests = sum(n for s, n in self.status_counts.items() if s != 'cache')
+            blocked = self.blocked_done + sum(st.blocked for st in self.blocked.values())
+            totals = {
+                'time': now, 'requests': requests, 'bytes': self.response_bytes,
+                'rows': self.rows_fetched, 'rate_wait': self.rate_wait,
+                'latency': self.latency_sum, 'blocked': blocked,
+            }
+            progress = self.progress()
+            queues = {f"{stream}:{stage}": [q.qsize(), q.maxsize] for (stream, stage), q in self.queues.items()}
+            snap = {
+                'updated_at':     datetime.now(timezone.utc).isoformat(),
+                'started_at':     datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                'elapsed':        now - self.started,
+                'requests':       dict(self.status_counts),
+                'retries':        dict(self.retries),
+                'latency':        {'p50': _percentile(latencies, 0.5), 'p90': _percentile(latencies, 0.9),
+                                   'p99': _percentile(latencies, 0.99), 'max': latencies[-1] if latencies else None},
+                'latency_buckets': dict(zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], self.latency_buckets)),
+                'latency_sum':    self.latency_sum,
+                'rate_limit_wait': self.rate_wait,
+                'fetch_blocked':  blocked,
+                'response_bytes': self.response_bytes,
+                'rows_fetched':   self.rows_fetched,
+                'rows_committed': self.rows_committed,
+                'flushes':        self.flushes,
+                'flush_seconds':  self.flush_seconds,
+                'written_bytes':  self.written_bytes,
+                'queues':         queues,
+                'progress':       progress,
+            }
+            last, self._last = self._last, totals
+
+        since = last or {'time': self.started, 'requests': 0, 'bytes': 0, 'rows': 0,
+                         'rate_wait': 0.0, 'latency': 0.0, 'blocked': 0.0}
+        dt = max(1e-9, now - since['time'])
+        snap['req_per_s'] = (totals['requests'] - since['requests']) / dt
+        snap['bytes_per_s'] = (totals['bytes'] - since['bytes']) / dt
+        snap['rows_per_s'] = (totals['rows'] - since['rows']) / dt
+        snap['bound'] = self._bound({k: totals[k] - since[k] for k in ('rate_wait', 'latency', 'blocked')})
+        snap['eta_seconds'] = self._eta(now, progress)
+        return snap
+
+    def _bound(self, spent):
+        waits = {'rate limit': spent['rate_wait'], 'network': spent['latency'], 'disk/cpu': spent['blocked']}
+        if not any(waits.values()):
+            return None
+        return max(waits, key=waits.get)
+
+    def _eta(self, now, progress):
+        if progress is None:
+            return None
+        self._samples.append((now, progress))
+        while len(self._samples) > 2 and now - self._samples[0][0] > ETA_WINDOW:
+            self._samples.popleft()
+        then, before = self._samples[0]
+        if progress >= 1.0:
+            return 0.0
+        if now <= then or progress <= before:
+            return None
+        return (1.0 - progress) * (now - then) / (progress - before)
+
+    def dashboard_line(self, snap):
+        parts = [f"trades {snap['rows_fetched']:,}", f"{snap['req_per_s']:.1f} req/s",
+                 f"p50 {_ms(snap['latency']['p50'])} p99 {_ms(snap['latency']['p99'])}"]
+        if snap['retries']:
+            parts.append('retries ' + ' '.join(f"{s}:{n}" for s, n in sorted(snap['retries'].items())))
+        parts.append(f"{snap['bytes_per_s'] / 1024 ** 2:.1f} MB/s")
+        write_queues = [depth for name, depth in snap['queues'].items() if name.endswith(':write')]
+        if write_queues:
+            parts.append(f"write q {sum(d for d, _ in write_queues)}/{sum(m for _, m in write_queues)}")
+        if snap['progress'] is not None:
+            parts.append(f"{snap['progress']:.1%} ETA {_duration(snap['eta_seconds'])}")
+        if snap['bound']:
+            parts.append(f"bound: {snap['bound']}")
+        return ' | '.join(parts)
+
+    def prometheus_text(self, snap):
+        p = PROM_PREFIX
+        lines = [f"# TYPE {p}_requests_total counter"]
+        lines += [f'{p}_requests_total{{status="{s}"}} {n}' for s, n in sorted(snap['requests'].items())]
+        lines.append(f"# TYPE {p}_retries_total counter")
+        lines += [f'{p}_retries_total{{status="{s}"}} {n}' for s, n in sorted(snap['retries'].items())]
+        lines.append(f"# TYPE {p}_request_seconds histogram")
+        cumulative = 0
+        for le, n in snap['latency_buckets'].items():
+            cumulative += n
+            lines.append(f'{p}_request_seconds_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{p}_request_seconds_sum {snap['latency_sum']}")
+        lines.append(f"{p}_request_seconds_count {cumulative}")
+        for name, value, kind in [
+            ('rate_limit_wait_seconds_total', snap['rate_limit_wait'], 'counter'),
+            ('fetch_blocked_seconds_total',   snap['fetch_blocked'],   'counter'),
+            ('response_bytes_total',          snap['response_bytes'],  'counter'),
+            ('rows_fetched_total',            snap['rows_fetched'],    'counter'),
+            ('rows_committed_total',          snap['rows_committed'],  'counter'),
+            ('flushes_total',                 snap['flushes'],         'counter'),
+            ('flush_seconds_total',           snap['flush_seconds'],   'counter'),
+            ('written_bytes_total',           snap['written_bytes'],   'counter'),
+            ('progress_ratio',                snap['progress'],        'gauge'),
+            ('eta_seconds',                   snap['eta_seconds'],     'gauge'),
+        ]:
+            if value is not None:
+                lines += [f"# TYPE {p}_{name} {kind}", f"{p}_{name} {value}"]
+        lines.append(f"# TYPE {p}_queue_depth gauge")
+        for key, (depth, _) in sorted(snap['queues'].items()):
+            stream, stage = key.rsplit(':', 1)
+            lines.append(f'{p}_queue_depth{{stream="{stream}",stage="{stage}"}} {depth}')
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        """Print the dashboard line and rewrite the metric files."""
+        snap = self.snapshot()
+        if self.dashboard:
+            print(self.dashboard_line(snap), flush=True)
+        if self.json_file:
+            _write_atomic(self.json_file, json.dumps(snap, indent=2))
+        if self.prom_file:
+            _write_atomic(self.prom_file, self.prometheus_text(snap))
+        return snap
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.report()
+            except Exception as e:
+                print(f"Metrics report failed: {e}")
+
+    def start(self):
+        """Start the reporter thread (nested start/stop pairs are counted)."""
+        with self._lock:
+            self._active += 1
+            if self._reporter is not None:
+                return
+            self._stop.clear()
+            self._reporter = threading.Thread(target=self._run, name='ingest-metrics', daemon=True)
+            self._reporter.start()
+
+    def stop(self):
+        """Stop the reporter once every start() is matched, after one final report."""
+        with self._lock:
+            self._active -= 1
+            if self._active > 0 or self._reporter is None:
+                return
+            reporter, self._reporter = self._reporter, None
+        self._stop.set()
+        reporter.join()
+        self.report()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)   # atomic on POSIX
+
+
+_shared_metrics = None
+
+
+def configure_metrics(json_file=None, prom_file=None, interval=DEFAULT_INTERVAL, dashboard=True):
+    """Set the process-wide IngestMetrics every fetcher records into."""
+    global _shared_metrics
+    _shared_metrics = IngestMetrics(json_file, prom_file, interval, dashboard)
+    return _shared_metrics
+
+
+def get_shared_metrics():
+    """Return the process-wide IngestMetrics.
+
+    Configured on first use from KALSHI_METRICS_FILE, KALSHI_METRICS_PROM_FILE,
+    KALSHI_METRICS_INTERVAL and KALSHI_METRICS_DASHBOARD (0 to silence the
+    dashboard line) unless configure_metrics() was called.
+    """
+    if _shared_metrics is None:
+        configure_metrics(
+            json_file=os.environ.get('KALSHI_METRICS_FILE'),
+            prom_file=os.environ.get('KALSHI_METRICS_PROM_FILE'),
+            interval=float(os.environ.get('KALSHI_METRICS_INTERVAL', DEFAULT_INTERVAL)),
+            dashboard=os.environ.get('KALSHI_METRICS_DASHBOARD', '1') != '0',
+        )
+    return _shared_metrics
@@ -0,0 +1,688 @@
+import requests
+import time
+from datetime import datetime
+import os
+import io
+import json
+import shutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from rate_limiter import get_shared_limiter, retry_after_seconds
+from parquet_upsert import upsert_parquet
+from field_specs import endpoint_schema
+from response_cache import get_shared_cache
+from parquet_profiles import ProfileWriter, get_profile
+from ingest_metrics import get_shared_metrics
+from checkpoint_store import get_checkpoint_store
+
+
+# Shared pagination engine for Kalshi's cursor-paginated REST endpoints.
+#
+# An Endpoint says what to fetch (path, list key, fixed query params) and
+# what to keep (an explicit Arrow schema — its field names are the projection).
+# crawl_endpoint() then runs the same fast path for any of them:
+#
+#   - one pooled keep-alive Session, every attempt rate limited by the shared
+#     token bucket, 502/timeout backoff and Retry-After aware 429 handling,
+#     with responses replayed from the response cache when it is on
+#   - pages decoded straight from the response bytes into Arrow
+#   - flushes written as staged part files by a background writer thread,
+#     with the resume cursor committed to the checkpoint store
+#     (checkpoint_store.py) only once the part it follows is on disk
+#   - incremental runs upserted into the existing file by key with the
+#     bounded-memory merge in parquet_upsert.py
+#
+# crawl_endpoints() runs several endpoints at once into one file, and
+# refresh_endpoints() re-polls only the markets that can still change.
+#
+# tradesPagination.py uses the HTTP and decoding pieces for the trade lake.
+
+# KALSHI_BASE_URL points every fetcher somewhere else, e.g. mock_server.py
+BASE_URL = os.environ.get('KALSHI_BASE_URL', "https://api.elections.kalshi.com/trade-api/v2")
+LIMIT    = 1000
+
+
+# Fields kept from /markets (see field_specs.py)
+MARKET_SCHEMA = endpoint_schema('markets')
+
+
+class Endpoint:
+    """A cursor-paginated endpoint and the fields we keep from it.
+
+    Args:
+        path:      Path relative to BASE_URL, e.g. '/markets'.
+        items_key: Key of the list in each page, e.g. 'markets'.
+        schema:    Arrow schema; its field names are the fields we keep.
+        params:    Fixed query parameters, e.g. {'mve_filter': 'only'}.
+        key:       Column identifying a row, used to upsert incremental runs.
+    """
+
+    def __init__(self, path, items_key, schema, params=None, key='ticker'):
+        self.path = path
+        self.items_key = items_key
+        self.schema = schema
+        self.params = dict(params or {})
+        self.key = key
+
+
+MARKETS       = Endpoint('/markets', 'markets', MARKET_SCHEMA)
+COMBO_MARKETS = Endpoint('/markets', 'markets', MARKET_SCHEMA, params={'mve_filter': 'only'})
+
+# One full market snapshot: regular and combo (MVE) markets are disjoint
+# streams, so together they cover /markets exactly once.
+MARKET_STREAMS = {
+    'regular': Endpoint('/markets', 'markets', MARKET_SCHEMA, params={'mve_filter': 'exclude'}),
+    'combo':   COMBO_MARKETS,
+}
+
+# The query each single-stream script paged, by its cursor file. A cursor
+# saved by one of them only continues that query.
+LEGACY_CURSOR_QUERIES = {
+    'pagination_cursor.json':       MARKETS,
+    'pagination_combo_cursor.json': COMBO_MARKETS,
+}
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def build_session():
+    """Create a requests.Session with connection pooling and keep-alive."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=4,
+    )
+    session.mount('https://', adapter)
+    return session
+
+
+def get_with_retry(session, url, params=None, limiter=None, max_retries=5, initial_backoff=1.0):
+    """GET url and return the raw response bytes, retrying on transient errors.
+
+    Every attempt takes a token from the shared rate limiter, and a 429
+    pauses all fetchers on the machine for the server's Retry-After.
+    Responses already in the response cache (see response_cache.py) are
+    returned without a request. Every attempt is recorded in the shared
+    ingest metrics (see ingest_metrics.py).
+    """
+    metrics = get_shared_metrics()
+    cache = get_shared_cache()
+    if cache is not None:
+        content = cache.get(url, params)
+        if content is not None:
+            metrics.request('cache', 0.0, len(content))
+            return content
+
+    if limiter is None:
+        limiter = get_shared_limiter()
+
+    backoff = initial_backoff
+    for attempt in range(max_retries):
+        start = time.perf_counter()
+        waited = 0.0
+        retrying = attempt < max_retries - 1
+        try:
+            limiter.acquire()
+            waited = time.perf_counter() - start
+            response = session.get(url, params=params, timeout=30)
+            metrics.request(response.status_code, time.perf_counter() - start - waited, len(response.content),
+                            rate_wait=waited, retried=retrying and response.status_code in (429, 502))
+
+            if response.status_code == 200:
+                if cache is not None:
+                    cache.put(url, params, response.content)
+                return response.content
+
+            if response.status_code == 429:
+                if attempt < max_retries - 1:
+                    wait = retry_after_seconds(response, backoff)
+                    print(f"429 Too Many Requests (attempt {attempt + 1}/{max_retries}). Pausing {wait:.1f}s...")
+                    limiter.pause(wait)
+                    backoff *= 2
+                    continue
+                raise Exception(f"Persistent 429 after {max_retries} attempts.")
+
+            if response.status_code == 502:
+                if attempt < max_retries - 1:
+                    print(f"502 Bad Gateway (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
+                    time.sleep(backoff)
+                    backoff *= 2
+                    continue
+                raise Exception(f"Persistent 502 after {max_retries} attempts.")
+
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+
+        except requests.exceptions.Timeout:
+            metrics.request('timeout', time.perf_counter() - start - waited, rate_wait=waited, retried=retrying)
+            if attempt < max_retries - 1:
+                print(f"Timeout (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
+                time.sleep(backoff)
+                backoff *= 2
+                continue
+            raise Exception(f"Timeout after {max_retries} attempts.")
+
+        except requests.exceptions.RequestException as e:
+            metrics.request('error', time.perf_counter() - start - waited, rate_wait=waited, retried=retrying)
+            if attempt < max_retries - 1:
+                print(f"Request error: {e} (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
+                time.sleep(backoff)
+                backoff *= 2
+                continue
+            raise Exception(f"Request failed after {max_retries} attempts: {e}")
+
+    raise Exception(f"Failed after {max_retries} attempts")
+
+
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+def page_schema(items_key, schema):
+    """Arrow schema of a whole response page: {items_key: [rows of schema], cursor}.
+
+    Decoding against this lets Arrow's JSON reader pull the fields we keep
+    straight out of the response bytes; every other field in the payload is
+    skipped by the parser. The JSON reader can't build dictionary columns, so
+    those are decoded as their value type and dictionary-encoded afterwards.
+    """
+    wire = pa.schema([
+        pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+        for f in schema
+    ])
+    return pa.schema([
+        (items_key, pa.list_(pa.struct(wire))),
+        ('cursor',  pa.string()),
+    ])
+
+
+def decode_page(content, items_key, schema):
+    """Decode a raw response page into (RecordBatch of schema, next cursor).
+
+    The bytes go straight into Arrow's JSON reader (see page_schema), which
+    also parses typed fields (decimals, timestamps) as it goes, so no
+    per-row Python objects are ever created.
+    """
+    page = pj.read_json(
+        io.BytesIO(content),
+        read_options=pj.ReadOptions(use_threads=False, block_size=len(content) + 1),
+        parse_options=pj.ParseOptions(
+            explicit_schema=page_schema(items_key, schema),
+            unexpected_field_behavior='ignore',
+            newlines_in_values=True,
+        ),
+    )
+    items = page.column(items_key).chunk(0).flatten()
+    cursor = page.column('cursor')[0].as_py()
+    return pa.RecordBatch.from_struct_array(items).cast(schema), cursor
+
+
+def page_cursor(content):
+    """Next-page cursor of a raw response page, read without decoding the page.
+
+    Lets a fetch loop request the next page while the current one is still
+    waiting to be decoded. Only a top-level "cursor" key is followed by a
+    colon outside a string, so the last such match is the cursor.
+    """
+    end = len(content)
+    while True:
+        i = content.rfind(b'"cursor"', 0, end)
+        if i < 0:
+            return None
+        rest = content[i + len(b'"cursor"'):i + len(b'"cursor"') + 4096].decode('utf-8', 'replace').lstrip()
+        if rest.startswith(':'):
+            value, _ = json.JSONDecoder().raw_decode(rest[1:].lstrip())
+            return value or None
+        end = i
+
+
+# ---------------------------------------------------------------------------
+# Cursor and run metadata persistence (checkpoint_store.py)
+# ---------------------------------------------------------------------------
+#
+# Cursors and run metadata live in the shared checkpoint store, keyed by the
+# cursor_file / metadata_file names the fetchers have always used; JSON files
+# left by older runs under those names are imported on first use.
+
+def load_cursor(cursor_file):
+    """Load the saved resume state of a crawl: its watermarks plus every stream's cursor and part count"""
+    saved = get_checkpoint_store().load(cursor_file)
+    if saved is None or not saved['streams']:
+        return None
+    print(f"Resuming from saved cursors ({len(saved['streams'])} stream(s))")
+    return {**saved['watermarks'], 'streams': saved['streams']}
+
+
+def adopt_legacy_cursor(cursor_file, endpoints, saved):
+    """Split the one cursor imported from a single-stream script into a stream per endpoint.
+
+    Only the endpoint paging the query that cursor came from continues from
+    it; the others start from the beginning. The old scripts wrote rows
+    straight into the output file, so the run is marked (legacy_output) to
+    upsert into that file instead of replacing it. Both are committed with
+    the legacy stream's removal, so the split happens once.
+    """
+    legacy = LEGACY_CURSOR_QUERIES.get(os.path.basename(cursor_file))
+    if legacy is None and len(endpoints) == 1:
+        legacy = next(iter(endpoints.values()))
+    cursor = saved['streams'][''].get('cursor')
+    cursors = {}
+    for name, endpoint in endpoints.items():
+        matches = legacy is not None and (endpoint.path, endpoint.params) == (legacy.path, legacy.params)
+        cursors[name] = cursor if matches else None
+        if matches and cursor:
+            print(f"{name}: continuing from the single-stream cursor: {cursor[:50]}...")
+    get_checkpoint_store().replace_stream(cursor_file, '', cursors, watermarks={'legacy_output': True})
+    streams = {name: {'cursor': c, 'parts': 0, 'done': False} for name, c in cursors.items()}
+    return {**saved, 'legacy_output': True, 'streams': streams}
+
+
+def save_last_run_metadata(filename, run_started, clear=None):
+    """Save metadata about the last successful run, dropping the checkpoint `clear` in the same commit"""
+    metadata = {
+        'last_run_timestamp': datetime.fromtimestamp(run_started).isoformat(),
+        'last_run_unix': int(run_started)
+    }
+    get_checkpoint_store().set_watermarks(filename, metadata, clear=clear)
+    print(f"Saved run metadata: {metadata['last_run_timestamp']}")
+
+
+def load_last_run_metadata(filename):
+    """Load metadata from the last successful run"""
+    saved = get_checkpoint_store().load(filename)
+    if saved is None or 'last_run_unix' not in saved['watermarks']:
+        return None
+    metadata = saved['watermarks']
+    print(f"Last run was at {metadata['last_run_timestamp']}")
+    return metadata
+
+
+# ---------------------------------------------------------------------------
+# Staged parts (written by the background thread)
+# ---------------------------------------------------------------------------
+
+def part_path(stage_dir, n):
+    return os.path.join(stage_dir, f"part-{n:06d}.parquet")
+
+
+def write_stage_part(batch, schema, stage_dir, n):
+    """Write one flush as staged part n (tmp + rename, so a part is either whole or absent)."""
+    path = part_path(stage_dir, n)
+    table = pa.Table.from_batches(batch, schema=schema)
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return table.num_rows
+
+
+def output_schema(endpoints, discriminator=None):
+    """Schema of the combined output: the shared endpoint schema plus the discriminator column."""
+    schemas = list(endpoints.values())
+    schema = schemas[0].schema
+    for endpoint in schemas[1:]:
+        if not endpoint.schema.equals(schema):
+            raise Exception("Endpoints written to one dataset must share a schema")
+    if discriminator:
+        schema = schema.append(pa.field(discriminator, pa.dictionary(pa.int32(), pa.string())))
+    return schema
+
+
+def combine_parts(stage_dir, streams, schema, filename, discriminator=None, tags=None, profile=None):
+    """Concatenate every stream's staged parts into filename.
+
+    streams maps stream name -> number of parts; with a discriminator each
+    row is tagged with tags[stream] (default: the name of the stream it came from).
+    Row groups are laid out per the parquet_profiles profile (fast-append:
+    one per part).
+    """
+    tags = tags or {}
+    tmp = filename + '.tmp'
+    with ProfileWriter(tmp, schema, get_profile(profile)) as writer:
+        for name, n_parts in streams.items():
+            for n in range(n_parts):
+                table = pq.read_table(part_path(os.path.join(stage_dir, name), n))
+                if discriminator:
+                    tag = pa.DictionaryArray.from_arrays(pa.array([0] * table.num_rows, pa.int32()),
+                                                         [tags.get(name, name)])
+                    table = table.append_column(discriminator, tag)
+                writer.write_table(table.cast(schema))
+    os.replace(tmp, filename)
+
+
+# ---------------------------------------------------------------------------
+# Main fetch loop
+# ---------------------------------------------------------------------------
+
+def crawl_stream(name, endpoint, stream_dir, stream_state, params, batch_size, commit, capture=None):
+    """Page one endpoint into staged parts, starting from its saved cursor.
+
+    commit(name, cursor, parts, rows=rows) is called from the writer thread
+    once a part is on disk, with the cursor of the page that follows it. With a capture
+    (raw_capture.RawCapture) every raw page is also kept for later backfills.
+    """
+    url = f"{BASE_URL}{endpoint.path}"
+    cursor = stream_state['cursor']
+    n_parts = stream_state['parts']
+    batch = []
+    batch_rows = 0
+    total_rows = 0
+    request_count = 0
+    pending_write: Future = None
+    label = f"{name}: " if name else ""
+
+    def flush(to_write, n, next_cursor):
+        rows = write_stage_part(to_write, endpoint.schema, stream_dir, n)
+        commit(name, next_cursor, n + 1, rows=rows)
+
+    session = build_session()
+    # Single-worker executor so writes are serialised but non-blocking for fetches
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    try:
+        while True:
+            page_params = {**params, 'cursor': cursor} if cursor else params
+            content = get_with_retry(session, url, page_params)
+            request_count += 1
+            if capture is not None:
+                capture.write(name, content)
+
+            items, cursor = decode_page(content, endpoint.items_key, endpoint.schema)
+            batch.append(items)
+            batch_rows += items.num_rows
+            total_rows += items.num_rows
+            print(f"{label}Fetched {items.num_rows} {endpoint.items_key}, total: {total_rows}, "
+                  f"in batch: {batch_rows}, requests: {request_count}")
+
+            if not cursor:
+                break
+
+            if batch_rows >= batch_size:
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = executor.submit(flush, batch, n_parts, cursor)
+                n_parts += 1
+                batch = []
+                batch_rows = 0
+
+        if pending_write is not None:
+            pending_write.result()
+        rows = None
+        if batch_rows or n_parts == 0:
+            rows = write_stage_part(batch, endpoint.schema, stream_dir, n_parts)
+            n_parts += 1
+        commit(name, None, n_parts, done=True, rows=rows)
+
+    finally:
+        executor.shutdown(wait=True)
+        session.close()
+
+    return total_rows
+
+
+def crawl_endpoints(endpoints, filename, discriminator=None, batch_size=10_000, cursor_file=None,
+                    resume=False, incremental=False, metadata_file=None,
+                    min_created_ts_param='min_created_ts', tags=None, capture=None, profile=None):
+    """Crawl several endpoints concurrently into one parquet file, flushing in batches.
+
+    Every stream has its own cursor chain and staged parts, but all of them
+    share the machine-wide rate budget, one checkpoint and one output.
+
+    Args:
+        endpoints:     Dict of stream name -> Endpoint. All must share a schema.
+        filename:      Output parquet file.
+        discriminator: Column recording which stream each row came from (None to omit).
+        batch_size:    Rows per stream to buffer in memory before flushing a staged part.
+        cursor_file:   Checkpoint name for the crash-recovery cursors (default: derived from filename).
+        resume:        Continue every unfinished stream from its last saved cursor.
+        incremental:   Only fetch rows created since the last successful run and
+                       upsert them into filename by the endpoints' key.
+        metadata_file: Checkpoint name for the last successful run's timestamp.
+        min_created_ts_param: Query parameter used for incremental runs.
+        tags:          Discriminator value per stream name (default: the stream name).
+        capture:       raw_capture.RawCapture keeping every raw page (None to skip).
+        profile:       parquet_profiles writer profile for filename (default: KALSHI_PARQUET_PROFILE).
+    """
+    stem = filename[:-len('.parquet')] if filename.endswith('.parquet') else filename
+    cursor_file = cursor_file or f"{stem}_cursor.json"
+    metadata_file = metadata_file or f"{stem}_metadata.json"
+    stage_dir = f"{stem}.parts"
+    schema = output_schema(endpoints, discriminator)
+    key = next(iter(endpoints.values())).key
+    checkpoints = get_checkpoint_store()
+
+    saved = load_cursor(cursor_file) if resume else None
+    if resume and saved is None:
+        print("No saved cursor found, starting fresh")
+    if saved is not None and '' in saved['streams']:
+        # Cursor file from the single-stream scripts: one cursor, nothing staged
+        saved = adopt_legacy_cursor(cursor_file, endpoints, saved)
+
+    if saved is None:
+        # Fresh or incremental start — drop anything staged by an earlier run
+        if os.path.exists(stage_dir):
+            shutil.rmtree(stage_dir)
+        checkpoints.clear(cursor_file)
+        state = {'min_created_ts': None, 'run_started': time.time()}
+
+        if incremental:
+            metadata = load_last_run_metadata(metadata_file)
+            if metadata and os.path.exists(filename):
+                state['min_created_ts'] = metadata['last_run_unix']
+                print(f"Incremental mode: fetching rows created after Unix timestamp {state['min_created_ts']}")
+            elif metadata:
+                print(f"Warning: {filename} doesn't exist, fetching everything")
+            else:
+                print("No previous run found, fetching everything")
+    else:
+        state = {'min_created_ts': None, 'run_started': time.time(), **saved}
+    checkpoints.set_watermarks(cursor_file, {'min_created_ts': state['min_created_ts'],
+                                             'run_started': state['run_started']})
+    streams = state.get('streams') or {}
+    state['streams'] = {name: streams.get(name, {'cursor': None, 'parts': 0, 'done': False})
+                        for name in endpoints}
+
+    for name, stream_state in state['streams'].items():
+        stream_dir = os.path.join(stage_dir, name)
+        os.makedirs(stream_dir, exist_ok=True)
+        # Drop staged parts written after the saved cursor
+        n = stream_state['parts']
+        while os.path.exists(part_path(stream_dir, n)):
+            os.remove(part_path(stream_dir, n))
+            n += 1
+        if stream_state['parts'] and not stream_state['done']:
+            print(f"{name}: resuming after {stream_state['parts']} staged part(s) "
+                  f"from cursor: {(stream_state['cursor'] or '')[:50]}...")
+
+    def commit(name, cursor, parts, done=False, rows=None):
+        # Streams only ever replace their own entry, and the store serialises commits
+        state['streams'][name] = {'cursor': cursor, 'parts': parts, 'done': done}
+        part = part_path(os.path.join(stage_dir, name), parts - 1) if rows is not None else None
+        checkpoints.commit(cursor_file, name, cursor, parts, done=done, part=part, rows=rows or 0)
+
+    todo = [name for name, stream_state in state['streams'].items() if not stream_state['done']]
+    total_rows = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(todo))) as executor:
+            futures = {}
+            for name in todo:
+                endpoint = endpoints[name]
+                params = {'limit': LIMIT, **endpoint.params}
+                if state['min_created_ts']:
+                    params[min_created_ts_param] = state['min_created_ts']
+                futures[executor.submit(crawl_stream, name, endpoint, os.path.join(stage_dir, name),
+                                        state['streams'][name], params, batch_size, commit, capture)] = name
+            for future in as_completed(futures):
+                total_rows += future.result()
+
+        parts = {name: stream_state['parts'] for name, stream_state in state['streams'].items()}
+        # Incremental runs, and crawls resumed from a single-stream script
+        # (which had already written rows into filename), merge into the file
+        if state['min_created_ts'] or state.get('legacy_output'):
+            updates_file = f"{stem}_temp.parquet"
+            combine_parts(stage_dir, parts, schema, updates_file, discriminator, tags, profile)
+            print(f"Merging new rows with existing file...")
+            new_rows = pq.ParquetFile(updates_file).metadata.num_rows
+            total_in_file = upsert_parquet(filename, updates_file, key=key, profile=profile)
+            if os.path.exists(updates_file):
+                os.remove(updates_file)
+            print(f"Merged {new_rows} new rows. Total rows: {total_in_file}")
+        else:
+            combine_parts(stage_dir, parts, schema, filename, discriminator, tags, profile)
+            print(f"Wrote {filename}")
+
+        # The next incremental run starts from when this one started, so rows
+        # created while it was paging aren't missed. Advancing it and dropping
+        # the cursors is one commit, so a crash can't leave only one of them.
+        save_last_run_metadata(metadata_file, state['run_started'], clear=cursor_file)
+
+        shutil.rmtree(stage_dir)
+        print("Completed successfully - cleared saved cursors")
+
+    except Exception as e:
+        print(f"Error occurred: {e}")
+        print(f"Progress up to the last flush is saved as {cursor_file} in {checkpoints.path}. "
+              f"You can resume by setting resume=True")
+        raise
+
+    return total_rows
+
+
+def crawl_endpoint(endpoint, filename, batch_size=10_000, cursor_file=None, resume=False,
+                   incremental=False, metadata_file=None, min_created_ts_param='min_created_ts',
+                   capture=None, profile=None):
+    """Fetch every page of one endpoint into a parquet file (see crawl_endpoints)."""
+    return crawl_endpoints({endpoint.items_key: endpoint}, filename, batch_size=batch_size,
+                           cursor_file=cursor_file, resume=resume, incremental=incremental,
+                           metadata_file=metadata_file, min_created_ts_param=min_created_ts_param,
+                           capture=capture, profile=profile)
+
+
+# ---------------------------------------------------------------------------
+# Status refresh
+# ---------------------------------------------------------------------------
+#
+# Incremental runs only pick up markets created since the last run, so a
+# market's status/result/volume/liquidity on disk stays whatever it was when
+# the market was first fetched. A refresh re-polls only the markets that can
+# still change and leaves settled/finalized rows untouched:
+#
+#   1. every endpoint is crawled once per still-live status filter, plus once
+#      for markets created since the last run (those may already be final)
+#   2. markets still live on disk that none of those returned have moved to a
+#      final status since the last run — they're looked up by ticker
+#   3. the result is upserted into the existing file by key
+
+# Response statuses a market never leaves
+FINAL_STATUSES   = ('settled', 'finalized')
+# Status query filters covering every market that can still change
+REFRESH_STATUSES = ('unopened', 'open', 'closed')
+# Tickers per ?tickers= lookup, keeps the URL well under server limits
+TICKER_BATCH     = 100
+
+
+def with_params(endpoint, **params):
+    """A copy of endpoint with extra fixed query parameters."""
+    return Endpoint(endpoint.path, endpoint.items_key, endpoint.schema,
+                    params={**endpoint.params, **params}, key=endpoint.key)
+
+
+def fetch_tickers(endpoint, tickers, session, batch=TICKER_BATCH, capture=None, stream='tickers'):
+    """Fetch the current rows for a list of tickers, TICKER_BATCH per request."""
+    url = f"{BASE_URL}{endpoint.path}"
+    batches = []
+    for i in range(0, len(tickers), batch):
+        params = {'limit': LIMIT, **endpoint.params, 'tickers': ','.join(tickers[i:i + batch])}
+        cursor = None
+        while True:
+            page_params = {**params, 'cursor': cursor} if cursor else params
+            content = get_with_retry(session, url, page_params)
+            if capture is not None:
+                capture.write(stream, content)
+            items, cursor = decode_page(content, endpoint.items_key, endpoint.schema)
+            batches.append(items)
+            if not cursor:
+                break
+    return pa.Table.from_batches(batches, schema=endpoint.schema)
+
+
+def refresh_endpoints(endpoints, filename, discriminator=None, batch_size=10_000, cursor_file=None,
+                      resume=False, metadata_file=None, statuses=REFRESH_STATUSES, capture=None):
+    """Refresh the still-mutable rows of an existing market file in place.
+
+    Args:
+        endpoints:     Dict of stream name -> Endpoint the file was crawled from.
+        filename:      Existing parquet file to refresh.
+        discriminator: Column the file's rows are tagged with (None for a single endpoint).
+        batch_size:    Rows per stream to buffer in memory before flushing a staged part.
+        cursor_file:   Checkpoint name for the crash-recovery cursors (default: derived from filename).
+        resume:        Continue an interrupted refresh from its saved cursors.
+        metadata_file: Checkpoint name for the last successful run's timestamp.
+        statuses:      Status filters to re-poll.
+        capture:       raw_capture.RawCapture keeping every raw page (None to skip).
+    """
+    if not os.path.exists(filename):
+        raise Exception(f"{filename} doesn't exist — run a full crawl before refreshing it")
+    stem = filename[:-len('.parquet')] if filename.endswith('.parquet') else filename
+    metadata_file = metadata_file or f"{stem}_metadata.json"
+    refresh_file = f"{stem}_refresh.parquet"
+    refresh_metadata = f"{stem}_refresh_metadata.json"
+    key = next(iter(endpoints.values())).key
+
+    metadata = load_last_run_metadata(metadata_file)
+    streams, tags = {}, {}
+    for name, endpoint in endpoints.items():
+        for status in statuses:
+            streams[f"{name}-{status}"] = with_params(endpoint, status=status)
+            tags[f"{name}-{status}"] = name
+        if metadata:
+            streams[f"{name}-new"] = with_params(endpoint, min_created_ts=metadata['last_run_unix'])
+            tags[f"{name}-new"] = name
+    if not metadata:
+        print("No previous run found, markets created and settled since the crawl will be missed")
+
+    crawl_endpoints(streams, refresh_file, discriminator=discriminator, batch_size=batch_size,
+                    cursor_file=cursor_file or f"{stem}_refresh_cursor.json", resume=resume,
+                    metadata_file=refresh_metadata, tags=tags, capture=capture)
+    run_started = load_last_run_metadata(refresh_metadata)['last_run_unix']
+
+    # Live on disk but not returned by any status crawl: settled since the last run
+    columns = [key, 'status'] + ([discriminator] if discriminator else [])
+    on_disk = pq.read_table(filename, columns=columns)
+    live = on_disk.filter(pc.invert(pc.is_in(on_disk.column('status'), value_set=pa.array(FINAL_STATUSES))))
+    refreshed = pq.read_table(refresh_file, columns=[key]).column(key)
+    stale = live.filter(pc.invert(pc.is_in(live.column(key), value_set=refreshed)))
+    print(f"{live.num_rows} live rows on disk, {len(refreshed)} re-polled, {stale.num_rows} to look up by ticker")
+
+    if stale.num_rows:
+        session = build_session()
+        lookups = []
+        try:
+            for name, endpoint in endpoints.items():
+                rows = stale
+                if discriminator:
+                    rows = stale.filter(pc.equal(stale.column(discriminator).cast(pa.string()), name))
+                if rows.num_rows == 0:
+                    continue
+                table = fetch_tickers(endpoint, rows.column(key).to_pylist(), session,
+                                      capture=capture, stream=f"{name}-tickers")
+                if discriminator:
+                    tag = pa.DictionaryArray.from_arrays(pa.array([0] * table.num_rows, pa.int32()), [name])
+                    table = table.append_column(discriminator, tag)
+                lookups.append(table)
+        finally:
+            session.close()
+        base = pq.read_table(refresh_file)
+        pq.write_table(pa.concat_tables([base] + [t.cast(base.schema) for t in lookups]), refresh_file + '.tmp')
+        os.replace(refresh_file + '.tmp', refresh_file)
+
+    print(f"Merging refreshed rows into {filename}...")
+    new_rows = pq.ParquetFile(refresh_file).metadata.num_rows
+    total_in_file = upsert_parquet(filename, refresh_file, key=key)
+    if os.path.exists(refresh_file):
+        os.remove(refresh_file)
+    save_last_run_metadata(metadata_file, run_started, clear=refresh_metadata)
+    print(f"Refreshed {new_rows} rows. Total rows: {total_in_file}")
+    return new_rows
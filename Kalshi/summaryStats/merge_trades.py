@@ -1,26 +1,25 @@
+import sys
 import duckdb
+from trade_lake import DEFAULT_LAKE_DIR, import_file, lake_glob
 
-file1_path = 'kalshi_trades.parquet'
-file2_path = 'kalshi_current_trades.parquet'
-merged_file_path = 'kalshi_merged_trades.parquet'
+# Append a standalone trades file (e.g. an older single-file crawl) to the
+# partitioned trade lake. Trades already in the lake are dropped via the
+# trade_id index, and only new parts are written — nothing already in the
+# lake is rewritten.
+#
+# Usage:
+#   python merge_trades.py kalshi_current_trades.parquet
+
+file_path = sys.argv[1] if len(sys.argv) > 1 else 'kalshi_current_trades.parquet'
+
+import_file(file_path, DEFAULT_LAKE_DIR)
 
 # Create a DuckDB connection
 con = duckdb.connect()
 
-# Construct the SQL query
-query = f"""
-COPY (
-    SELECT * FROM '{file1_path}'
-    UNION ALL
-    SELECT * FROM '{file2_path}'
-) TO '{merged_file_path}' (FORMAT 'parquet')
-"""
-# Execute the COPY query first to create the merged file
-con.execute(query)
-
-result1 = con.execute("""
+result1 = con.execute(f"""
     SELECT COUNT(1)
-    FROM 'kalshi_merged_trades.parquet'
+    FROM read_parquet('{lake_glob(DEFAULT_LAKE_DIR)}', hive_partitioning = true)
 """).df()
 print(result1)
 
@@ -0,0 +1,53 @@
+import os
+import sys
+import pyarrow as pa
+import pyarrow.parquet as pq
+from trade_lake import SCHEMA
+from parquet_profiles import ProfileWriter, get_profile
+
+
+# One-shot migration of trade files written with the old all-string schema
+# (yes_price_dollars / created_time as strings) to the typed SCHEMA in
+# trade_lake.py. Streams row groups, so memory stays flat no matter how
+# big the file is, and atomically replaces the original when done.
+#
+# Usage:
+#   python migrate_trades_schema.py kalshi_trades.parquet [more files...]
+
+
+def migrate_trades_file(filename, batch_size=500_000, profile=None):
+    """Rewrite filename with the typed trade SCHEMA. Returns False if already typed.
+
+    Args:
+        filename:   Trade parquet file to migrate in place.
+        batch_size: Rows read per batch.
+        profile:    parquet_profiles writer profile (default: KALSHI_PARQUET_PROFILE).
+    """
+    pf = pq.ParquetFile(filename)
+    if pf.schema_arrow.equals(SCHEMA):
+        print(f"{filename} already uses the typed schema, skipping")
+        return False
+
+    migrate_tmp = filename + ".migrate_tmp"
+    rows = 0
+    try:
+        writer = ProfileWriter(migrate_tmp, SCHEMA, get_profile(profile))
+        for batch in pf.iter_batches(batch_size=batch_size, columns=SCHEMA.names):
+            writer.write_table(pa.Table.from_batches([batch]).cast(SCHEMA))
+            rows += batch.num_rows
+            print(f"Migrated {rows:,} / {pf.metadata.num_rows:,} trades")
+        writer.close()
+        os.replace(migrate_tmp, filename)   # atomic on POSIX
+    except Exception:
+        if os.path.exists(migrate_tmp):
+            os.remove(migrate_tmp)
+        raise
+
+    print(f"Migrated {filename} to the typed schema ({rows:,} trades)")
+    return True
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or ['kalshi_trades.parquet']
+    for f in files:
+        migrate_trades_file(f)
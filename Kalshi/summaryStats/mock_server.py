@@ -0,0 +1,348 @@
+import sys
+import json
+import time
+import uuid
+import random
+import bisect
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+from response_cache import ResponseCache
+
+
+# Local stand-in for the Kalshi REST API, for measuring the fetchers without
+# touching production (see bench_ingest.py).
+#
+# Serves /markets, /markets/trades, /markets/{ticker}, /markets/{ticker}/orderbook
+# and /events/{event_ticker} under /trade-api/v2, either from synthetic data
+# generated from a seed or replayed from a recorded response cache
+# (response_cache.py). Cursors, limit, min_ts/max_ts, min_created_ts,
+# mve_filter, status, tickers and the trades' ticker filter behave like the
+# real API as far as our fetchers use them.
+#
+# Faults, all optional:
+#   latency/jitter   seconds added to every response
+#   error_rate       share of requests answered with a 502
+#   timeout_rate     share of requests that stall for stall_seconds, then drop
+#                    the connection without a response
+#   rate_limit       requests/s allowed (token bucket); the rest get a 429
+#                    with Retry-After: 1
+#
+# GET /__stats returns request counters, GET /__reset zeroes them.
+#
+# Usage:
+#   python mock_server.py --port 8765 --trades 500000 --latency 0.02 --error-rate 0.01
+#   KALSHI_BASE_URL=http://127.0.0.1:8765/trade-api/v2 python tradesPagination.py
+
+API_PREFIX      = '/trade-api/v2'
+PRODUCTION_BASE = 'https://api.elections.kalshi.com'
+DEFAULT_PORT    = 8765
+MAX_LIMIT       = 1000
+
+MARKET_STATUSES = [('open', 0.3), ('closed', 0.05), ('settled', 0.2), ('finalized', 0.4), ('unopened', 0.05)]
+# Query filter -> response statuses it matches
+STATUS_FILTERS  = {'open': {'open'}, 'closed': {'closed'}, 'settled': {'settled', 'finalized'},
+                   'unopened': {'unopened'}}
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _page(items_key, items, cursor):
+    return (b'{"' + items_key.encode() + b'":[' + b','.join(items)
+            + b'],"cursor":' + json.dumps(cursor).encode() + b'}')
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+class SyntheticData:
+    """Deterministic markets and trades, pre-encoded so serving a page is a slice and a join."""
+
+    def __init__(self, n_markets=20_000, n_trades=100_000, combo_share=0.1,
+                 start_ts=1704067200, end_ts=1735689600, seed=0):
+        rng = random.Random(seed)
+        self.start_ts, self.end_ts = start_ts, end_ts
+        statuses, weights = zip(*MARKET_STATUSES)
+
+        self.markets = []        # (ticker, is_combo, status, created_ts, encoded)
+        self.events = {}
+        for i in range(n_markets):
+            is_combo = rng.random() < combo_share
+            ticker = f"KXMVESYN-{i:07d}" if is_combo else f"KXSYN-{i // 10:06d}-{i % 10}"
+            event_ticker = f"KXSYN-{i // 10:06d}"
+            status = rng.choices(statuses, weights)[0]
+            created = rng.randint(start_ts, end_ts)
+            market = {
+                'ticker': ticker, 'event_ticker': event_ticker,
+                'market_type': 'binary', 'title': f"Synthetic market {i}",
+                'status': status,
+                'result': rng.choice(['yes', 'no']) if status in ('settled', 'finalized') else '',
+                'volume': rng.randint(0, 1_000_000), 'open_interest': rng.randint(0, 100_000),
+                'liquidity': rng.randint(0, 10_000_000),
+                'open_time': _iso(created), 'close_time': _iso(created + 86_400 * rng.randint(1, 60)),
+                'yes_bid_dollars': f"{rng.randint(1, 98) / 100:.4f}",
+                'no_bid_dollars': f"{rng.randint(1, 98) / 100:.4f}",
+            }
+            self.markets.append((ticker, is_combo, status, created, json.dumps(market).encode()))
+            self.events.setdefault(event_ticker, {
+                'event_ticker': event_ticker, 'title': f"Synthetic event {i // 10}",
+                'category': rng.choice(['Economics', 'Sports', 'Politics', 'Climate']),
+            })
+        self.market_index = {m[0]: i for i, m in enumerate(self.markets)}
+
+        # Trades newest first, like the real feed
+        regular = [m[0] for m in self.markets if not m[1]] or ['KXSYN-000000-0']
+        stamps = sorted((rng.randint(start_ts, end_ts - 1) for _ in range(n_trades)), reverse=True)
+        self.trade_neg_ts = [-ts for ts in stamps]     # ascending, for bisect
+        self.trades = []
+        self.ticker_trades = {}      # ticker -> (neg_ts, trades), for ?ticker=
+        for ts in stamps:
+            yes = rng.randint(1, 99)
+            count = rng.randint(1, 500)
+            ticker = rng.choice(regular)
+            self.trades.append(json.dumps({
+                'trade_id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                'ticker': ticker,
+                'price': yes, 'count': count, 'count_fp': f"{count:.2f}",
+                'yes_price': yes, 'no_price': 100 - yes,
+                'yes_price_dollars': f"{yes / 100:.4f}", 'no_price_dollars': f"{(100 - yes) / 100:.4f}",
+                'taker_side': rng.choice(['yes', 'no']),
+                'created_time': _iso(ts),
+            }).encode())
+            neg_ts, trades = self.ticker_trades.setdefault(ticker, ([], []))
+            neg_ts.append(-ts)
+            trades.append(self.trades[-1])
+
+    def trades_page(self, params):
+        neg_ts, trades = self.trade_neg_ts, self.trades
+        if 'ticker' in params:
+            neg_ts, trades = self.ticker_trades.get(params['ticker'], ([], []))
+        lo = 0 if 'max_ts' not in params else bisect.bisect_right(neg_ts, -int(params['max_ts']))
+        hi = len(trades) if 'min_ts' not in params else bisect.bisect_right(neg_ts, -int(params['min_ts']))
+        return self._slice('trades', trades, lo, hi, params)
+
+    def markets_page(self, params):
+        rows = self.markets
+        mve = params.get('mve_filter')
+        if mve == 'only':
+            rows = [m for m in rows if m[1]]
+        elif mve == 'exclude':
+            rows = [m for m in rows if not m[1]]
+        if 'status' in params:
+            wanted = STATUS_FILTERS.get(params['status'], {params['status']})
+            rows = [m for m in rows if m[2] in wanted]
+        if 'min_created_ts' in params:
+            rows = [m for m in rows if m[3] >= int(params['min_created_ts'])]
+        if 'tickers' in params:
+            wanted = set(params['tickers'].split(','))
+            rows = [m for m in rows if m[0] in wanted]
+        return self._slice('markets', [m[4] for m in rows], 0, len(rows), params)
+
+    def _slice(self, items_key, items, lo, hi, params):
+        limit = min(int(params.get('limit', 100)), MAX_LIMIT)
+        start = lo + int(params.get('cursor') or 0)
+        end = min(start + limit, hi)
+        cursor = str(end - lo) if end < hi else ''
+        return 200, _page(items_key, items[start:end], cursor), max(0, end - start)
+
+    def get(self, path, params):
+        """(status, body, rows) for an API path below API_PREFIX."""
+        parts = [unquote(p) for p in path.strip('/').split('/')]
+        if parts == ['markets', 'trades']:
+            return self.trades_page(params)
+        if parts == ['markets']:
+            return self.markets_page(params)
+        if len(parts) in (2, 3) and parts[0] == 'markets' and parts[1] in self.market_index:
+            market = self.markets[self.market_index[parts[1]]][4]
+            if len(parts) == 2:
+                return 200, b'{"market":' + market + b'}', 1
+            if parts[2] == 'orderbook':
+                rng = random.Random(parts[1])
+                book = {side: [[p, rng.randint(1, 5000)] for p in sorted(rng.sample(range(1, 99), 10))]
+                        for side in ('yes', 'no')}
+                return 200, json.dumps({'orderbook': book}).encode(), 1
+        if len(parts) == 2 and parts[0] == 'events' and parts[1] in self.events:
+            return 200, json.dumps({'event': self.events[parts[1]]}).encode(), 1
+        return 404, b'{"error":"not found"}', 0
+
+
+class ReplayData:
+    """Responses recorded in a response cache (response_cache.py), looked up by request."""
+
+    def __init__(self, cache_dir):
+        self.cache = ResponseCache(cache_dir, mode='replay')
+
+    def get(self, path, params):
+        content = self.cache.get(f"{PRODUCTION_BASE}{API_PREFIX}{path}", params)
+        if content is None:
+            return 404, b'{"error":"not recorded"}', 0
+        return 200, content, 0
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class Faults:
+    """Latency, error injection and server-side rate limiting."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, timeout_rate=0.0,
+                 stall_seconds=5.0, rate_limit=0.0, seed=0):
+        self.latency, self.jitter = latency, jitter
+        self.error_rate, self.timeout_rate = error_rate, timeout_rate
+        self.stall_seconds = stall_seconds
+        self.rate_limit = rate_limit
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(max(1.0, rate_limit))
+        self._updated = time.monotonic()
+
+    def admit(self):
+        """'ok', 'rate_limited', 'error' or 'timeout' for the next request."""
+        with self._lock:
+            if self.rate_limit > 0:
+                now = time.monotonic()
+                self._tokens = min(max(1.0, self.rate_limit), self._tokens + (now - self._updated) * self.rate_limit)
+                self._updated = now
+                if self._tokens < 1:
+                    return 'rate_limited'
+                self._tokens -= 1
+            roll = self._rng.random()
+            delay = self.latency + self.jitter * self._rng.random()
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.error_rate:
+            return 'error'
+        if roll < self.error_rate + self.timeout_rate:
+            return 'timeout'
+        return 'ok'
+
+
+class MockKalshiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, data, faults):
+        super().__init__(address, MockHandler)
+        self.data = data
+        self.faults = faults
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'errors': 0, 'timeouts': 0,
+                          'not_found': 0, 'rows': 0, 'bytes': 0, 'by_path': {}}
+
+    def count(self, path, outcome, rows=0, size=0):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats[outcome] += 1
+            self.stats['rows'] += rows
+            self.stats['bytes'] += size
+            self.stats['by_path'][path] = self.stats['by_path'].get(path, 0) + 1
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'     # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        server = self.server
+        if url.path == '/__stats':
+            with server._lock:
+                return self._send(200, json.dumps(server.stats).encode())
+        if url.path == '/__reset':
+            server.reset_stats()
+            return self._send(200, b'{}')
+        if not url.path.startswith(API_PREFIX):
+            return self._send(404, b'{"error":"not found"}')
+
+        path = url.path[len(API_PREFIX):]
+        # Collapse /markets/{ticker}/... so per-path counters stay small
+        label = path if path in ('/markets', '/markets/trades') else '/' + path.strip('/').split('/')[0] + '/*'
+        outcome = server.faults.admit()
+        if outcome == 'rate_limited':
+            server.count(label, 'rate_limited')
+            return self._send(429, b'{"error":"too many requests"}', {'Retry-After': '1'})
+        if outcome == 'error':
+            server.count(label, 'errors')
+            return self._send(502, b'Bad Gateway')
+        if outcome == 'timeout':
+            server.count(label, 'timeouts')
+            time.sleep(server.faults.stall_seconds)
+            self.close_connection = True
+            return
+
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        status, body, rows = server.data.get(path, params)
+        server.count(label, 'ok' if status == 200 else 'not_found', rows, len(body))
+        self._send(status, body)
+
+
+def serve(data, host='127.0.0.1', port=DEFAULT_PORT, faults=None):
+    """Start a MockKalshiServer in a background thread. Returns the server (port 0 picks a free one)."""
+    server = MockKalshiServer((host, port), data, faults or Faults())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server):
+    """KALSHI_BASE_URL for a running server."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{API_PREFIX}"
+
+
+def add_server_args(parser):
+    """Data and fault options shared with bench_ingest.py."""
+    parser.add_argument('--markets', type=int, default=20_000, help='synthetic markets')
+    parser.add_argument('--trades', type=int, default=100_000, help='synthetic trades')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--replay-dir', help='serve recorded responses from this response cache instead')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency, up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 502')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='share of requests stalled then dropped')
+    parser.add_argument('--stall', type=float, default=5.0, help='seconds a dropped request stalls first')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests/s before 429s (0 = unlimited)')
+
+
+def build_server(args, port=DEFAULT_PORT):
+    data = ReplayData(args.replay_dir) if args.replay_dir else SyntheticData(args.markets, args.trades, seed=args.seed)
+    faults = Faults(args.latency, args.jitter, args.error_rate, args.timeout_rate, args.stall,
+                    args.rate_limit, seed=args.seed)
+    return serve(data, port=port, faults=faults)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a mock Kalshi API")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    add_server_args(parser)
+    args = parser.parse_args()
+
+    print("Generating data..." if not args.replay_dir else f"Replaying {args.replay_dir}")
+    server = build_server(args, port=args.port)
+    print(f"Serving on {base_url(server)}  (KALSHI_BASE_URL={base_url(server)})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
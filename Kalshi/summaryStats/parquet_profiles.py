@@ -0,0 +1,145 @@
+import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+# Parquet writer profiles shared by every writer in the pipeline.
+#
+#   fast-append     what the fetchers write by default: a row group per
+#                   flush, snappy, dictionary pages only on low-cardinality
+#                   text columns (never on trade_id, which is unique)
+#   scan-optimized  for files that are written once and scanned many times:
+#                   zstd, rows sorted by created_time then ticker, row groups
+#                   sized to ~128 MB of data so DuckDB gets few, large row
+#                   groups with tight min/max statistics to prune on
+#   default         pyarrow's own defaults, for comparison
+#
+# KALSHI_PARQUET_PROFILE changes the default for a whole run, e.g.
+#
+#   KALSHI_PARQUET_PROFILE=scan-optimized python totalMarketPagination.py
+#
+# Besides ParquetWriter options, a profile may set:
+#   row_group_bytes  target uncompressed bytes per row group; the row count
+#                    is derived from the data's average row width
+#   sort_by          [(column, 'ascending'|'descending')] applied to every
+#                    row group written (columns missing from a table are skipped)
+#
+# bench_parquet.py compares the profiles on file size and DuckDB scan time.
+
+# Low-cardinality text columns across the trade and market schemas
+DICTIONARY_COLUMNS = ['ticker', 'taker_side', 'event_ticker', 'status', 'result', 'market_type', 'market_source']
+
+PROFILES = {
+    'default': {},
+    'fast-append': {
+        'compression':    'snappy',
+        'use_dictionary': DICTIONARY_COLUMNS,
+    },
+    'scan-optimized': {
+        'compression':       'zstd',
+        'compression_level': 3,
+        'use_dictionary':    DICTIONARY_COLUMNS,
+        'data_page_size':    1024 * 1024,
+        'row_group_bytes':   128 * 1024 * 1024,
+        'sort_by':           [('created_time', 'ascending'), ('ticker', 'ascending')],
+    },
+}
+
+DEFAULT_PROFILE = os.environ.get('KALSHI_PARQUET_PROFILE', 'fast-append')
+
+# Applied under every profile: keeps decimals as plain int32/int64 physical
+# columns instead of fixed-size binary
+BASE_OPTIONS = {'store_decimal_as_integer': True}
+
+_LAYOUT_KEYS = ('row_group_bytes', 'sort_by')
+
+
+def get_profile(name=None):
+    """The writer profile called name (default: DEFAULT_PROFILE)."""
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise Exception(f"Unknown parquet profile {name!r}, expected one of {sorted(PROFILES)}")
+    return PROFILES[name]
+
+
+def writer_options(profile, schema):
+    """pq.ParquetWriter keyword arguments for a profile and the schema being written."""
+    options = {**BASE_OPTIONS, **{k: v for k, v in profile.items() if k not in _LAYOUT_KEYS}}
+    if isinstance(options.get('use_dictionary'), list):
+        options['use_dictionary'] = [c for c in options['use_dictionary'] if c in schema.names] or False
+    return options
+
+
+def sort_table(table, profile):
+    """table sorted by the profile's sort_by columns that it has."""
+    keys = [(c, order) for c, order in profile.get('sort_by', []) if c in table.column_names]
+    if not keys or table.num_rows == 0:
+        return table
+    # Arrow can't sort on dictionary columns directly; sort on their decoded values
+    columns = {c: table.column(c) for c, _ in keys}
+    columns = {c: col.cast(col.type.value_type) if pa.types.is_dictionary(col.type) else col
+               for c, col in columns.items()}
+    return table.take(pc.sort_indices(pa.table(columns), sort_keys=keys))
+
+
+def row_group_rows(table, profile):
+    """Rows per row group hitting the profile's row_group_bytes for this data (None: one per write)."""
+    target = profile.get('row_group_bytes')
+    if not target or table.num_rows == 0:
+        return None
+    return max(1, int(target // max(1, table.nbytes / table.num_rows)))
+
+
+def write_table(table, path, profile):
+    """pq.write_table with a profile's layout and options."""
+    pq.write_table(sort_table(table, profile), path,
+                   row_group_size=row_group_rows(table, profile) or max(1, table.num_rows),
+                   **writer_options(profile, table.schema))
+
+
+class ProfileWriter:
+    """pq.ParquetWriter that lays out row groups per a profile.
+
+    With row_group_bytes, written tables are buffered until a full row group
+    is available, so many small writes still produce large row groups; each
+    row group is sorted by the profile's sort_by. Without it every
+    write_table call becomes its own row group, like a plain ParquetWriter.
+    """
+
+    def __init__(self, path, schema, profile):
+        self.schema = schema
+        self.profile = profile
+        self._writer = pq.ParquetWriter(path, schema, **writer_options(profile, schema))
+        self._buffer = []
+        self._buffered = 0
+        self._target = None
+
+    def write_table(self, table):
+        if not self.profile.get('row_group_bytes'):
+            self._writer.write_table(sort_table(table, self.profile))
+            return
+        if self._target is None and table.num_rows:
+            self._target = row_group_rows(table, self.profile)
+        self._buffer.append(table)
+        self._buffered += table.num_rows
+        if self._target and self._buffered >= self._target:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        table = sort_table(pa.concat_tables(self._buffer), self.profile)
+        self._buffer = []
+        self._buffered = 0
+        self._writer.write_table(table, row_group_size=self._target or max(1, table.num_rows))
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,173 @@
+import os
+import sys
+import math
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from parquet_profiles import ProfileWriter, get_profile
+
+
+# Upsert-by-key merge of two parquet files under a fixed memory budget.
+#
+# Rows of updates_file replace rows of base_file with the same key (the last
+# occurrence wins inside updates_file too), and the result atomically
+# replaces base_file. Neither file is ever loaded whole:
+#
+#   - If the updates fit in the budget (the usual incremental refresh), the
+#     deduplicated updates are held in memory and base_file is streamed one
+#     row group at a time, dropping rows whose key was updated.
+#   - Otherwise both files are hash-partitioned on the key into buckets
+#     sized to the budget, and each bucket is merged on its own.
+#
+# Usage:
+#   python parquet_upsert.py kalshi_markets.parquet kalshi_markets_temp.parquet
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024   # bytes of decoded Arrow data
+STREAM_BATCH_ROWS     = 65_536
+# Every bucket holds an open writer while partitioning, so keep well under the fd limit
+MAX_BUCKETS           = 256
+
+
+def _uncompressed_size(pf):
+    meta = pf.metadata
+    return sum(meta.row_group(i).total_byte_size for i in range(meta.num_row_groups))
+
+
+def _conform(table, schema):
+    """Reorder/cast table to schema (e.g. an all-null column inferred as null type)."""
+    return table.select(schema.names).cast(schema)
+
+
+def dedup_keep_last(table, key):
+    """Drop rows with repeated keys, keeping the last occurrence."""
+    if table.num_rows == 0:
+        return table
+    numbered = table.append_column('__row', pa.array(np.arange(table.num_rows)))
+    last = numbered.group_by(key, use_threads=False).aggregate([('__row', 'max')])
+    keep = pc.sort_indices(last.column('__row_max'))
+    return table.take(pc.take(last.column('__row_max'), keep))
+
+
+def _bucket_of(keys, n_buckets):
+    hashes = pd.util.hash_array(keys.to_numpy(zero_copy_only=False), categorize=False)
+    return hashes % np.uint64(n_buckets)
+
+
+def _merge_streaming(base, updates, key, writer, batch_rows):
+    """Write base minus updated keys, then the updates."""
+    updated_keys = updates.column(key)
+    kept = 0
+    for batch in base.iter_batches(batch_size=batch_rows):
+        table = _conform(pa.Table.from_batches([batch]), writer.schema)
+        table = table.filter(pc.invert(pc.is_in(table.column(key), value_set=updated_keys)))
+        writer.write_table(table)
+        kept += table.num_rows
+    writer.write_table(updates)
+    return kept + updates.num_rows
+
+
+def partition_tables(tables, key, schema, n_buckets, bucket_dir, prefix):
+    """Hash-partition a stream of tables on key into bucket_dir/<prefix>-<bucket>.parquet.
+
+    Rows keep their order within a bucket, so the last occurrence of a key
+    stays last.
+    """
+    writers = {}
+    try:
+        for table in tables:
+            table = _conform(table, schema)
+            buckets = _bucket_of(table.column(key), n_buckets)
+            for b in np.unique(buckets):
+                if b not in writers:
+                    writers[b] = pq.ParquetWriter(os.path.join(bucket_dir, f"{prefix}-{b}.parquet"), schema)
+                writers[b].write_table(table.filter(pa.array(buckets == b)))
+    finally:
+        for w in writers.values():
+            w.close()
+
+
+def _partition(pf, key, schema, n_buckets, bucket_dir, prefix, batch_rows):
+    """Hash-partition one file into n_buckets parquet files."""
+    tables = (pa.Table.from_batches([batch]) for batch in pf.iter_batches(batch_size=batch_rows))
+    partition_tables(tables, key, schema, n_buckets, bucket_dir, prefix)
+
+
+def _merge_bucketed(base, updates, key, writer, n_buckets, batch_rows, tmp_dir):
+    """Hash-partition both files on key, then merge bucket by bucket."""
+    bucket_dir = tempfile.mkdtemp(prefix='upsert-', dir=tmp_dir)
+    try:
+        _partition(base, key, writer.schema, n_buckets, bucket_dir, 'base', batch_rows)
+        _partition(updates, key, writer.schema, n_buckets, bucket_dir, 'updates', batch_rows)
+
+        rows = 0
+        for b in range(n_buckets):
+            base_path = os.path.join(bucket_dir, f"base-{b}.parquet")
+            updates_path = os.path.join(bucket_dir, f"updates-{b}.parquet")
+            bucket_updates = (dedup_keep_last(pq.read_table(updates_path), key)
+                              if os.path.exists(updates_path) else writer.schema.empty_table())
+            if os.path.exists(base_path):
+                rows += _merge_streaming(pq.ParquetFile(base_path), bucket_updates, key, writer, batch_rows)
+            else:
+                writer.write_table(bucket_updates)
+                rows += bucket_updates.num_rows
+        return rows
+    finally:
+        shutil.rmtree(bucket_dir, ignore_errors=True)
+
+
+def upsert_parquet(base_file, updates_file, key='ticker', memory_budget=DEFAULT_MEMORY_BUDGET,
+                   batch_rows=STREAM_BATCH_ROWS, profile=None, **write_options):
+    """Merge updates_file into base_file by key, replacing base_file atomically.
+
+    Args:
+        base_file:     Existing parquet file (created from updates if missing).
+        updates_file:  Parquet file of new/changed rows; these win on key clashes.
+        key:           Column identifying a row.
+        memory_budget: Rough cap, in bytes, on decoded data held at once.
+        batch_rows:    Rows per streamed batch.
+        profile:       parquet_profiles writer profile for the merged file.
+        write_options: Extra pq.ParquetWriter options, overriding the profile's.
+
+    Rows already in base_file are assumed to be unique by key (as every
+    file this produces is).
+
+    Returns the number of rows in the merged file.
+    """
+    if not os.path.exists(base_file):
+        os.replace(updates_file, base_file)
+        return pq.ParquetFile(base_file).metadata.num_rows
+
+    base = pq.ParquetFile(base_file)
+    updates = pq.ParquetFile(updates_file)
+    schema = base.schema_arrow
+    updates_size = _uncompressed_size(updates)
+
+    merge_tmp = base_file + ".merge_tmp"
+    try:
+        with ProfileWriter(merge_tmp, schema, {**get_profile(profile), **write_options}) as writer:
+            if updates_size <= memory_budget:
+                new = dedup_keep_last(_conform(updates.read(), schema), key)
+                rows = _merge_streaming(base, new, key, writer, batch_rows)
+            else:
+                total = _uncompressed_size(base) + updates_size
+                n_buckets = min(math.ceil(total / memory_budget), MAX_BUCKETS)
+                print(f"Updates exceed the memory budget, merging in {n_buckets} hash buckets")
+                rows = _merge_bucketed(base, updates, key, writer, n_buckets, batch_rows,
+                                       os.path.dirname(os.path.abspath(base_file)))
+        os.replace(merge_tmp, base_file)   # atomic on POSIX
+    except Exception:
+        if os.path.exists(merge_tmp):
+            os.remove(merge_tmp)
+        raise
+
+    return rows
+
+
+if __name__ == "__main__":
+    base_file, updates_file = sys.argv[1], sys.argv[2]
+    total = upsert_parquet(base_file, updates_file)
+    print(f"Merged {updates_file} into {base_file}. Total rows: {total:,}")
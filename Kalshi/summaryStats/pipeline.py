@@ -0,0 +1,146 @@
+import time
+import queue
+import threading
+
+
+# Threaded stage pipeline with bounded queues.
+#
+#   fetch ──q──▶ decode ──q──▶ build ──q──▶ write
+#
+# Every stage runs in its own thread and hands items to the next through a
+# queue of fixed depth, so a slow stage backs the ones before it up instead
+# of letting items pile up in memory: at most `depth` items sit between any
+# two stages. A stage is a generator function — the first takes no
+# arguments and produces items, every other one takes an iterator over its
+# input and yields its outputs (zero or more per input, so a stage can
+# accumulate). The last stage may just consume its input and return nothing.
+#
+# Each stage records how long it spent waiting for input (idle) and waiting
+# for room downstream (blocked); the rest of its wall time is busy. A stage
+# near 100% busy is the bottleneck; a busy fetch stage with idle downstream
+# stages means the network is never waiting on CPU work.
+#
+# If any stage raises, the stages after it drain what they were already
+# given, the ones before it stop, and the error is re-raised from run_pipeline.
+
+POLL_SECONDS = 0.1
+
+
+class _Stopped(Exception):
+    """Raised inside a stage when the stage before or after it has stopped early."""
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0       # items taken in (produced, for the first stage)
+        self.idle = 0.0      # seconds waiting for input
+        self.blocked = 0.0   # seconds waiting on a full output queue
+        self.wall = 0.0
+
+    @property
+    def busy(self):
+        return max(0.0, self.wall - self.idle - self.blocked)
+
+    def utilization(self):
+        return self.busy / self.wall if self.wall else 0.0
+
+
+_END   = object()    # upstream finished normally
+_ABORT = object()    # upstream stopped early: finish what's queued, then stop
+
+
+def _inputs(q, stats):
+    """Iterate a stage's input queue until the upstream stage finishes."""
+    while True:
+        start = time.perf_counter()
+        item = q.get()
+        stats.idle += time.perf_counter() - start
+        if item is _END:
+            return
+        if item is _ABORT:
+            raise _Stopped()
+        stats.items += 1
+        yield item
+
+
+def _put(q, item, stats, consumer_gone):
+    """Put item on q, unless the stage reading q has exited."""
+    start = time.perf_counter()
+    while True:
+        if consumer_gone.is_set():
+            raise _Stopped()
+        try:
+            q.put(item, timeout=POLL_SECONDS)
+            break
+        except queue.Full:
+            continue
+    stats.blocked += time.perf_counter() - start
+
+
+def run_pipeline(stages, depths=4, observe=None):
+    """Run stages concurrently, connected by bounded queues.
+
+    When a stage fails, the stages after it still finish the items already
+    handed to them (so a writer commits what was fetched before the error),
+    the stages before it stop at their next hand-off, and the error is
+    re-raised here.
+
+    Args:
+        stages: List of (name, generator function); see the module comment.
+        depths: Queue depth between consecutive stages, one int for all or a
+                list with one per link.
+        observe: Called with (queues, stats) before the stages start, e.g. to
+                 sample queue depths while the pipeline runs.
+
+    Returns the StageStats of every stage, in order.
+    """
+    if isinstance(depths, int):
+        depths = [depths] * (len(stages) - 1)
+    queues = [queue.Queue(maxsize=d) for d in depths]
+    gone = [threading.Event() for _ in stages]    # stage i has exited
+    stats = [StageStats(name) for name, _ in stages]
+    errors = []
+    if observe is not None:
+        observe(queues, stats)
+
+    def run(i, fn):
+        st = stats[i]
+        has_output = i < len(queues)
+        start = time.perf_counter()
+        end = _END
+        try:
+            outputs = fn() if i == 0 else fn(_inputs(queues[i - 1], st))
+            for item in outputs or ():
+                if i == 0:
+                    st.items += 1
+                if has_output:
+                    _put(queues[i], item, st, gone[i + 1])
+        except _Stopped:
+            end = _ABORT
+        except BaseException as e:
+            errors.append(e)
+            end = _ABORT
+        finally:
+            gone[i].set()
+            st.wall = time.perf_counter() - start
+        if has_output:
+            try:
+                _put(queues[i], end, st, gone[i + 1])
+            except _Stopped:
+                pass
+
+    threads = [threading.Thread(target=run, args=(i, fn), name=f"pipeline-{name}", daemon=True)
+               for i, (name, fn) in enumerate(stages)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def format_stats(stats):
+    """One-line utilization summary, e.g. 'fetch 97% busy (1,204) | decode 18% busy (1,204) | ...'."""
+    return ' | '.join(f"{s.name} {s.utilization():.0%} busy ({s.items:,})" for s in stats)
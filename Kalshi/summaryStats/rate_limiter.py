@@ -0,0 +1,122 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+from email.utils import parsedate_to_datetime
+
+
+# Token bucket shared by every Kalshi fetcher on this machine.
+#
+# The bucket state lives in a small JSON file guarded by an exclusive flock,
+# so separate processes (trades backfill, market crawl, api_explore scripts)
+# all draw from the same budget:
+#
+#   {"tokens": 12.5, "updated": 1770608928.1, "blocked_until": 0.0}
+#
+# Tokens refill continuously at `rate` per second up to `burst`. A 429 from
+# the API empties the bucket and blocks every process until Retry-After has
+# passed.
+
+# Kalshi allows 20 req/s; leave a small buffer
+DEFAULT_RATE  = 18.0
+DEFAULT_BURST = 20
+DEFAULT_STATE_FILE = os.path.join(tempfile.gettempdir(), 'kalshi_rate_limiter.json')
+
+
+class TokenBucket:
+    """Cross-process token bucket backed by a locked state file."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, state_file=DEFAULT_STATE_FILE):
+        self.rate = rate
+        self.burst = burst
+        self.state_file = state_file
+
+    def _update(self, fn):
+        """Run fn(state, now) under the file lock and persist the new state."""
+        with open(self.state_file, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                now = time.time()
+                try:
+                    state = json.loads(raw)
+                except ValueError:
+                    state = {'tokens': float(self.burst), 'updated': now, 'blocked_until': 0.0}
+
+                # Refill for the time elapsed since the last caller touched the bucket
+                elapsed = max(0.0, now - state['updated'])
+                state['tokens'] = min(float(self.burst), state['tokens'] + elapsed * self.rate)
+                state['updated'] = now
+
+                result = fn(state, now)
+
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return result
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available. Returns 0 on success, else seconds to wait."""
+        def take(state, now):
+            if state['blocked_until'] > now:
+                return state['blocked_until'] - now
+            if state['tokens'] >= tokens:
+                state['tokens'] -= tokens
+                return 0.0
+            return (tokens - state['tokens']) / self.rate
+        return self._update(take)
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available, then take them."""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Empty the bucket and block all processes for `seconds` (e.g. after a 429)."""
+        def block(state, now):
+            state['tokens'] = 0.0
+            state['blocked_until'] = max(state['blocked_until'], now + seconds)
+        self._update(block)
+
+
+_shared_limiter = None
+
+
+def get_shared_limiter():
+    """Return the process-wide TokenBucket for the Kalshi API.
+
+    KALSHI_RATE_LIMIT and KALSHI_RATE_STATE_FILE override the rate and the
+    shared state file (benchmarks against mock_server.py use their own).
+    """
+    global _shared_limiter
+    if _shared_limiter is None:
+        rate = float(os.environ.get('KALSHI_RATE_LIMIT', DEFAULT_RATE))
+        _shared_limiter = TokenBucket(
+            rate=rate,
+            burst=max(DEFAULT_BURST, int(rate)),
+            state_file=os.environ.get('KALSHI_RATE_STATE_FILE', DEFAULT_STATE_FILE),
+        )
+    return _shared_limiter
+
+
+def retry_after_seconds(response, default):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,214 @@
+import os
+import sys
+import io
+import glob
+import gzip
+import math
+import time
+import uuid
+import zlib
+import shutil
+import tempfile
+import threading
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+from field_specs import schema_from_spec
+from kalshi_paginator import page_schema
+from parquet_upsert import DEFAULT_MEMORY_BUDGET, MAX_BUCKETS, dedup_keep_last, partition_tables
+from parquet_profiles import ProfileWriter, get_profile
+
+
+# "Wide capture": the raw response pages a crawl fetched, kept compactly on
+# disk so columns we didn't project at the time can be filled in later
+# without going back to the API.
+#
+#   raw_capture/kalshi_markets/
+#     1770608928123-regular-3f9c1a2b.ndjson.gz
+#     1770608928456-combo-7d01e4aa.ndjson.gz
+#
+# Each line is one response page exactly as the API sent it (JSON can't hold
+# a raw newline inside a string, so the page's own whitespace newlines are the
+# only ones dropped). Every page is its own gzip member, so a crash mid-write
+# loses at most the page being written. Files roll over at ROTATE_BYTES and
+# sort oldest-first by name.
+#
+# Backfilling decodes the capture with a wider schema one capture file at a
+# time with Arrow's JSON reader — each line parses as a page, the same way
+# live pages do. A capture bigger than the memory budget is hash-partitioned
+# on the key together with the file being widened, and filled bucket by
+# bucket (as parquet_upsert.py merges), so it is never held whole.
+#
+# Usage (add open_interest to the market file from its capture):
+#   python raw_capture.py kalshi_markets.parquet markets open_interest=int64
+
+DEFAULT_CAPTURE_DIR = 'raw_capture'
+ROTATE_BYTES        = 256 * 1024 * 1024
+COMPRESS_LEVEL      = 3
+# JSON reader block size; each block must hold at least one whole page
+READ_BLOCK_BYTES    = 64 * 1024 * 1024
+
+
+class RawCapture:
+    """Append-only store of raw response pages for one dataset, shared by every stream writing it."""
+
+    def __init__(self, capture_dir, dataset):
+        self.dir = os.path.join(capture_dir, dataset)
+        self._lock = threading.Lock()
+        self._files = {}     # stream -> (open file, path)
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _open(self, stream):
+        safe = stream.replace(os.sep, '_').replace(':', '_')
+        path = os.path.join(self.dir, f"{int(time.time() * 1000)}-{safe}-{uuid.uuid4().hex[:8]}.ndjson.gz")
+        self._files[stream] = (open(path, 'ab'), path)
+        return self._files[stream]
+
+    def write(self, stream, content):
+        """Append one raw page fetched by stream."""
+        member = gzip.compress(content.replace(b'\n', b'') + b'\n', compresslevel=COMPRESS_LEVEL)
+        with self._lock:
+            f, path = self._files.get(stream) or self._open(stream)
+            if f.tell() >= ROTATE_BYTES:
+                f.close()
+                f, path = self._open(stream)
+            f.write(member)
+            f.flush()
+
+    def close(self):
+        with self._lock:
+            for f, _ in self._files.values():
+                f.close()
+            self._files = {}
+
+
+def open_capture(capture_dir, dataset):
+    """RawCapture for dataset, or None when capture_dir is None (capture off)."""
+    return RawCapture(capture_dir, dataset) if capture_dir else None
+
+
+def capture_files(capture_dir, dataset):
+    """Capture files of a dataset, oldest first."""
+    paths = glob.glob(os.path.join(capture_dir, dataset, '*.ndjson.gz'))
+    return sorted(paths, key=lambda p: int(os.path.basename(p).split('-', 1)[0]))
+
+
+def read_capture_file(path):
+    """Decompressed pages of one capture file, dropping a torn final page."""
+    data = bytearray()
+    with gzip.open(path, 'rb') as f:
+        try:
+            # Line by line, so the pages before a torn member are kept
+            for line in f:
+                data += line
+        except (EOFError, gzip.BadGzipFile, zlib.error):
+            pass
+    return bytes(data[:data.rfind(b'\n') + 1])
+
+
+def iter_capture(capture_dir, dataset, items_key, schema):
+    """Decode a dataset's captured pages one capture file at a time, oldest first.
+
+    Yields one table of schema per capture file.
+    """
+    for path in capture_files(capture_dir, dataset):
+        data = read_capture_file(path)
+        if not data:
+            continue
+        pages = pj.read_json(
+            io.BytesIO(data),
+            read_options=pj.ReadOptions(block_size=READ_BLOCK_BYTES),
+            parse_options=pj.ParseOptions(
+                explicit_schema=page_schema(items_key, schema),
+                unexpected_field_behavior='ignore',
+            ),
+        )
+        items = pages.column(items_key).combine_chunks().flatten()
+        yield pa.Table.from_struct_array(items).cast(schema)
+
+
+def _bucketed_lookups(base_batches, captured, key, base_schema, lookup_schema, n_buckets, bucket_dir):
+    """Hash-partition the file and the capture on key; yield (lookup, batches) per bucket."""
+    partition_tables(captured, key, lookup_schema, n_buckets, bucket_dir, 'capture')
+    partition_tables((pa.Table.from_batches([batch]) for batch in base_batches),
+                     key, base_schema, n_buckets, bucket_dir, 'base')
+    for b in range(n_buckets):
+        base_path = os.path.join(bucket_dir, f"base-{b}.parquet")
+        capture_path = os.path.join(bucket_dir, f"capture-{b}.parquet")
+        if not os.path.exists(base_path):
+            continue
+        lookup = (dedup_keep_last(pq.read_table(capture_path), key)
+                  if os.path.exists(capture_path) else lookup_schema.empty_table())
+        yield lookup, pq.ParquetFile(base_path).iter_batches()
+
+
+def backfill_columns(filename, capture_dir, dataset, items_key, key, columns, batch_rows=65_536,
+                     memory_budget=DEFAULT_MEMORY_BUDGET, profile=None):
+    """Add (or overwrite) columns in a parquet file from the raw capture, without the API.
+
+    Each key takes the value from its most recently captured page; keys the
+    capture never saw get nulls. When the capture exceeds memory_budget the
+    rows come out grouped by hash bucket rather than in their original order.
+
+    Args:
+        filename:      Parquet file to widen in place.
+        capture_dir:   Root of the raw capture.
+        dataset:       Dataset the capture was written under (e.g. 'kalshi_markets').
+        items_key:     Key of the list in each page, e.g. 'markets'.
+        key:           Column identifying a row.
+        columns:       {field: type name} to add, in field_specs.py's type names.
+        batch_rows:    Rows of filename rewritten per batch.
+        memory_budget: Rough cap, in bytes, on capture data held at once.
+        profile:       parquet_profiles writer profile (default: KALSHI_PARQUET_PROFILE).
+    """
+    lookup_schema = schema_from_spec({key: 'string', **columns})
+    base = pq.ParquetFile(filename)
+    kept = [name for name in base.schema_arrow.names if name not in columns]
+    base_schema = pa.schema([base.schema_arrow.field(name) for name in kept])
+    schema = pa.schema(list(base_schema) + list(lookup_schema)[1:])
+    base_batches = base.iter_batches(batch_size=batch_rows, columns=kept)
+    captured = (dedup_keep_last(table, key) for table in iter_capture(capture_dir, dataset, items_key, lookup_schema))
+
+    # The compressed capture stands in for the decoded lookup's size: pages
+    # carry every field, the lookup only the key and the new columns
+    capture_bytes = sum(os.path.getsize(path) for path in capture_files(capture_dir, dataset))
+    n_buckets = min(math.ceil(capture_bytes / memory_budget), MAX_BUCKETS)
+    tmp = filename + '.backfill_tmp'
+    bucket_dir = None
+    rows = 0
+    try:
+        if n_buckets <= 1:
+            lookup = dedup_keep_last(pa.concat_tables([lookup_schema.empty_table(), *captured]), key)
+            print(f"Decoded {len(columns)} column(s) for {lookup.num_rows:,} {items_key} from the capture")
+            lookups = [(lookup, base_batches)]
+        else:
+            print(f"Capture exceeds the memory budget, backfilling in {n_buckets} hash buckets")
+            bucket_dir = tempfile.mkdtemp(prefix='backfill-', dir=os.path.dirname(os.path.abspath(filename)))
+            lookups = _bucketed_lookups(base_batches, captured, key, base_schema, lookup_schema,
+                                        n_buckets, bucket_dir)
+        with ProfileWriter(tmp, schema, get_profile(profile)) as writer:
+            for lookup, batches in lookups:
+                for batch in batches:
+                    table = pa.Table.from_batches([batch])
+                    idx = pc.index_in(table.column(key), value_set=lookup.column(key))
+                    for name in columns:
+                        table = table.append_column(name, pc.take(lookup.column(name), idx))
+                    writer.write_table(table.cast(schema))
+                    rows += table.num_rows
+        os.replace(tmp, filename)   # atomic on POSIX
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        if bucket_dir is not None:
+            shutil.rmtree(bucket_dir, ignore_errors=True)
+    print(f"Backfilled {', '.join(columns)} into {rows:,} rows of {filename}")
+    return rows
+
+
+if __name__ == "__main__":
+    filename, items_key = sys.argv[1], sys.argv[2]
+    columns = dict(arg.split('=', 1) for arg in sys.argv[3:])
+    backfill_columns(filename, DEFAULT_CAPTURE_DIR, filename.rsplit('.parquet', 1)[0], items_key, 'ticker', columns)
@@ -0,0 +1,179 @@
+import os
+import gzip
+import json
+import uuid
+import hashlib
+import threading
+
+
+# On-disk cache of raw Kalshi API responses, so a re-ingestion (after a
+# parsing fix or a schema change) runs at disk speed instead of through the
+# rate limit, and the pipeline can be exercised offline against a recorded
+# corpus.
+#
+#   kalshi_response_cache/
+#     3f/3f9c1a2b...e1.gz      gzip of one response body
+#
+# An entry's name is the SHA-256 of the request — URL plus sorted query
+# params, cursor included — so the same page requested by any fetcher (sync
+# or async, markets or trades) lands on the same file. Entries are written
+# under a .tmp name and renamed into place. When the cache grows past
+# max_bytes the least recently used entries (by mtime, refreshed on every
+# hit) are deleted until it's back under EVICT_TO of the budget.
+#
+# Modes:
+#   off      no caching (the default)
+#   record   always hit the API, store every response
+#   replay   serve cached responses, fetch and store misses
+#   offline  serve cached responses only; a miss is an error
+#
+# record and replay differ only in what they do with a hit: a live crawl's
+# first page (no cursor) changes over time, so keep crawls that should see
+# new data in record mode and replay when re-ingesting.
+#
+# Every fetcher goes through get_shared_cache(), configured from the
+# environment (or configure_cache() in code):
+#
+#   KALSHI_CACHE_MODE=replay KALSHI_CACHE_DIR=kalshi_response_cache python totalMarketPagination.py
+
+MODES             = ('off', 'record', 'replay', 'offline')
+DEFAULT_CACHE_DIR = 'kalshi_response_cache'
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+EVICT_TO          = 0.9
+COMPRESS_LEVEL    = 3
+
+
+def request_key(url, params=None):
+    """SHA-256 hex digest identifying a GET request."""
+    canonical = json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items())])
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded, content-addressed store of raw response bodies."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, mode='replay', max_bytes=DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise Exception(f"Unknown cache mode {mode!r}, expected one of {MODES}")
+        self.dir = cache_dir
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.dir, key[:2], f"{key}.gz")
+
+    def _entries(self):
+        """(path, size, mtime) of every entry on disk."""
+        for sub in os.scandir(self.dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.gz'):
+                    st = entry.stat()
+                    yield entry.path, st.st_size, st.st_mtime
+
+    def get(self, url, params=None):
+        """Cached body of a request, or None when the API should be called."""
+        if self.mode in ('off', 'record'):
+            return None
+        path = self._path(request_key(url, params))
+        try:
+            with open(path, 'rb') as f:
+                content = gzip.decompress(f.read())
+            os.utime(path)   # mark recently used
+        except (FileNotFoundError, EOFError, gzip.BadGzipFile):
+            with self._lock:
+                self.misses += 1
+            if self.mode == 'offline':
+                raise Exception(f"{url} {params or {}} is not in the response cache (offline mode)")
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, url, params, content):
+        """Store a response body, evicting old entries if the cache is over budget."""
+        if self.mode == 'off':
+            return
+        path = self._path(request_key(url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        data = gzip.compress(content, compresslevel=COMPRESS_LEVEL)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            try:
+                replaced = os.stat(path).st_size   # re-recording an entry replaces it
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, path)   # atomic on POSIX
+            self._size += len(data) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until under EVICT_TO of the budget."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        removed = 0
+        for path, size, _ in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass     # another process evicted it first
+            self._size -= size
+            removed += 1
+        print(f"Response cache over {self.max_bytes / 1024 ** 2:,.0f} MB, evicted {removed:,} entries")
+
+
+_shared_cache = None
+_configured = False
+_shared_lock = threading.Lock()
+
+
+def configure_cache(cache_dir=DEFAULT_CACHE_DIR, mode='replay', max_bytes=DEFAULT_MAX_BYTES):
+    """Set the process-wide cache every fetcher uses (mode='off' disables it)."""
+    global _shared_cache, _configured
+    _shared_cache = ResponseCache(cache_dir, mode, max_bytes) if mode != 'off' else None
+    _configured = True
+    return _shared_cache
+
+
+def get_shared_cache():
+    """Return the process-wide ResponseCache, or None when caching is off.
+
+    Configured on first use from KALSHI_CACHE_MODE, KALSHI_CACHE_DIR and
+    KALSHI_CACHE_MAX_BYTES unless configure_cache() was called.
+    """
+    with _shared_lock:
+        if not _configured:
+            configure_cache(
+                cache_dir=os.environ.get('KALSHI_CACHE_DIR', DEFAULT_CACHE_DIR),
+                mode=os.environ.get('KALSHI_CACHE_MODE', 'off'),
+                max_bytes=int(os.environ.get('KALSHI_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+            )
+        return _shared_cache
+
+
+def cached_get(url, params, fetch):
+    """Return the cached body of a GET, or call fetch() for it and cache the result.
+
+    For one-off helpers (e.g. the api_explore scripts); the paginators check
+    the cache inside their retry loops.
+    """
+    cache = get_shared_cache()
+    if cache is None:
+        return fetch()
+    content = cache.get(url, params)
+    if content is None:
+        content = fetch()
+        cache.put(url, params, content)
+    return content
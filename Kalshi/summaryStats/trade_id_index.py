@@ -0,0 +1,275 @@
+import os
+import json
+import glob
+import uuid
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+# Persistent trade_id membership index for the trade lake.
+#
+#   kalshi_trades/_trade_id_index/
+#     index.json          segments + how many manifest commits are covered
+#     seg-<uuid>.npy      sorted 16-byte keys, memory-mapped for lookups
+#
+# Every trade_id is reduced to a fixed 16-byte key. Kalshi trade_ids are
+# UUIDs, so the key is just the UUID's 128 bits and membership is exact; any
+# id that isn't a UUID falls back to two independent 64-bit hashes. Segments
+# are sorted, so a lookup is a binary search per segment over a memory map —
+# only the pages the search touches are read, and no id set is ever held in
+# memory. Each committed flush adds a small segment; once there are more than
+# MAX_SEGMENTS the smallest ones are merged, so the large base segment is
+# rarely rewritten. A merge streams the segments' memory maps into the new
+# segment a slice at a time (MERGE_CHUNK_KEYS), never loading them whole.
+#
+# The index trails the manifest: after a crash between a manifest commit and
+# the matching segment write, the next open re-indexes the missing commits
+# from their parts.
+
+INDEX_DIR_NAME = '_trade_id_index'
+MAX_SEGMENTS   = 16
+# Keys buffered per segment when (re)building from existing parts
+BUILD_SEGMENT_KEYS = 10_000_000
+# Keys held in memory at once while merging segments
+MERGE_CHUNK_KEYS = 4_000_000
+
+KEY_DTYPE = np.dtype('S16')
+
+_UUID_HEX_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+_HEX_LUT = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    _HEX_LUT[_c] = _i
+for _i, _c in enumerate(b'ABCDEF'):
+    _HEX_LUT[_c] = 10 + _i
+
+
+def trade_id_keys(trade_ids):
+    """16-byte sortable keys (numpy S16) for an Arrow array of trade_ids."""
+    n = len(trade_ids)
+    if n == 0:
+        return np.empty(0, dtype=KEY_DTYPE)
+    ids = trade_ids.to_numpy(zero_copy_only=False)
+    try:
+        raw = ids.astype('S37').view(np.uint8).reshape(n, 37)
+    except UnicodeEncodeError:
+        raw = np.zeros((n, 37), dtype=np.uint8)   # non-ASCII ids: hash every row
+
+    nibbles = _HEX_LUT[raw[:, _UUID_HEX_POSITIONS]]
+    is_uuid = (
+        (nibbles != 255).all(axis=1)
+        & (raw[:, [8, 13, 18, 23]] == ord('-')).all(axis=1)
+        & (raw[:, 36] == 0)
+    )
+    key_bytes = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+
+    if not is_uuid.all():
+        other = ~is_uuid
+        h1 = pd.util.hash_array(ids[other], hash_key='kalshi-trade-id1', categorize=False)
+        h2 = pd.util.hash_array(ids[other], hash_key='kalshi-trade-id2', categorize=False)
+        hashed = np.empty((other.sum(), 2), dtype='>u8')
+        hashed[:, 0] = h1
+        hashed[:, 1] = h2
+        key_bytes[other] = hashed.view(np.uint8).reshape(-1, 16)
+
+    return np.ascontiguousarray(key_bytes, dtype=np.uint8).view(KEY_DTYPE).ravel()
+
+
+def _in_sorted(sorted_keys, keys):
+    """Boolean mask of keys present in sorted_keys."""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    idx = np.searchsorted(sorted_keys, keys)
+    idx[idx == len(sorted_keys)] = 0
+    return sorted_keys[idx] == keys
+
+
+def merge_sorted(sources, out, chunk_keys=MERGE_CHUNK_KEYS):
+    """k-way merge sorted key arrays (e.g. memory maps) into out, chunk_keys at a time.
+
+    Each round takes the next slice of every source, cuts them all at the
+    smallest of the slices' last keys — everything up to it is final — and
+    sorts just that into place.
+    """
+    step = max(chunk_keys // max(len(sources), 1), 1)
+    pos = [0] * len(sources)
+    written = 0
+    while True:
+        live = [i for i, src in enumerate(sources) if pos[i] < len(src)]
+        if not live:
+            return written
+        heads = {i: sources[i][pos[i]:pos[i] + step] for i in live}
+        bound = min(heads[i][-1] for i in live)
+        taken = []
+        for i in live:
+            n = int(np.searchsorted(heads[i], bound, side='right'))
+            taken.append(heads[i][:n])
+            pos[i] += n
+        merged = np.sort(np.concatenate(taken))
+        out[written:written + len(merged)] = merged
+        written += len(merged)
+
+
+class TradeIdIndex:
+    """On-disk trade_id index of a trade lake, shared by every writer thread in a process."""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.dir = os.path.join(manifest.lake_dir, INDEX_DIR_NAME)
+        self.meta_path = os.path.join(self.dir, 'index.json')
+        self._lock = threading.Lock()
+        self._pending = set()    # keys accepted by writers but not yet committed
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.segments = []
+        self.covered = 0         # manifest commits reflected in the segments
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.segments = meta['segments']
+            self.covered = meta['covered']
+        self._remove_stray_segments()
+        self._maps = {name: self._open(name) for name in self.segments}
+        self._catch_up()
+
+    # -- persistence --------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _open(self, name):
+        return np.load(self._path(name), mmap_mode='r')
+
+    def _write_segment(self, keys):
+        name = f"seg-{uuid.uuid4().hex}.npy"
+        tmp = self._path(name) + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, keys)
+        os.replace(tmp, self._path(name))
+        return name
+
+    def _merge_segments(self, sources):
+        """Write the merge of sorted sources as a new segment without loading them."""
+        name = f"seg-{uuid.uuid4().hex}.npy"
+        tmp = self._path(name) + '.tmp'
+        out = np.lib.format.open_memmap(tmp, mode='w+', dtype=KEY_DTYPE,
+                                        shape=(sum(len(src) for src in sources),))
+        merge_sorted(sources, out)
+        out.flush()
+        del out
+        os.replace(tmp, self._path(name))
+        return name
+
+    def _save_meta(self):
+        tmp = self.meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'segments': self.segments, 'covered': self.covered}, f)
+        os.replace(tmp, self.meta_path)   # atomic on POSIX
+
+    def _remove_stray_segments(self):
+        """Delete segment files index.json doesn't list (crash mid-write or mid-merge)."""
+        live = set(self.segments)
+        for path in glob.glob(os.path.join(self.dir, 'seg-*')):
+            if os.path.basename(path) not in live:
+                os.remove(path)
+
+    def _catch_up(self):
+        """Index the parts of any manifest commits the segments don't cover yet."""
+        entries = self.manifest.entries[self.covered:]
+        if not entries:
+            return
+        # A compaction's parts only need indexing if it replaced parts that
+        # weren't indexed yet; replaced parts themselves are gone
+        added = {}
+        for e in entries:
+            if e.get('replaces') and not any(p in added for p in e['replaces']):
+                continue
+            added.update(dict.fromkeys(e['parts']))
+        parts = [p for p in added if p in self.manifest.parts]
+        if parts:
+            print(f"Indexing trade_ids from {len(parts):,} part(s) not yet in the index")
+        buffered = []
+        buffered_keys = 0
+        for rel in parts:
+            keys = trade_id_keys(pq.read_table(os.path.join(self.manifest.lake_dir, rel),
+                                               columns=['trade_id']).column(0))
+            buffered.append(keys)
+            buffered_keys += len(keys)
+            if buffered_keys >= BUILD_SEGMENT_KEYS:
+                self._add_segment(np.concatenate(buffered))
+                buffered = []
+                buffered_keys = 0
+        if buffered_keys:
+            self._add_segment(np.concatenate(buffered))
+        self.covered = len(self.manifest.entries)
+        self._save_meta()
+        self._compact()
+
+    def _add_segment(self, keys):
+        keys = np.sort(keys)
+        name = self._write_segment(keys)
+        self.segments.append(name)
+        self._maps[name] = self._open(name)
+
+    def _compact(self):
+        """Merge the smallest segments once there are more than MAX_SEGMENTS."""
+        if len(self.segments) <= MAX_SEGMENTS:
+            return
+        by_size = sorted(self.segments, key=lambda name: len(self._maps[name]))
+        merge = by_size[:len(self.segments) - MAX_SEGMENTS // 2 + 1]
+        name = self._merge_segments([self._maps[name] for name in merge])
+        self.segments = [s for s in self.segments if s not in merge] + [name]
+        self._maps[name] = self._open(name)
+        self._save_meta()
+        for old in merge:
+            del self._maps[old]
+            os.remove(self._path(old))
+
+    # -- lookups ------------------------------------------------------------
+
+    def contains(self, keys):
+        """Boolean mask of keys already committed to the lake."""
+        found = np.zeros(len(keys), dtype=bool)
+        for seg in list(self._maps.values()):
+            found |= _in_sorted(seg, keys)
+        return found
+
+    def claim(self, trades):
+        """Filter a batch down to trades not already in the lake or claimed by another writer.
+
+        Kept trade_ids are reserved until commit() so concurrent windows and
+        buffered pages can't write the same trade twice.
+        """
+        if trades.num_rows == 0:
+            return trades
+        keys = trade_id_keys(trades.column('trade_id'))
+        # Checked under the lock so a commit can't move a key from pending
+        # into a segment between the two checks
+        with self._lock:
+            keep = ~self.contains(keys)
+            for i, k in zip(np.flatnonzero(keep), keys[keep].tolist()):
+                if k in self._pending:
+                    keep[i] = False
+                else:
+                    self._pending.add(k)
+        if keep.all():
+            return trades
+        return trades.filter(keep)
+
+    def commit(self, stream, parts, table, cursor, done=False, replaces=None):
+        """Commit a flush to the manifest and its trade_ids to the index together.
+
+        Holding the index lock across both keeps `covered` in step with the
+        manifest when several windows flush at once. With replaces (a
+        compaction) table should be empty: the trades are already indexed.
+        """
+        keys = trade_id_keys(table.column('trade_id').combine_chunks())
+        with self._lock:
+            self.manifest.commit(stream, parts, table.num_rows, cursor, done=done, replaces=replaces)
+            if len(keys):
+                self._add_segment(keys)
+            self.covered = len(self.manifest.entries)
+            self._save_meta()
+            self._compact()
+            self._pending.difference_update(keys.tolist())
@@ -0,0 +1,273 @@
+import os
+import glob
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from trade_id_index import TradeIdIndex
+from field_specs import endpoint_schema
+from parquet_profiles import get_profile, write_table
+
+
+# Hive-partitioned trade dataset ("trade lake").
+#
+#   kalshi_trades/
+#     created_month=2024-01/
+#       part-1770608928123-3f9c1a2b.parquet
+#       part-...
+#     created_month=2024-02/
+#       ...
+#
+# New trades are appended as new part files; the only thing that ever
+# rewrites a part is compaction (compact_trades.py), which replaces a
+# month's parts with sorted ones in a single manifest commit. Each part is
+# written under a .tmp name and renamed into place, so readers (and the
+# *.parquet glob) only ever see complete parts. Which parts belong to the
+# lake, and where each fetch stream resumes from, is tracked in
+# _manifest.jsonl (see Manifest below).
+#
+# The partition key is created_month (UTC month of created_time) rather than
+# plain "month" so it can't collide with the MONTH aliases in our queries.
+# Query it with:
+#
+#   FROM read_parquet('kalshi_trades/*/*.parquet', hive_partitioning = true)
+#   WHERE created_month >= '2024-01'
+
+DEFAULT_LAKE_DIR = 'kalshi_trades'
+PARTITION_KEY    = 'created_month'
+
+# Stored typed so queries don't re-parse strings on every scan:
+#   yes_price_dollars  exact decimal(6,4), e.g. 0.5600
+#   created_time       timestamp[us, UTC]
+#   ticker/taker_side  dictionary-encoded strings
+# (declared in field_specs.py)
+SCHEMA = endpoint_schema('trades')
+
+
+def lake_glob(lake_dir=DEFAULT_LAKE_DIR):
+    """Glob matching every committed part in the lake."""
+    return os.path.join(lake_dir, f"{PARTITION_KEY}=*", "*.parquet")
+
+
+def list_parts(lake_dir=DEFAULT_LAKE_DIR):
+    return sorted(glob.glob(lake_glob(lake_dir)))
+
+
+def split_by_month(table):
+    """Yield (YYYY-MM, sub-table) for every UTC month present in table."""
+    if table.num_rows == 0:
+        return
+    months = pc.strftime(table.column('created_time'), format='%Y-%m')
+    for month in pc.unique(months).to_pylist():
+        if month is None:
+            # Hive's spelling of a null partition value
+            yield '__HIVE_DEFAULT_PARTITION__', table.filter(pc.is_null(months))
+        else:
+            yield month, table.filter(pc.equal(months, month))
+
+
+def write_part(lake_dir, table, tag=None, profile=None):
+    """Append table to the lake as one new part per month it touches.
+
+    profile names the parquet_profiles writer profile (default: KALSHI_PARQUET_PROFILE).
+    Returns the list of committed part paths.
+    """
+    table = table.cast(SCHEMA)
+    profile = get_profile(profile)
+    name = f"part-{tag + '-' if tag else ''}{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+    committed = []
+    for month, month_table in split_by_month(table):
+        part_dir = os.path.join(lake_dir, f"{PARTITION_KEY}={month}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, name)
+        tmp = path + ".tmp"
+        try:
+            write_table(month_table, tmp, profile)
+            os.replace(tmp, path)   # atomic on POSIX
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        committed.append(path)
+    return committed
+
+
+# ---------------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------------
+#
+# _manifest.jsonl in the lake root is an append-only log of commits. Each line
+# records the parts one flush added together with the cursor that stream
+# resumes from:
+#
+#   {"stream": "sequential", "parts": ["created_month=2024-01/part-....parquet"],
+#    "rows": 100000, "cursor": "...", "done": false, "committed_at": "..."}
+#
+# A compaction commit also lists the parts it supersedes under "replaces";
+# they leave the lake in the same line that adds their replacements (and
+# carry "rows": 0, as it adds no trades).
+#
+# Parts count as committed only once their line is on disk, so data and
+# cursor always move together. A part that was renamed into place but never
+# logged (crash between the two) is an orphan and is deleted the next time a
+# writer opens the lake. Committing appends one line, so resuming costs the
+# same however much history the lake already holds.
+
+MANIFEST_NAME = '_manifest.jsonl'
+
+
+class Manifest:
+    """Append-only commit log of the parts in a trade lake and each stream's resume cursor.
+
+    One Manifest is shared by every writer thread in a process; only one
+    process should write to a lake at a time.
+    """
+
+    def __init__(self, lake_dir=DEFAULT_LAKE_DIR):
+        self.lake_dir = lake_dir
+        self.path = os.path.join(lake_dir, MANIFEST_NAME)
+        self.streams = {}    # stream -> {'rows', 'cursor', 'done'}
+        self.parts = set()   # committed part paths, relative to lake_dir
+        self.entries = []    # every commit, in order
+        self._lock = threading.Lock()
+        os.makedirs(lake_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # Torn final line from a crash mid-append — it was never committed
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+
+    def _apply(self, entry):
+        self.entries.append(entry)
+        self.parts.update(entry['parts'])
+        self.parts.difference_update(entry.get('replaces', ()))
+        state = self.streams.setdefault(entry['stream'], {'rows': 0, 'cursor': None, 'done': False})
+        state['rows'] += entry['rows']
+        state['cursor'] = entry['cursor']
+        state['done'] = entry['done']
+
+    def commit(self, stream, parts, rows, cursor, done=False, replaces=None):
+        """Durably record parts written by stream and the cursor to resume it from.
+
+        replaces lists committed parts that parts supersede (compaction).
+        """
+        entry = {
+            'stream':       stream,
+            'parts':        [os.path.relpath(p, self.lake_dir) for p in parts],
+            'rows':         rows,
+            'cursor':       cursor,
+            'done':         done,
+            'committed_at': datetime.now().isoformat(),
+        }
+        if replaces:
+            entry['replaces'] = [os.path.relpath(p, self.lake_dir) for p in replaces]
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def files(self):
+        """Absolute paths of every committed part."""
+        return sorted(os.path.join(self.lake_dir, p) for p in self.parts)
+
+    def remove_orphans(self):
+        """Delete parts and leftover .tmp files that no commit refers to."""
+        leftovers = glob.glob(os.path.join(self.lake_dir, f"{PARTITION_KEY}=*", "*.tmp"))
+        orphans = [p for p in list_parts(self.lake_dir)
+                   if os.path.relpath(p, self.lake_dir) not in self.parts]
+        for path in leftovers + orphans:
+            os.remove(path)
+        if orphans:
+            print(f"Removed {len(orphans)} uncommitted part(s) from {self.lake_dir}")
+        return len(orphans)
+
+
+# ---------------------------------------------------------------------------
+# Reading back what's committed
+# ---------------------------------------------------------------------------
+
+def part_month(path):
+    """The created_month partition value of a part path."""
+    return os.path.basename(os.path.dirname(path)).split('=', 1)[1]
+
+
+def latest_created_time(manifest):
+    """Newest created_time committed to the lake, or None if it holds no trades.
+
+    Only the footers of the newest month's parts are read — row group
+    statistics carry the max, so no data pages are touched.
+    """
+    months = [part_month(p) for p in manifest.files()]
+    months = [m for m in months if m != '__HIVE_DEFAULT_PARTITION__']
+    if not months:
+        return None
+    newest = max(months)
+
+    latest = None
+    for path in manifest.files():
+        if part_month(path) != newest:
+            continue
+        meta = pq.ParquetFile(path).metadata
+        col = meta.schema.to_arrow_schema().get_field_index('created_time')
+        for rg in range(meta.num_row_groups):
+            stats = meta.row_group(rg).column(col).statistics
+            if stats is None or not stats.has_min_max:
+                stats_max = pc.max(pq.read_table(path, columns=['created_time']).column(0)).as_py()
+            else:
+                stats_max = stats.max
+            if stats_max is not None and (latest is None or stats_max > latest):
+                latest = stats_max
+    return latest
+
+
+def import_file(filename, lake_dir=DEFAULT_LAKE_DIR, batch_size=1_000_000):
+    """Append an existing single-file trades parquet to the lake, streaming row groups.
+
+    Each row group batch is committed on its own, so an interrupted import
+    picks up where it stopped and a finished one is never imported twice.
+    Trades whose trade_id is already in the lake are dropped.
+    """
+    manifest = Manifest(lake_dir)
+    manifest.remove_orphans()
+    index = TradeIdIndex(manifest)
+    stream = f"import:{os.path.abspath(filename)}"
+    state = manifest.streams.get(stream, {'cursor': None, 'done': False})
+    if state['done']:
+        print(f"{filename} was already imported into {lake_dir}, skipping")
+        return 0
+
+    pf = pq.ParquetFile(filename)
+    read = skip = state['cursor'] or 0   # the cursor counts source rows already read
+    written = 0
+    for batch in pf.iter_batches(batch_size=batch_size, columns=SCHEMA.names):
+        if skip >= batch.num_rows:
+            skip -= batch.num_rows
+            continue
+        batch = batch.slice(skip)
+        skip = 0
+        new = pa.Table.from_batches([index.claim(batch)])
+        parts = write_part(lake_dir, new, tag='import')
+        read += batch.num_rows
+        written += new.num_rows
+        index.commit(stream, parts, new, cursor=read)
+        print(f"Imported {read:,} / {pf.metadata.num_rows:,} trades from {filename} "
+              f"({batch.num_rows - new.num_rows:,} duplicates dropped)")
+    index.commit(stream, [], SCHEMA.empty_table(), cursor=read, done=True)
+    return written
@@ -1,11 +1,19 @@
-import requests
 import time
 from datetime import datetime
 import os
 import pyarrow as pa
-import pyarrow.parquet as pq
-import json
-from concurrent.futures import ThreadPoolExecutor, Future
+import pyarrow.compute as pc
+import shutil
+import duckdb
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rate_limiter import get_shared_limiter
+import kalshi_paginator
+from kalshi_paginator import build_session, get_with_retry, page_cursor, LIMIT
+from trade_lake import SCHEMA, DEFAULT_LAKE_DIR, Manifest, write_part, latest_created_time
+from trade_id_index import TradeIdIndex
+from raw_capture import open_capture
+from pipeline import run_pipeline, format_stats
+from ingest_metrics import get_shared_metrics
 
 
 # Example Response:
@@ -29,289 +37,524 @@ from concurrent.futures import ThreadPoolExecutor, Future
 #   "cursor": "<string>"
 # }
 #
-# Fields we keep:
+# Fields we keep (declared in field_specs.py, typed as trade_lake.SCHEMA):
 #   trade_id, ticker, count, yes_price_dollars, taker_side, created_time
+#
+# Pass capture_dir to keep the raw pages too (raw_capture.py), so other
+# fields can be backfilled later without re-crawling.
+#
+# While a crawl runs, ingest_metrics.py reports latency percentiles, retries,
+# throughput, the writer's queue depth and an ETA every few seconds (set
+# KALSHI_METRICS_FILE / KALSHI_METRICS_PROM_FILE to also keep them on disk).
+
+BASE_URL   = f"{kalshi_paginator.BASE_URL}/markets/trades"
+# Earliest timestamp for windowed backfills (before the first Kalshi trade)
+KALSHI_EPOCH_TS = 1609459200  # 2021-01-01
+# Dataset name of the trades' raw capture
+CAPTURE_DATASET = 'kalshi_trades'
+# Manifest stream name for the sequential crawl
+SEQUENTIAL_STREAM = 'sequential'
+# Incremental syncs re-fetch this far behind the newest trade on disk, so
+# trades that show up late in the feed aren't missed
+SYNC_OVERLAP_SECONDS = 3600
 
-BASE_URL   = "https://api.elections.kalshi.com/trade-api/v2/markets/trades"
-LIMIT      = 1000
-# Kalshi allows 20 req/s; leave a small buffer
-MIN_REQUEST_INTERVAL = 1.0 / 18  # ~18 req/s
 
-SCHEMA = pa.schema([
-    ('trade_id',          pa.string()),
-    ('ticker',            pa.string()),
-    ('count',             pa.int64()),
-    ('yes_price_dollars', pa.string()),
-    ('taker_side',        pa.string()),
-    ('created_time',      pa.string()),
-])
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def fetch_page(session, cursor, min_ts=None, max_ts=None, limiter=None, ticker=None):
+    """Fetch one page of trades as raw response bytes (retries/rate limiting in get_with_retry)."""
+    params = {'limit': LIMIT}
+    if ticker is not None:
+        params['ticker'] = ticker
+    if min_ts is not None:
+        params['min_ts'] = min_ts
+    if max_ts is not None:
+        params['max_ts'] = max_ts
+    if cursor:
+        params['cursor'] = cursor
+    return get_with_retry(session, BASE_URL, params, limiter=limiter)
 
 
 # ---------------------------------------------------------------------------
-# Cursor persistence
+# Decoding and lake writes (writes run in the pipeline's write stage)
 # ---------------------------------------------------------------------------
 
-def save_cursor(cursor, cursor_file='trades_pagination_cursor.json'):
-    with open(cursor_file, 'w') as f:
-        json.dump({'cursor': cursor, 'timestamp': datetime.now().isoformat()}, f)
+def decode_page(content, items_key='trades', schema=SCHEMA):
+    """Decode a raw trades page into (RecordBatch of SCHEMA, next cursor).
+
+    Prices are parsed to decimal and timestamps to timestamp[us, UTC] inside
+    Arrow's JSON reader (see kalshi_paginator.decode_page).
+    """
+    return kalshi_paginator.decode_page(content, items_key, schema)
+
+
+def build_table(batch):
+    """Combine a list of decoded page RecordBatches into one PyArrow table"""
+    return pa.Table.from_batches(batch, schema=SCHEMA)
 
 
-def load_cursor(cursor_file='trades_pagination_cursor.json'):
-    if os.path.exists(cursor_file):
-        with open(cursor_file, 'r') as f:
-            data = json.load(f)
-            print(f"Resuming from saved cursor (saved at {data['timestamp']})")
-            return data['cursor']
-    return None
+def commit_table(table, index, stream, cursor, done=False):
+    """Append a table of trades to the lake and commit it with the stream's next cursor.
+
+    The parts and the cursor that follows them land in the manifest in one
+    line, so a crash either keeps both or neither; the table's trade_ids are
+    added to the index in the same step.
+    """
+    start = time.perf_counter()
+    parts = write_part(index.manifest.lake_dir, table, tag=stream)
+    index.commit(stream, parts, table, cursor, done=done)
+    get_shared_metrics().flushed(table.num_rows, time.perf_counter() - start,
+                                 sum(os.path.getsize(p) for p in parts))
+    print(f"Flushed {table.num_rows:,} trades to {len(parts)} part(s) in {index.manifest.lake_dir}")
+
+
+def flush_batch(batch, index, stream, cursor, done=False):
+    """commit_table for a list of decoded page RecordBatches."""
+    commit_table(build_table(batch), index, stream, cursor, done=done)
 
 
 # ---------------------------------------------------------------------------
-# HTTP
+# Main fetch loop: fetch -> decode -> build -> write, one thread per stage
 # ---------------------------------------------------------------------------
+#
+# The stages hand work to each other through bounded queues (pipeline.py):
+#
+#   fetch   requests pages back to back; the next cursor is read straight
+#           from the raw bytes (page_cursor), so it never waits for a decode
+#   decode  JSON -> Arrow RecordBatch, then drops trade_ids already in the lake
+#   build   gathers batch_size trades into one table
+#   write   writes the table's parts and commits them with the cursor of
+#           the page after the table's last page
+#
+# At most PAGE_QUEUE_DEPTH raw pages and BATCH_QUEUE_DEPTH decoded pages wait
+# between stages, and one table waits for the writer, so memory is bounded
+# by the queue depths plus the table being built.
 
-def build_session():
-    """Create a requests.Session with connection pooling and keep-alive."""
-    session = requests.Session()
-    adapter = requests.adapters.HTTPAdapter(
-        pool_connections=1,
-        pool_maxsize=4,
-    )
-    session.mount('https://', adapter)
-    return session
+PAGE_QUEUE_DEPTH  = 8
+BATCH_QUEUE_DEPTH = 8
+TABLE_QUEUE_DEPTH = 1
 
 
-def fetch_page(session, cursor, max_retries=5, initial_backoff=1.0):
-    """Fetch one page of trades, retrying on transient errors."""
-    url = f"{BASE_URL}?limit={LIMIT}&min_ts=1770608928" UPDATE TIME
-    if cursor:
-        url += f"&cursor={cursor}"
+def crawl_stream(index, stream, cursor=None, min_ts=None, max_ts=None,
+                 batch_size=100_000, limiter=None, capture=None, ticker=None):
+    """Page trades into the lake as one manifest stream, starting from cursor.
+
+    Trades whose trade_id is already in the lake (or buffered by another
+    stream) are dropped as each page is decoded.
+
+    Args:
+        index:       TradeIdIndex of the lake being written.
+        stream:      Manifest stream name the flushes are committed under.
+        cursor:      Cursor to start from (None for the first page).
+        min_ts:      Only fetch trades at or after this unix timestamp.
+        max_ts:      Only fetch trades before this unix timestamp.
+        batch_size:  Trades per committed flush.
+        limiter:     Rate limiter (default: the shared token bucket).
+        capture:     RawCapture to keep every raw page in (None to skip).
+        ticker:      Only fetch this market's trades.
+    """
+    total_trades = 0
+    metrics = get_shared_metrics()
+    metrics.track(stream, min_ts if min_ts is not None else KALSHI_EPOCH_TS, max_ts)
 
-    backoff = initial_backoff
-    for attempt in range(max_retries):
+    def fetch():
+        next_cursor = cursor
+        session = build_session()
         try:
-            response = session.get(url, timeout=30)
+            while True:
+                # Rate limiting happens inside fetch_page via the shared token bucket
+                content = fetch_page(session, next_cursor, min_ts=min_ts, max_ts=max_ts, limiter=limiter,
+                                     ticker=ticker)
+                if capture is not None:
+                    capture.write(stream, content)
+                next_cursor = page_cursor(content)
+                yield content, next_cursor
+                if not next_cursor:
+                    return
+        finally:
+            session.close()
+
+    def decode(pages):
+        nonlocal total_trades
+        for request_count, (content, next_cursor) in enumerate(pages, 1):
+            trades, _ = decode_page(content)
+            if trades.num_rows:
+                # Pages run newest first: the oldest trade is how far back the stream has got
+                span = pc.min_max(trades.column('created_time'))
+                metrics.advance(stream, span['min'].as_py().timestamp(), span['max'].as_py().timestamp())
+            trades = index.claim(trades)
+            total_trades += trades.num_rows
+            metrics.fetched(trades.num_rows)
+            if not next_cursor:
+                print(f"{stream} | requests: {request_count:,} | total trades: {total_trades:,}")
+            yield trades, next_cursor
+
+    def build(decoded):
+        batch = []
+        batch_rows = 0
+        for trades, next_cursor in decoded:
+            batch.append(trades)
+            batch_rows += trades.num_rows
+            if batch_rows >= batch_size and next_cursor:
+                yield build_table(batch), next_cursor, False
+                batch = []
+                batch_rows = 0
+        # Final flush marks the stream complete
+        yield build_table(batch), None, True
 
-            if response.status_code == 200:
-                return response.json()
+    def write(tables):
+        for table, next_cursor, done in tables:
+            commit_table(table, index, stream, next_cursor, done=done)
 
-            if response.status_code == 502:
-                if attempt < max_retries - 1:
-                    print(f"502 Bad Gateway (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
-                    time.sleep(backoff)
-                    backoff *= 2
-                    continue
-                raise Exception(f"Persistent 502 after {max_retries} attempts.")
+    stages = [('fetch', fetch), ('decode', decode), ('build', build), ('write', write)]
+    with metrics:
+        try:
+            stats = run_pipeline(
+                stages,
+                depths=[PAGE_QUEUE_DEPTH, BATCH_QUEUE_DEPTH, TABLE_QUEUE_DEPTH],
+                observe=lambda queues, stats: metrics.watch_pipeline(stream, [n for n, _ in stages], queues, stats),
+            )
+        finally:
+            metrics.unwatch_pipeline(stream)
+        metrics.finish(stream)
+    print(f"{stream} | {format_stats(stats)}")
+    return total_trades
 
-            raise Exception(f"HTTP {response.status_code}: {response.text}")
 
-        except requests.exceptions.Timeout:
-            if attempt < max_retries - 1:
-                print(f"Timeout (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
-                time.sleep(backoff)
-                backoff *= 2
-                continue
-            raise Exception(f"Timeout after {max_retries} attempts.")
+def get_all_trades_batched(lake_dir=DEFAULT_LAKE_DIR, batch_size=100_000, resume=False, capture_dir=None):
+    """Fetch all trades from Kalshi with pagination, appending to the trade lake in batches.
 
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                print(f"Request error: {e} (attempt {attempt + 1}/{max_retries}). Retrying in {backoff:.1f}s...")
-                time.sleep(backoff)
-                backoff *= 2
-                continue
-            raise Exception(f"Request failed after {max_retries} attempts: {e}")
+    Args:
+        lake_dir:    Partitioned trade dataset directory (see trade_lake.py).
+        batch_size:  Trades to buffer in memory before flushing to disk.
+        resume:      If True, continue from the cursor of the last committed
+                     flush. New trades are appended as new parts; existing
+                     parts are never read or rewritten.
+        capture_dir: Keep the raw pages under this directory (None to skip).
+    """
+    if not resume and os.path.exists(lake_dir):
+        shutil.rmtree(lake_dir)
+        print(f"Removed existing {lake_dir}")
 
-    raise Exception(f"Failed after {max_retries} attempts")
+    manifest = Manifest(lake_dir)
+    manifest.remove_orphans()
+
+    cursor = None
+    state = manifest.streams.get(SEQUENTIAL_STREAM)
+    if resume:
+        if state is None:
+            print("No committed progress found, starting fresh")
+        elif state['done']:
+            print(f"Crawl in {lake_dir} already completed ({state['rows']:,} trades), nothing to resume")
+            return 0
+        else:
+            cursor = state['cursor']
+            print(f"Resuming after {state['rows']:,} committed trades from cursor: {cursor[:60]}...")
+
+    capture = open_capture(capture_dir, CAPTURE_DATASET)
+    try:
+        total_trades = crawl_stream(TradeIdIndex(manifest), SEQUENTIAL_STREAM, cursor, batch_size=batch_size,
+                                    capture=capture)
+    except Exception as e:
+        print(f"Error: {e}")
+        print(f"Progress up to the last flush is committed in {manifest.path}. Re-run with resume=True to continue.")
+        raise
+    finally:
+        if capture is not None:
+            capture.close()
+
+    print("Completed successfully")
+    return total_trades
 
 
 # ---------------------------------------------------------------------------
-# Parquet writing (runs in a background thread)
+# Incremental sync: only trades newer than what the lake already holds
 # ---------------------------------------------------------------------------
 
-def build_table(batch):
-    """Convert a list of trade dicts to a PyArrow table"""
-    return pa.table(
-        {
-            'trade_id':          [t['trade_id']          for t in batch],
-            'ticker':            [t['ticker']            for t in batch],
-            'count':             [t['count']             for t in batch],
-            'yes_price_dollars': [t['yes_price_dollars'] for t in batch],
-            'taker_side':        [t['taker_side']        for t in batch],
-            'created_time':      [t['created_time']      for t in batch],
-        },
-        schema=SCHEMA,
-    )
-
-
-def flush_batch(batch, filename, writer_state):
-    """Write a batch to the parquet file. Runs in the background thread pool.
-
-    writer_state is a one-element list so the background thread can share
-    the writer handle back to the main thread without a class.
+def sync_start(manifest, overlap_seconds=SYNC_OVERLAP_SECONDS):
+    """Work out where the next incremental sync starts.
+
+    Returns (stream, min_ts, cursor). An interrupted sync is picked up from
+    its last committed cursor with its original min_ts — the feed is paged
+    newest-first, so starting over from the new high-water mark would skip
+    whatever the interrupted run hadn't reached yet. Otherwise a new sync
+    starts overlap_seconds before the newest trade on disk.
     """
-    table = build_table(batch)
-    if writer_state[0] is None:
-        writer_state[0] = pq.ParquetWriter(filename, SCHEMA)
-        print(f"Created {filename} (initial batch: {len(batch):,} trades)")
-    else:
-        print(f"Flushed {len(batch):,} trades to disk")
-    writer_state[0].write_table(table)
+    for stream, state in manifest.streams.items():
+        if stream.startswith('sync:') and not state['done']:
+            return stream, int(stream.split(':', 1)[1]), state['cursor']
 
+    latest = latest_created_time(manifest)
+    min_ts = int(latest.timestamp()) - overlap_seconds if latest is not None else KALSHI_EPOCH_TS
+    return f"sync:{min_ts}", min_ts, None
 
-def _stream_merge_parquet(base_file, append_file, batch_size=100_000):
-    """Append append_file onto base_file without loading either fully into memory.
 
-    Writes to a temporary merge file first, then atomically replaces base_file
-    so the original is untouched if the merge crashes.
+def sync_trades(lake_dir=DEFAULT_LAKE_DIR, overlap_seconds=SYNC_OVERLAP_SECONDS, batch_size=100_000,
+                capture_dir=None):
+    """Append only the trades newer than the lake's high-water mark.
+
+    The high-water mark is the newest created_time on disk. Trades inside the
+    overlap that the lake already holds are dropped by the trade_id index, so
+    running this on a schedule never double-counts. On an empty lake this is a full
+    crawl.
+
+    Args:
+        lake_dir:        Partitioned trade dataset directory (see trade_lake.py).
+        overlap_seconds: How far behind the high-water mark to start re-fetching.
+        batch_size:      Trades to buffer in memory before flushing to disk.
+        capture_dir:     Keep the raw pages under this directory (None to skip).
     """
-    merge_tmp = base_file + ".merge_tmp"
+    manifest = Manifest(lake_dir)
+    manifest.remove_orphans()
+
+    index = TradeIdIndex(manifest)
+
+    stream, min_ts, cursor = sync_start(manifest, overlap_seconds)
+    print(f"Syncing trades since {datetime.fromtimestamp(min_ts):%Y-%m-%d %H:%M:%S}"
+          + (" — resuming interrupted sync" if cursor else ""))
+
+    capture = open_capture(capture_dir, CAPTURE_DATASET)
     try:
-        writer = pq.ParquetWriter(merge_tmp, SCHEMA)
-        for path in (base_file, append_file):
-            pf = pq.ParquetFile(path)
-            for batch in pf.iter_batches(batch_size=batch_size):
-                writer.write_batch(batch)
-        writer.close()
-        os.replace(merge_tmp, base_file)   # atomic on POSIX
-    except Exception:
-        if os.path.exists(merge_tmp):
-            os.remove(merge_tmp)
+        total_trades = crawl_stream(index, stream, cursor, min_ts=min_ts, batch_size=batch_size,
+                                    capture=capture)
+    except Exception as e:
+        print(f"Error: {e}")
+        print("Progress up to the last flush is committed. Re-run sync_trades to continue.")
         raise
+    finally:
+        if capture is not None:
+            capture.close()
+
+    print(f"Sync complete: {total_trades:,} new trades")
+    return total_trades
 
 
 # ---------------------------------------------------------------------------
-# Main fetch loop
+# Windowed backfill: independent min_ts/max_ts windows paged concurrently
 # ---------------------------------------------------------------------------
 
-def get_all_trades_batched(filename='kalshi_trades.parquet', batch_size=100_000,
-                           cursor_file='trades_pagination_cursor.json', resume=False):
-    """Fetch all trades from Kalshi with pagination, writing to parquet in batches.
+def split_windows(start_ts, end_ts, window_seconds):
+    """Split [start_ts, end_ts) into consecutive (min_ts, max_ts) windows."""
+    windows = []
+    lo = start_ts
+    while lo < end_ts:
+        hi = min(lo + window_seconds, end_ts)
+        windows.append((lo, hi))
+        lo = hi
+    return windows
 
-    Args:
-        filename:    Output parquet file.
-        batch_size:  Trades to buffer in memory before flushing to disk.
-        cursor_file: File for crash-recovery cursor.
-        resume:      If True, continue from the last saved cursor.
+
+def window_tag(min_ts, max_ts):
+    """Manifest stream name for one window."""
+    return f"w{min_ts}-{max_ts}"
+
+
+def fetch_window(min_ts, max_ts, index, limiter, batch_size=100_000, capture=None):
+    """Page every trade in one time window into the trade lake.
+
+    Every flush is committed with the window's next cursor, so an interrupted
+    window picks up after its last committed flush.
     """
-    temp_filename = filename + ".resume_tmp"
+    stream = window_tag(min_ts, max_ts)
+    state = index.manifest.streams.get(stream)
+    cursor = state['cursor'] if state else None
+    return crawl_stream(index, stream, cursor, min_ts=min_ts, max_ts=max_ts,
+                        batch_size=batch_size, limiter=limiter, capture=capture)
 
-    if resume:
-        cursor = load_cursor(cursor_file)
-        if cursor:
-            print(f"Resuming from cursor: {cursor[:60]}...")
-        else:
-            print("No saved cursor found, starting fresh")
-            cursor = None
-
-        # If the output file already exists, write this session's data to a
-        # temp file and merge afterwards — avoids overwriting existing data.
-        if cursor and os.path.exists(filename):
-            write_to = temp_filename
-            if os.path.exists(temp_filename):
-                os.remove(temp_filename)
-                print(f"Removed leftover temp file {temp_filename}")
-            print(f"Will write resumed data to {temp_filename}, then merge into {filename}")
-        else:
-            write_to = filename
-    else:
-        cursor = None
-        write_to = filename
-        for f in [filename, cursor_file, temp_filename]:
-            if os.path.exists(f):
-                os.remove(f)
-                print(f"Removed existing {f}")
-
-    batch        = []
+
+def get_all_trades_windowed(lake_dir=DEFAULT_LAKE_DIR, start_ts=KALSHI_EPOCH_TS, end_ts=None,
+                            window_seconds=7 * 24 * 3600, max_workers=8, batch_size=100_000,
+                            capture_dir=None):
+    """Backfill trades by paging independent time windows concurrently.
+
+    Each window is its own cursor chain, so up to max_workers pages are in
+    flight at once while the shared token bucket keeps the combined request
+    rate under the account budget. Every window appends its own parts to the
+    trade lake, so there is nothing to stitch once the windows finish.
+
+    Re-running after a crash skips windows that already finished and resumes
+    the rest from their last committed cursor.
+
+    Args:
+        lake_dir:       Partitioned trade dataset directory (see trade_lake.py).
+        start_ts:       Unix timestamp of the first window.
+        end_ts:         Unix timestamp where the last window ends (default: now).
+        window_seconds: Width of each window.
+        max_workers:    Windows paged concurrently.
+        batch_size:     Trades buffered per window before flushing a part.
+        capture_dir:    Keep the raw pages under this directory (None to skip).
+    """
+    if end_ts is None:
+        end_ts = int(time.time())
+
+    manifest = Manifest(lake_dir)
+    manifest.remove_orphans()
+
+    windows = split_windows(start_ts, end_ts, window_seconds)
+    todo = [(lo, hi) for lo, hi in windows
+            if not manifest.streams.get(window_tag(lo, hi), {}).get('done')]
+    partial = sum(1 for lo, hi in todo if window_tag(lo, hi) in manifest.streams)
+    print(f"{len(windows):,} windows, {len(windows) - len(todo):,} already complete, "
+          f"fetching {len(todo):,} ({partial:,} resumed) with {max_workers} workers")
+
+    index = TradeIdIndex(manifest)
+    limiter = get_shared_limiter()
+    capture = open_capture(capture_dir, CAPTURE_DATASET)
     total_trades = 0
-    request_count = 0
-    writer_state = [None]          # shared mutable writer handle
-    pending_write: Future = None   # outstanding background write
+    done = 0
 
-    session = build_session()
-    # Single-worker executor so writes are serialised but non-blocking for fetches
-    executor = ThreadPoolExecutor(max_workers=1)
+    # Every remaining window counts towards progress/ETA from the start
+    metrics = get_shared_metrics()
+    for lo, hi in todo:
+        metrics.track(window_tag(lo, hi), lo, hi)
+
+    try:
+        with metrics, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(fetch_window, lo, hi, index, limiter, batch_size, capture): (lo, hi)
+                for lo, hi in todo
+            }
+            try:
+                for future in as_completed(futures):
+                    lo, hi = futures[future]
+                    n = future.result()
+                    total_trades += n
+                    done += 1
+                    print(f"window {datetime.fromtimestamp(lo):%Y-%m-%d} -> {datetime.fromtimestamp(hi):%Y-%m-%d}: "
+                          f"{n:,} trades ({done:,}/{len(todo):,} windows, {total_trades:,} trades)")
+            except Exception as e:
+                # Windows already in flight finish; queued ones are dropped
+                for future in futures:
+                    future.cancel()
+                print(f"Error: {e}")
+                print("Committed progress is kept in the lake. Re-run to fetch the remaining windows.")
+                raise
+    finally:
+        # After the executor has drained, so no window is still writing pages
+        if capture is not None:
+            capture.close()
+
+    return total_trades
 
-    last_request_time = 0.0
 
+# ---------------------------------------------------------------------------
+# Per-ticker backfill: only the trades of selected markets
+# ---------------------------------------------------------------------------
+#
+# /markets/trades?ticker= pages a single market's trades, so a backfill scoped
+# to a few thousand markets (a series, sports, index markets...) costs pages in
+# proportion to their trades rather than the whole exchange's history. The
+# tickers come from a list or from the market catalog filtered by a DuckDB
+# predicate (select_tickers). Every ticker is its own manifest stream, paged
+# by a pool of workers under the shared token bucket; re-running skips the
+# tickers that finished and resumes the rest from their last committed cursor.
+# Trades the lake already holds (e.g. from the global crawl) are dropped by
+# the trade_id index.
+#
+# Each ticker commits its own parts, so a backfill over many thin markets
+# leaves many small parts behind — run compact_trades.py afterwards.
+
+MARKETS_FILE = 'kalshi_markets.parquet'
+
+
+def ticker_tag(ticker, min_ts=None):
+    """Manifest stream name for one ticker's crawl (min_ts: the crawl's lower bound, if any)."""
+    return f"ticker:{ticker}" + (f"@{min_ts}" if min_ts is not None else '')
+
+
+def select_tickers(markets_file=MARKETS_FILE, where=None, event_tickers=None):
+    """Tickers in the market catalog matching a predicate and/or a list of events.
+
+    Args:
+        markets_file:  Market catalog parquet (see totalMarketPagination.py).
+        where:         DuckDB predicate over the catalog's columns, e.g.
+                       "ticker LIKE 'KXNFLGAME%' AND status = 'finalized'".
+        event_tickers: Only markets of these events.
+    """
+    conditions, params = [], [markets_file]
+    if where:
+        conditions.append(f"({where})")
+    if event_tickers:
+        conditions.append("list_contains(?, event_ticker)")
+        params.append(list(event_tickers))
+    sql = "SELECT DISTINCT ticker FROM read_parquet(?)"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    con = duckdb.connect()
     try:
-        while True:
-            # ---- rate limiting: smooth per-request throttle ----
-            now = time.monotonic()
-            wait = MIN_REQUEST_INTERVAL - (now - last_request_time)
-            if wait > 0:
-                time.sleep(wait)
-
-            last_request_time = time.monotonic()
-            data = fetch_page(session, cursor)
-            request_count += 1
-
-            trades = data.get('trades', [])
-            for trade in trades:
-                batch.append({
-                    'trade_id':          trade.get('trade_id'),
-                    'ticker':            trade.get('ticker'),
-                    'count':             trade.get('count'),
-                    'yes_price_dollars': trade.get('yes_price_dollars'),
-                    'taker_side':        trade.get('taker_side'),
-                    'created_time':      trade.get('created_time'),
-                })
-
-            total_trades += len(trades)
-            if request_count % 100 == 0 or len(trades) == 0:
-                print(
-                    f"requests: {request_count:,} | total trades: {total_trades:,} | "
-                    f"batch: {len(batch):,}"
-                )
-
-            # Flush when batch is full — wait for any prior write first, then
-            # submit new write in background so next fetch starts immediately
-            if len(batch) >= batch_size:
-                if pending_write is not None:
-                    pending_write.result()   # ensure previous flush finished
-                batch_to_write = batch
-                batch = []
-                pending_write = executor.submit(flush_batch, batch_to_write, write_to, writer_state)
-
-            # Advance or stop
-            cursor = data.get('cursor')
-            if cursor:
-                save_cursor(cursor, cursor_file)
-            else:
-                break
-
-        # Final flush
-        if pending_write is not None:
-            pending_write.result()
-        if batch:
-            flush_batch(batch, write_to, writer_state)
-
-        # If we wrote to a temp file, merge it into the final file
-        if write_to == temp_filename:
-            if writer_state[0] is not None:
-                writer_state[0].close()
-                writer_state[0] = None
-                print(f"Closed parquet writer for {temp_filename}")
-            print(f"Merging {temp_filename} into {filename}...")
-            _stream_merge_parquet(filename, temp_filename)
-            os.remove(temp_filename)
-            print(f"Merge complete — removed {temp_filename}")
-
-        if os.path.exists(cursor_file):
-            os.remove(cursor_file)
-            print("Completed successfully — removed cursor file")
+        return [row[0] for row in con.execute(sql + " ORDER BY 1", params).fetchall()]
+    finally:
+        con.close()
 
-    except Exception as e:
-        if cursor:
-            save_cursor(cursor, cursor_file)
-            print(f"Error: {e}")
-            print(f"Cursor saved to {cursor_file}. Re-run with resume=True to continue.")
-        raise
 
+def fetch_ticker(ticker, index, limiter, min_ts=None, batch_size=100_000, capture=None):
+    """Page every trade of one market into the trade lake, resuming from its last committed cursor."""
+    stream = ticker_tag(ticker, min_ts)
+    state = index.manifest.streams.get(stream)
+    cursor = state['cursor'] if state else None
+    return crawl_stream(index, stream, cursor, min_ts=min_ts, batch_size=batch_size,
+                        limiter=limiter, capture=capture, ticker=ticker)
+
+
+def get_trades_for_tickers(tickers, lake_dir=DEFAULT_LAKE_DIR, min_ts=None, max_workers=8,
+                           batch_size=100_000, capture_dir=None):
+    """Backfill the trades of specific markets, one ticker per worker at a time.
+
+    Args:
+        tickers:     Market tickers to fetch (e.g. from select_tickers).
+        lake_dir:    Partitioned trade dataset directory (see trade_lake.py).
+        min_ts:      Only fetch trades at or after this unix timestamp. A
+                     different min_ts is a separate crawl, so a later refresh
+                     with a newer min_ts re-pages only recent trades.
+        max_workers: Tickers paged concurrently.
+        batch_size:  Trades buffered per ticker before flushing a part.
+        capture_dir: Keep the raw pages under this directory (None to skip).
+    """
+    manifest = Manifest(lake_dir)
+    manifest.remove_orphans()
+
+    tickers = list(dict.fromkeys(tickers))
+    todo = [t for t in tickers if not manifest.streams.get(ticker_tag(t, min_ts), {}).get('done')]
+    partial = sum(1 for t in todo if ticker_tag(t, min_ts) in manifest.streams)
+    print(f"{len(tickers):,} tickers, {len(tickers) - len(todo):,} already complete, "
+          f"fetching {len(todo):,} ({partial:,} resumed) with {max_workers} workers")
+
+    index = TradeIdIndex(manifest)
+    limiter = get_shared_limiter()
+    capture = open_capture(capture_dir, CAPTURE_DATASET)
+    total_trades = 0
+    done = 0
+
+    # Progress counts finished tickers: each one is a 0..1 range that
+    # crawl_stream's own (time-based) registration doesn't override
+    metrics = get_shared_metrics()
+    for ticker in todo:
+        metrics.track(ticker_tag(ticker, min_ts), 0, 1)
+
+    try:
+        with metrics, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(fetch_ticker, ticker, index, limiter, min_ts, batch_size, capture): ticker
+                for ticker in todo
+            }
+            try:
+                for future in as_completed(futures):
+                    n = future.result()
+                    total_trades += n
+                    done += 1
+                    print(f"{futures[future]}: {n:,} trades ({done:,}/{len(todo):,} tickers, {total_trades:,} trades)")
+            except Exception as e:
+                # Tickers already in flight finish; queued ones are dropped
+                for future in futures:
+                    future.cancel()
+                print(f"Error: {e}")
+                print("Committed progress is kept in the lake. Re-run to fetch the remaining tickers.")
+                raise
     finally:
-        executor.shutdown(wait=True)
-        if writer_state[0] is not None:
-            writer_state[0].close()
-            print(f"Closed parquet writer for {write_to}")
-        session.close()
+        if capture is not None:
+            capture.close()
 
     return total_trades
 
@@ -326,23 +569,28 @@ if __name__ == "__main__":
     print("Starting to fetch all Kalshi trades...")
     start = time.time()
 
-    filename = 'kalshi_trades.parquet'
+    lake_dir = DEFAULT_LAKE_DIR
 
-    # Two modes:
-    # 1. Fresh start (resume=False) — deletes any existing file, starts from the beginning
-    # 2. Resume        (resume=True) — continues from the last saved cursor after a crash
+    # Five modes:
+    # 1. Sync          (sync_trades) — appends only trades newer than the lake's high-water
+    #                  mark; run this on a schedule to keep the lake current
+    # 2. Fresh start   (resume=False) — deletes any existing lake, starts from the beginning
+    # 3. Resume        (resume=True) — continues from the last committed cursor after a crash
+    # 4. Windowed      (get_all_trades_windowed) — pages time windows concurrently under the
+    #                  shared rate limiter; re-running skips windows that already finished
+    # 5. Per-ticker    (get_trades_for_tickers) — only the trades of selected markets, e.g.
+    #                  get_trades_for_tickers(select_tickers(where="ticker LIKE 'KXNFLGAME%'"))
 
-    total_trades = get_all_trades_batched(
-        filename=filename,
-        batch_size=100_000,
-        resume=False,
-    )
+    total_trades = sync_trades(lake_dir=lake_dir)
+    # total_trades = get_all_trades_batched(lake_dir=lake_dir, batch_size=100_000, resume=False)
+    # total_trades = get_all_trades_windowed(lake_dir=lake_dir, max_workers=8)
+    # total_trades = get_trades_for_tickers(select_tickers(where="ticker LIKE 'KXINX%'"), lake_dir=lake_dir)
 
     elapsed = time.time() - start
     print(f"\nCompleted in {elapsed:.1f}s  ({total_trades / elapsed:,.0f} trades/sec)")
     print(f"Total trades fetched: {total_trades:,}")
 
-    df = pd.read_parquet(filename)
+    df = pd.read_parquet(lake_dir)
     print(f"Total trades in file: {len(df):,}")
     print("\nFirst 5 trades:")
     print(df.head())
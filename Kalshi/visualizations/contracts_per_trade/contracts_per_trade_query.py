@@ -1,16 +1,19 @@
 import duckdb
 
 con = duckdb.connect()
+# created_time is stored as TIMESTAMPTZ; bucket it in UTC
+con.execute("SET TimeZone = 'UTC'")
 
 print("\n===  Query 1: Total Volume by Market Type ===")
 result1 = con.execute("""
 COPY (
     SELECT
-        date_trunc('MONTH', created_time::TIMESTAMP)::VARCHAR(100) AS MONTH,
+        date_trunc('MONTH', created_time)::TIMESTAMP::VARCHAR(100) AS MONTH,
         SUM(count)::FLOAT / COUNT(*) AS contracts_per_trade,
         MEDIAN(count) median_contracts_per_trade
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
-    WHERE MONTH >= '2023-01-01'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
+    WHERE created_month >= '2023-01'   -- prunes whole partitions
+      AND MONTH >= '2023-01-01'
     GROUP BY MONTH
     ORDER BY MONTH ASC
 ) TO contracts_per_trade_data.csv (HEADER, DELIMITER ',');
@@ -1,15 +1,17 @@
 import duckdb
 
 con = duckdb.connect()
+# created_time is stored as TIMESTAMPTZ; bucket it in UTC
+con.execute("SET TimeZone = 'UTC'")
 
 #print("\n===  Query 1: Implied prob by month avg/median ===")
 #result1 = con.execute("""
 #    SELECT
-#        date_trunc('MONTH', created_time::TIMESTAMP)::DATE AS MONTH,
+#        date_trunc('MONTH', created_time)::DATE AS MONTH,
 #        MEDIAN(yes_price_dollars::FLOAT) median_yes_unweighted,
 #        SUM(yes_price_dollars::FLOAT * count)/ sum(count) AS avg_yes_price,
 #        SUM(count) total_contracts,
-#    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+#    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
 #    GROUP BY MONTH
 #    ORDER BY MONTH ASC
 #""").df()
@@ -20,16 +22,17 @@ con.execute("""
 COPY(
 WITH FILTER_BAND AS (
     SELECT
-             date_trunc('MONTH', created_time::TIMESTAMP)::DATE AS MONTH 
+             date_trunc('MONTH', created_time)::DATE AS MONTH 
            , CASE
-               WHEN yes_price_dollars::FLOAT < 0.20 THEN 'a. 0-20%'
-               WHEN yes_price_dollars::FLOAT < 0.40 THEN 'b. 20-40%'
-               WHEN yes_price_dollars::FLOAT < 0.60 THEN 'c. 40-60%'
-               WHEN yes_price_dollars::FLOAT < 0.80 THEN 'd. 60-80%'
+               WHEN yes_price_dollars < 0.20 THEN 'a. 0-20%'
+               WHEN yes_price_dollars < 0.40 THEN 'b. 20-40%'
+               WHEN yes_price_dollars < 0.60 THEN 'c. 40-60%'
+               WHEN yes_price_dollars < 0.80 THEN 'd. 60-80%'
                ELSE 'e. 80-100%' END AS implied_prod_band
             , SUM(count) total_contracts
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
-    WHERE MONTH >= '2024-01-01'::DATE
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
+    WHERE created_month >= '2024-01'   -- prunes whole partitions
+      AND MONTH >= '2024-01-01'::DATE
     GROUP BY 1,2
     ORDER BY 1 DESC
 )
@@ -1,18 +1,20 @@
 import duckdb
 
 con = duckdb.connect()
+# created_time is stored as TIMESTAMPTZ; bucket it in UTC
+con.execute("SET TimeZone = 'UTC'")
 
 print("\n===  Overall Stats ===")
 
 con.sql("""
 COPY (
 WITH TOTAL_TRADES_DATA AS (
-    SELECT -- date_trunc('WEEK', created_time::TIMESTAMP)::DATE AS WEEK
+    SELECT -- date_trunc('WEEK', created_time)::DATE AS WEEK
         1 AS JOIN_NUM
          , COUNT(1) AS TOTAL_TRADES
          , SUM(count) AS TOTAL_VOLUME
          , TOTAL_VOLUME / TOTAL_TRADES::FLOAT AS AVG_CONTRACTS_PER_TRADE
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
    GROUP BY 1
 ),
 TOTAL_MARKETS_DATA AS (
@@ -35,11 +37,12 @@ print("\n===  Overall Stats ===")
 
 con.sql("""
 COPY (
-    SELECT date_trunc('WEEK', created_time::TIMESTAMP)::DATE AS WEEK
+    SELECT date_trunc('WEEK', created_time)::DATE AS WEEK
          , COUNT(1) AS TOTAL_TRADES
          , SUM(count) AS TOTAL_VOLUME
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
-   WHERE WEEK > '2023-01-01'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
+   WHERE created_month >= '2023-01'   -- prunes whole partitions
+     AND WEEK > '2023-01-01'
    GROUP BY 1
    ORDER BY 1 DESC
 ) TO weekly_overall_stats_data.csv (HEADER, DELIMITER ',');                
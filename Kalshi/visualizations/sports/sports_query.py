@@ -134,14 +134,14 @@ WITH CHECK123 AS (
                 WHEN ticker ILIKE '%KXWPLGAME%' THEN 'Other Sports'
                 ELSE 'LIKELY NOT SPORTS' END AS MKT_TYPE
         , SUM(count) as Total_Volume  
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
     GROUP BY 1
     ORDER BY Total_Volume DESC
 ),
                       
 TotalVolumeAllMarkets AS (
     SELECT SUM(count) as NET_TOTAL_VOLUME
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
 )
                       
 SELECT C.MKT_TYPE as Market_Type
@@ -1,6 +1,13 @@
+import os
+import sys
 import duckdb
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'kalshi_fees'))
+from fee_schedule import FEE_JOIN, build_fee_lookup
+
 con = duckdb.connect()
+# created_time is stored as TIMESTAMPTZ; bucket it in UTC
+con.execute("SET TimeZone = 'UTC'")
 
 print("\n===  TOTAL FEE CALC QUERY ===")
 result1 = con.execute("""
@@ -26,8 +33,8 @@ result1 = con.execute("""
          --        ELSE 'NORMAL FEES'
          --      END AS TICKER_FEE_SEGMENTATION
         -- , SUM(COUNT) AS TOTAL_CONTRACTS
- --        date_trunc('MONTH', created_time::TIMESTAMP)::DATE AS MONTH,
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+ --        date_trunc('MONTH', created_time)::DATE AS MONTH,
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
     LIMIT 10
 """).df()
 print(result1)
@@ -37,7 +44,7 @@ print("\n===  TOTAL FEE CALC QUERY ===")
 result2 = con.sql("""
     --TOTAL = 545,213,087.0606397
     SELECT SUM(.0875 * COUNT * yes_price_dollars::FLOAT * (1-yes_price_dollars::FLOAT)) AS TOTAL_FEE
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
 """).show()
 
 print("\n===  TOTAL FEE CALC QUERY WITH PROPER ROUNDING ===")
@@ -52,7 +59,7 @@ WITH TRADE_FEE AS (
          ,  CAST(CEIL(TAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as TAKER_FEE_WC
          ,  CAST(CEIL(MAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as MAKER_FEE_WC
          ,  TAKER_FEE_WC + MAKER_FEE_WC AS TOTAL_FEE
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
 )
 SELECT SUM(TOTAL_FEE)
 FROM TRADE_FEE
@@ -61,43 +68,21 @@ FROM TRADE_FEE
 
 print("\n===  TOTAL FEE CALC QUERY WITH PROPER ROUNDING AND HANDLING OF FEE ADJUSTMENTS https://kalshi.com/fee-schedule ===")
 
-con.sql("""
+# Adjustments from kalshi_fees/fee_schedule.py, resolved once per distinct ticker
+build_fee_lookup(con, "read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)")
+
+# In exact integer cents (fee_cents): the float CEIL above can land a cent
+# high or low at exact-cent boundaries
+con.sql(f"""
 WITH TRADE_FEE AS (
-    -- TOTAL = 545,673,949.01
-    SELECT ticker, count, yes_price_dollars
-        -- TOTAL FEE FOR ANY CONTRACT IS .0875 * C * P(1=P) where we don't care which side maker/taker are on
-         , .07 * COUNT * yes_price_dollars::FLOAT * (1-yes_price_dollars::FLOAT) AS TAKER_FEE
-         , .0175 * COUNT * yes_price_dollars::FLOAT * (1-yes_price_dollars::FLOAT) AS MAKER_FEE
-         ,  CAST(CEIL(TAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as TAKER_FEE_WC
-         ,  CAST(CEIL(MAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as MAKER_FEE_WC
-         ,  TAKER_FEE_WC + MAKER_FEE_WC AS TOTAL_FEE
-         , CASE WHEN TICKER ILIKE '%KXDOED%' THEN 0
-                WHEN TICKER ILIKE '%KXGAMBLINGREPEAL%' THEN 0
-                WHEN TICKER ILIKE '%KXGREENLAND%' THEN 0
-                WHEN TICKER ILIKE '%KXINX%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))
-                WHEN TICKER ILIKE '%KXINXMAXY%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                     
-                WHEN TICKER ILIKE '%KXINXMINY%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                     
-                WHEN TICKER ILIKE '%KXINXPOS%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))
-                WHEN TICKER ILIKE '%KXINXU%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                    
-                WHEN TICKER ILIKE '%KXNASDAQ100%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))
-                WHEN TICKER ILIKE '%KXNASDAQ100U%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                  
-                WHEN TICKER ILIKE '%KXINXY%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))   
-                WHEN TICKER ILIKE '%KXNASDAQ100Y%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                    
-                ELSE TAKER_FEE_WC
-                END AS TAKER_FEE_WITH_ADJ
-         , CASE WHEN TICKER ILIKE '%KXDOED%' THEN 0
-                WHEN TICKER ILIKE '%KXGAMBLINGREPEAL%' THEN 0
-                WHEN TICKER ILIKE '%KXGREENLAND%' THEN 0                
-                WHEN TICKER ILIKE '%KXINXY%' THEN CAST(CEIL((MAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))   
-                WHEN TICKER ILIKE '%KXNASDAQ100Y%' THEN CAST(CEIL((MAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                    
-                ELSE MAKER_FEE_WC
-                END AS MAKER_FEE_WITH_ADJ
-         , TAKER_FEE_WITH_ADJ + MAKER_FEE_WITH_ADJ AS TOTAL_FEE_ADJ
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    SELECT t.ticker, t.count, t.yes_price_dollars
+         , fee_cents(t.count, t.yes_price_dollars, f.taker_num, f.taker_den)
+         + fee_cents(t.count, t.yes_price_dollars, f.maker_num, f.maker_den) AS TOTAL_FEE_ADJ_CENTS
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true) t {FEE_JOIN}
 )
-SELECT SUM(TOTAL_FEE_ADJ)
+SELECT SUM(TOTAL_FEE_ADJ_CENTS) * 0.01
 FROM TRADE_FEE
-                      
+
 """).show()
 
 print("\n===  LARGEST TOTAL FEE ===")
@@ -112,7 +97,7 @@ WITH TRADE_FEE AS (
          ,  CAST(CEIL(TAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as TAKER_FEE_WC
          ,  CAST(CEIL(MAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as MAKER_FEE_WC
          ,  TAKER_FEE_WC + MAKER_FEE_WC AS TOTAL_FEE
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
 )
 SELECT * 
 FROM TRADE_FEE
@@ -130,7 +115,7 @@ con.sql("""
 WITH NORM AS (
 SELECT CASE WHEN yes_price_dollars::FLOAT > .5 THEN 1-yes_price_dollars::FLOAT ELSE yes_price_dollars::FLOAT END AS IMP_ODDS_NORM
       , COUNT
-FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
 WHERE TICKER = 'PRES-2024-KH'
 )
         
@@ -148,7 +133,7 @@ WITH TOTALS AS (
          ,  CAST(CEIL(TAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as TAKER_FEE_WC
          ,  CAST(CEIL(MAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as MAKER_FEE_WC
          ,  TAKER_FEE_WC + MAKER_FEE_WC AS TOTAL_FEE
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+    FROM read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)
 WHERE TICKER = 'PRES-2024-KH'
         )
 SELECT *
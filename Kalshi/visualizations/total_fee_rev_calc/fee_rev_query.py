@@ -1,52 +1,42 @@
+import os
+import sys
 import duckdb
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'kalshi_fees'))
+from fee_schedule import FEE_JOIN, FEE_SCHEDULE_VERSION, build_fee_lookup
+
+TRADES = "read_parquet('/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades/*/*.parquet', hive_partitioning = true)"
+
 con = duckdb.connect()
+# created_time is stored as TIMESTAMPTZ; bucket it in UTC
+con.execute("SET TimeZone = 'UTC'")
 
 print("\n===  TOTAL FEE CALC QUERY WITH PROPER ROUNDING AND HANDLING OF FEE ADJUSTMENTS https://kalshi.com/fee-schedule ===")
 
-con.execute("""
+# Fee adjustments come from kalshi_fees/fee_schedule.py, resolved once per
+# distinct ticker and hash joined onto the trades
+lookup_rows = build_fee_lookup(con, f"{TRADES} WHERE created_month >= '2024-01'")
+print(f"Fee schedule {FEE_SCHEDULE_VERSION}: {lookup_rows:,} ticker fee rows")
+
+# Fees in exact integer cents (fee_cents in fee_schedule.py), no float
+# rounding at cent boundaries; matches kalshi_fees/fees.py to the cent
+con.execute(f"""
 COPY (
 WITH TRADE_FEE AS (
-    -- TOTAL = 545,673,949.01
-    SELECT ticker
-        , count
-        , yes_price_dollars
-        , created_time
+    SELECT t.created_time
         -- TOTAL FEE FOR ANY CONTRACT IS .0875 * C * P(1=P) where we don't care which side maker/taker are on
-         , .07 * COUNT * yes_price_dollars::FLOAT * (1-yes_price_dollars::FLOAT) AS TAKER_FEE
-         , .0175 * COUNT * yes_price_dollars::FLOAT * (1-yes_price_dollars::FLOAT) AS MAKER_FEE
-         ,  CAST(CEIL(TAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as TAKER_FEE_WC
-         ,  CAST(CEIL(MAKER_FEE * 100) / 100 AS DECIMAL(10, 2)) as MAKER_FEE_WC
-         , CASE WHEN TICKER ILIKE '%KXDOED%' THEN 0
-                WHEN TICKER ILIKE '%KXGAMBLINGREPEAL%' THEN 0
-                WHEN TICKER ILIKE '%KXGREENLAND%' THEN 0
-                WHEN TICKER ILIKE '%KXINX%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))
-                WHEN TICKER ILIKE '%KXINXMAXY%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                     
-                WHEN TICKER ILIKE '%KXINXMINY%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                     
-                WHEN TICKER ILIKE '%KXINXPOS%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))
-                WHEN TICKER ILIKE '%KXINXU%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                    
-                WHEN TICKER ILIKE '%KXNASDAQ100%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))
-                WHEN TICKER ILIKE '%KXNASDAQ100U%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                  
-                WHEN TICKER ILIKE '%KXINXY%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))   
-                WHEN TICKER ILIKE '%KXNASDAQ100Y%' THEN CAST(CEIL((TAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                    
-                ELSE TAKER_FEE_WC
-                END AS TAKER_FEE_WITH_ADJ
-         , CASE WHEN TICKER ILIKE '%KXDOED%' THEN 0
-                WHEN TICKER ILIKE '%KXGAMBLINGREPEAL%' THEN 0
-                WHEN TICKER ILIKE '%KXGREENLAND%' THEN 0                
-                WHEN TICKER ILIKE '%KXINXY%' THEN CAST(CEIL((MAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))   
-                WHEN TICKER ILIKE '%KXNASDAQ100Y%' THEN CAST(CEIL((MAKER_FEE / 2::FLOAT) * 100) / 100 AS DECIMAL(10, 2))                    
-                ELSE MAKER_FEE_WC
-                END AS MAKER_FEE_WITH_ADJ
-         , TAKER_FEE_WITH_ADJ + MAKER_FEE_WITH_ADJ AS TOTAL_FEE
-    FROM '/Users/iamsam/WorkingFiles/PredictionMarkets/Kalshi/summaryStats/kalshi_trades.parquet'
+         , fee_cents(t.count, t.yes_price_dollars, f.taker_num, f.taker_den) AS TAKER_FEE_CENTS
+         , fee_cents(t.count, t.yes_price_dollars, f.maker_num, f.maker_den) AS MAKER_FEE_CENTS
+         , TAKER_FEE_CENTS + MAKER_FEE_CENTS AS TOTAL_FEE_CENTS
+    FROM {TRADES} t {FEE_JOIN}
+    WHERE t.created_month >= '2024-01'   -- prunes whole partitions
 )
-SELECT date_trunc('MONTH', created_time::TIMESTAMP)::DATE AS MONTH
-     , SUM(TOTAL_FEE) AS TOTAL_REV_FROM_FEES
+SELECT date_trunc('MONTH', created_time)::DATE AS MONTH
+     , SUM(TOTAL_FEE_CENTS) * 0.01 AS TOTAL_REV_FROM_FEES   -- exact: integer × DECIMAL
 FROM TRADE_FEE
 WHERE MONTH >= '2024-01-01'
-GROUP BY 1    
-ORDER BY 1 DESC) TO total_fee_data.csv (HEADER, DELIMITER ',');                
+GROUP BY 1
+ORDER BY 1 DESC) TO total_fee_data.csv (HEADER, DELIMITER ',');
 """)
 
-con.close()
\ No newline at end of file
+con.close()